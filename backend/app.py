@@ -1,20 +1,32 @@
 import os, io, time, base64, json, re
 import numpy as np
-from flask import Flask, request, jsonify, send_from_directory, redirect
+from flask import Flask, Response, request, jsonify, send_from_directory, redirect, stream_with_context
 from flask_cors import CORS
 from PIL import Image, ImageFilter, ImageFile
 import requests
 import secrets
 import hashlib
 import bleach
+import hmac
+from functools import wraps
 from html import escape
 
 # Import database and blockchain sync
-from database import CapsuleDatabase
+from database import (create_database_from_env, encode_cursor, decode_cursor,
+                      CAPSULE_API_FIELDS, SUMMARY_API_FIELDS, SUMMARY_JSON_COLUMN)
+from read_model import CapsuleReadModel
+from chunked_upload import ChunkedUploadManager, ChunkedUploadError
+from static_assets import StaticAssetServer, compress_response, ASSET_URL_PREFIX
+from blob_storage import create_blob_storage_from_env
+from db_snapshot import DatabaseSnapshotter, restore_snapshot
+from ciphertext_compactor import CiphertextCompactor, CompactionInProgress, load_archived_ciphertext
+from pin_reconciler import PinataClient, PinReconciler, PINATA_API_BASE, PINATA_UPLOADS_BASE
+from car_export import CarExporter, CAR_MIME_TYPE
 from blockchain_sync_events import EventBasedBlockchainSyncService
 from public_config import public_config as config_data, public_config_path
 
-# Note: S3 storage removed - using IPFS + Pinata only
+# Blob storage (encrypted images + pixelated previews): local disk by default,
+# S3-compatible bucket with BLOB_STORAGE_BACKEND=s3
 
 # Prevent decompression bomb attacks
 ImageFile.LOAD_TRUNCATED_IMAGES = False
@@ -25,6 +37,9 @@ PINATA_API_KEY = os.environ.get('PINATA_API_KEY')
 PINATA_SECRET_API_KEY = os.environ.get('PINATA_SECRET_API_KEY')
 PINATA_GATEWAY = os.environ.get('PINATA_GATEWAY', 'https://gateway.pinata.cloud')
 
+# Bearer token required by /api/admin/* endpoints (admin endpoints are disabled when unset)
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN')
+
 # Shutter configuration from environment variables only
 SHUTTER_API_BASE = os.environ.get("SHUTTER_API_BASE")
 SHUTTER_REGISTRY = os.environ.get("SHUTTER_REGISTRY_ADDRESS")
@@ -57,6 +72,37 @@ SHUTTER_REGISTRY = SHUTTER_REGISTRY or "0x2693a4Fb363AdD4356e6b80Ac5A27fF05FeA6D
 # Apply defaults for image upload configuration if not set
 MAX_IMAGE_SIZE_MB = MAX_IMAGE_SIZE_MB or int(os.environ.get('MAX_IMAGE_SIZE_MB', 10))  # Default 10MB
 
+# Dynamic responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+# Chunk size for resumable uploads (small enough to retry cheaply on mobile connections)
+UPLOAD_CHUNK_SIZE_KB = int(os.environ.get('UPLOAD_CHUNK_SIZE_KB', 512))
+
+# Serve list queries from an in-memory copy of the capsule summaries (kept current by the sync)
+READ_MODEL_ENABLED = os.environ.get('READ_MODEL_ENABLED', 'false').lower() == 'true'
+
+# Snapshot the SQLite database to blob storage this often (0 = off); a restarted dyno restores
+# the newest snapshot and only syncs the blocks after it. Needs durable (s3) blob storage.
+DB_SNAPSHOT_INTERVAL_MINUTES = int(os.environ.get('DB_SNAPSHOT_INTERVAL_MINUTES', 0))
+
+# Remove the ciphertext of revealed capsules from the SQLite database once a day: "archive" moves
+# it to blob storage, "drop" deletes it (the chain still holds it); "off" keeps it in the database
+CIPHERTEXT_COMPACTION = os.environ.get('CIPHERTEXT_COMPACTION', 'off').lower()
+# Only compact capsules revealed at least this many days ago
+CIPHERTEXT_COMPACTION_MIN_AGE_DAYS = float(os.environ.get('CIPHERTEXT_COMPACTION_MIN_AGE_DAYS', 7))
+# /api/admin/compact-ciphertext runs inside the request, so each call compacts at most this many
+# capsules, stops starting new batches after this many seconds and vacuums at most this many pages
+# (never the one-off full VACUUM of older files); continue with after_id=report.next_after_id
+COMPACTION_REQUEST_MAX_CAPSULES = int(os.environ.get('COMPACTION_REQUEST_MAX_CAPSULES', 2000))
+COMPACTION_REQUEST_SECONDS = float(os.environ.get('COMPACTION_REQUEST_SECONDS', 15))
+COMPACTION_REQUEST_VACUUM_PAGES = int(os.environ.get('COMPACTION_REQUEST_VACUUM_PAGES', 5000))
+
+# /api/admin/export.car hashes every blob before sending the first byte, so each request covers at
+# most this many capsules and stops starting new ones after this many seconds (Heroku drops
+# requests without a first byte after 30 s); continue with since_id=X-Export-Last-Capsule-Id
+CAR_EXPORT_MAX_CAPSULES = int(os.environ.get('CAR_EXPORT_MAX_CAPSULES', 100))
+CAR_EXPORT_PREPARE_SECONDS = float(os.environ.get('CAR_EXPORT_PREPARE_SECONDS', 15))
+
 # Log Shutter configuration status
 if SHUTTER_BEARER_TOKEN:
     print("✅ Shutter API bearer token configured")
@@ -67,6 +113,7 @@ print(f"📋 Shutter Registry: {SHUTTER_REGISTRY}")
 
 # Log image upload configuration
 print(f"📁 Max image size: {MAX_IMAGE_SIZE_MB}MB")
+print(f"📦 Resumable upload chunk size: {UPLOAD_CHUNK_SIZE_KB}KB")
 
 ONE_YEAR_SECONDS   = 365 * 24 * 60 * 60
 
@@ -77,50 +124,123 @@ app = Flask(__name__, static_folder="../frontend", static_url_path="")
 app.config["MAX_CONTENT_LENGTH"] = MAX_IMAGE_SIZE_BYTES  # Set max upload size in bytes
 CORS(app, origins=["http://localhost:8080", "http://localhost:5000", "https://ethereum-time-capsule-luis-e873bebc232f.herokuapp.com"] if not IS_PRODUCTION else ["*"])
 
+# Precompressed, content-hashed static assets (built by `python backend/static_assets.py`)
+static_assets = StaticAssetServer(app.static_folder)
+
+def send_frontend_file(filename):
+    """Serve a frontend file, preferring the precompressed asset server when built"""
+    response = static_assets.serve(filename, request) if static_assets.enabled else None
+    return response or app.send_static_file(filename)
+
+@app.before_request
+def serve_static_asset():
+    """Serve manifest files with precompressed siblings before Flask's plain static handler"""
+    if request.method != "GET" or not static_assets.enabled:
+        return None
+    return static_assets.serve(request.path.lstrip("/"), request)
+
+@app.after_request
+def compress_dynamic_response(response):
+    return compress_response(response, request, min_size=COMPRESSION_MIN_SIZE)
+
+@app.route(f'{ASSET_URL_PREFIX}/<digest>/<path:filename>')
+def hashed_asset(digest, filename):
+    response = static_assets.serve_hashed(digest, filename, request)
+    return response or ("Not found", 404)
+
 # Frontend routes for production deployment
 @app.route('/')
 def index():
-    return app.send_static_file('index.html')
+    return send_frontend_file('index.html')
 
 @app.route('/create')
 def create_page():
-    return app.send_static_file('create.html')
+    return send_frontend_file('create.html')
 
 @app.route('/gallery')
 def gallery_page():
-    return app.send_static_file('gallery.html')
+    return send_frontend_file('gallery.html')
 
 # Legacy .html routes for backward compatibility
 @app.route('/index.html')
 def index_html():
-    return app.send_static_file('index.html')
+    return send_frontend_file('index.html')
 
 @app.route('/create.html')
 def create_html():
-    return app.send_static_file('create.html')
+    return send_frontend_file('create.html')
 
 @app.route('/gallery.html')
 def gallery_html():
-    return app.send_static_file('gallery.html')
+    return send_frontend_file('gallery.html')
 
 @app.route('/default.jpg')
 def default_image():
-    return app.send_static_file('default.jpg')
+    return send_frontend_file('default.jpg')
 
 @app.route('/public_config.json')
 def public_config():
     return config_data
 
+# Blob storage backend used by the IPFS and preview routes (and database snapshots)
+blob_storage = create_blob_storage_from_env()
+print(f"🗄️  Blob storage backend: {blob_storage.name}")
+
 # Initialize database
-# Use PostgreSQL on Heroku, SQLite locally
-if IS_PRODUCTION and 'DATABASE_URL' in os.environ:
-    # For Heroku PostgreSQL - would need additional setup for full PostgreSQL support
-    # For now, keep SQLite but store in tmp for Heroku compatibility
-    db_path = "/tmp/capsules.db" if IS_PRODUCTION else "capsules.db"
-else:
-    db_path = "capsules.db"
+# PostgreSQL when DATABASE_URL is set (Heroku Postgres, shared by all dynos), SQLite locally
+DB_PATH = "capsules.db"
+SNAPSHOTS_ENABLED = DB_SNAPSHOT_INTERVAL_MINUTES > 0 and not os.environ.get("DATABASE_URL")
+restored_snapshot = None
+if SNAPSHOTS_ENABLED:
+    try:
+        restored_snapshot = restore_snapshot(DB_PATH, blob_storage)
+        if restored_snapshot:
+            print(f"📥 Restored database snapshot at block {restored_snapshot['last_synced_block']}")
+    except Exception as e:
+        print(f"⚠️  Warning: Could not restore database snapshot, syncing from scratch: {e}")
+
+db = create_database_from_env(DB_PATH)
+print(f"🗃️  Database backend: {db.name}")
 
-db = CapsuleDatabase(db_path)
+db_snapshotter = None
+if SNAPSHOTS_ENABLED:
+    db_snapshotter = DatabaseSnapshotter(
+        db, blob_storage,
+        last_snapshot_block=restored_snapshot["last_synced_block"] if restored_snapshot else None
+    )
+    db_snapshotter.start(DB_SNAPSHOT_INTERVAL_MINUTES * 60)
+    print(f"📸 Database snapshots every {DB_SNAPSHOT_INTERVAL_MINUTES} minutes")
+
+# One per worker, so /api/admin/pins/reconcile never runs two passes at once
+pinata_client = PinataClient.from_env()
+pin_reconciler = PinReconciler(db, blob_storage, pinata_client) if pinata_client else None
+
+# Shared by the daily pass and /api/admin/compact-ciphertext, so the two never run at once
+ciphertext_compactor = None
+if db.payload_compaction:
+    ciphertext_compactor = CiphertextCompactor(
+        db, None if CIPHERTEXT_COMPACTION == "drop" else blob_storage,
+        min_age_seconds=int(CIPHERTEXT_COMPACTION_MIN_AGE_DAYS * 86400)
+    )
+if CIPHERTEXT_COMPACTION in ("archive", "drop") and ciphertext_compactor:
+    ciphertext_compactor.start(24 * 3600)
+    print(f"🗜️  Ciphertext compaction ({CIPHERTEXT_COMPACTION}) of capsules revealed {CIPHERTEXT_COMPACTION_MIN_AGE_DAYS:g}+ days ago")
+elif CIPHERTEXT_COMPACTION != "off":
+    print(f"⚠️  Warning: CIPHERTEXT_COMPACTION={CIPHERTEXT_COMPACTION} ignored (archive or drop, SQLite only)")
+
+# Loaded before the sync service starts, which then applies every batch it commits
+read_model = None
+if READ_MODEL_ENABLED:
+    read_model = CapsuleReadModel()
+    read_model.load(db)
+    print(f"🧠 Read model: {read_model.get_capsule_count()} capsules, ~{read_model.memory_usage() // 1024} KiB")
+
+# Resumable upload sessions (temporary files live next to ipfs_storage/)
+upload_manager = ChunkedUploadManager(
+    storage_dir="upload_sessions",
+    chunk_size=UPLOAD_CHUNK_SIZE_KB * 1024,
+    max_total_size=MAX_IMAGE_SIZE_BYTES
+)
 
 # =============  SECURITY FUNCTIONS  =============
 def sanitize_text_input(text):
@@ -159,6 +279,19 @@ def sanitize_text_input(text):
     
     return text.strip()
 
+def require_admin_token(view):
+    """Reject requests without a valid `Authorization: Bearer <ADMIN_API_TOKEN>` header"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_API_TOKEN:
+            return {"error": "Admin API disabled (ADMIN_API_TOKEN not configured)"}, 403
+        auth_header = request.headers.get("Authorization", "")
+        token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else ""
+        if not hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode()):
+            return {"error": "Unauthorized"}, 401
+        return view(*args, **kwargs)
+    return wrapper
+
 def sanitize_capsule_data(data):
     """Sanitize all text fields in capsule data"""
     sanitized = {}
@@ -205,7 +338,8 @@ try:    # Handle different working directories (local vs Heroku)
         contract_address=network_config["contract_address"],
         contract_abi=contract_abi,
         db=db,
-        start_block=start_block
+        start_block=start_block,
+        read_model=read_model
     )
     
     print(f"📊 Database initialized, ultra-optimized event-based sync ready for {network_config['contract_address']}")
@@ -448,7 +582,7 @@ def upload_to_pinata(file_bytes, filename=None):
 
 def upload_to_pinata_v3(file_bytes, filename=None):
     """Upload file to Pinata IPFS using V3 API"""
-    url = "https://uploads.pinata.cloud/v3/files"
+    url = f"{PINATA_UPLOADS_BASE}/v3/files"
     
     headers = {
         'Authorization': f'Bearer {PINATA_JWT}'
@@ -491,7 +625,7 @@ def upload_to_pinata_v3(file_bytes, filename=None):
 
 def upload_to_pinata_v2(file_bytes, filename=None):
     """Upload file to Pinata IPFS using V2 API (legacy)"""
-    url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+    url = f"{PINATA_API_BASE}/pinning/pinFileToIPFS"
     
     headers = {
         'pinata_api_key': PINATA_API_KEY,
@@ -593,11 +727,8 @@ def submit_capsule():
 
         # Use a random hex string as the preview filename
         preview_id = secrets.token_hex(16)
-          # Save pixelated image locally (for backwards compatibility)
-        pixelated_dir = "pixelated"
-        os.makedirs(pixelated_dir, exist_ok=True)
-        pixelated_path = os.path.join(pixelated_dir, f"{preview_id}.png")
-        pixelated.save(pixelated_path, format="PNG")
+        # Save pixelated image in blob storage (for backwards compatibility)
+        blob_storage.put("pixelated", f"{preview_id}.png", pixelated_data)
 
         # 2) Register Shutter identity
         reveal_ts = int(request.form.get("revealTimestamp") or time.time() + 30)
@@ -631,18 +762,12 @@ def submit_capsule():
         try:
             print("Uploading pixelated image to IPFS...")
             
-            # Store pixelated image locally in IPFS storage
-            ipfs_dir = "ipfs_storage"
-            os.makedirs(ipfs_dir, exist_ok=True)
-            
             # Generate a local CID for the pixelated image
             pixelated_hash = hashlib.sha256(pixelated_data).hexdigest()
             local_pixelated_cid = f"Qm{pixelated_hash[:44]}"
             
-            # Save locally first
-            local_pixelated_path = os.path.join(ipfs_dir, local_pixelated_cid)
-            with open(local_pixelated_path, "wb") as f:
-                f.write(pixelated_data)
+            # Save to blob storage first
+            blob_storage.put("ipfs", local_pixelated_cid, pixelated_data)
             
             pixelated_cid = local_pixelated_cid
             pixelated_urls = [f"http://localhost:5000/ipfs/{local_pixelated_cid}"]
@@ -654,10 +779,8 @@ def submit_capsule():
                     pinata_pixelated_cid = upload_to_pinata(pixelated_data, f"pixelated_{preview_id}.png")
                     pinata_pixelated_url = get_pinata_gateway_url(pinata_pixelated_cid)
                     
-                    # Also store with Pinata CID locally for faster access
-                    pinata_pixelated_path = os.path.join(ipfs_dir, pinata_pixelated_cid)
-                    with open(pinata_pixelated_path, "wb") as f:
-                        f.write(pixelated_data)
+                    # Also store with Pinata CID for faster access
+                    blob_storage.put("ipfs", pinata_pixelated_cid, pixelated_data)
                     
                     # Use Pinata CID as primary
                     pixelated_cid = pinata_pixelated_cid
@@ -696,6 +819,55 @@ def submit_capsule():
         print("Error in /submit_capsule:", e)
         return {"error": str(e)}, 500
 
+def store_and_pin_blob(file_bytes):
+    """Store an encrypted blob locally under its content hash and pin it to Pinata if configured"""
+    # Generate a deterministic CID-like hash for the content (for local storage)
+    content_hash = hashlib.sha256(file_bytes).hexdigest()
+    local_cid = f"Qm{content_hash[:44]}"  # Simulate IPFS CID format
+    
+    # Store the file with the CID as key (fallback)
+    blob_storage.put("ipfs", local_cid, file_bytes)
+    
+    return pin_stored_blob(file_bytes, local_cid)
+
+def pin_stored_blob(file_bytes, local_cid):
+    """Pin a blob that is already in blob storage and build the upload response"""
+    result = {
+        "cid": local_cid,
+        "local_url": f"http://localhost:5000/ipfs/{local_cid}",
+        "pinata_enabled": PINATA_ENABLED
+    }
+    # Try to upload to Pinata IPFS if configured
+    if PINATA_ENABLED:
+        try:
+            print("Uploading to Pinata IPFS...")
+            pinata_cid = upload_to_pinata(file_bytes)
+            pinata_url = get_pinata_gateway_url(pinata_cid)
+            
+            # Also store the file under the Pinata CID for faster access
+            blob_storage.put("ipfs", pinata_cid, file_bytes)
+            
+            result.update({
+                "pinata_cid": pinata_cid,
+                "pinata_url": pinata_url,
+                "ipfs_urls": [pinata_url, f"http://localhost:5000/ipfs/{pinata_cid}"]
+            })
+            print(f"Successfully uploaded to Pinata: {pinata_cid}")
+            
+            # Use Pinata CID as primary CID if upload successful
+            result["cid"] = pinata_cid
+            
+        except Exception as e:
+            print(f"Pinata upload failed, using local storage only: {e}")
+            result.update({
+                "pinata_error": str(e),
+                "ipfs_urls": [f"http://localhost:5000/ipfs/{local_cid}"]
+            })
+    else:
+        result["ipfs_urls"] = [f"http://localhost:5000/ipfs/{local_cid}"]
+    
+    return result
+
 @app.route("/upload_ipfs", methods=["POST"])
 def upload_ipfs():
     try:
@@ -707,91 +879,118 @@ def upload_ipfs():
         # Convert hex string to bytes
         file_bytes = bytes.fromhex(hex_data[2:])
         
-        # Generate a deterministic CID-like hash for the content (for local storage)
-        content_hash = hashlib.sha256(file_bytes).hexdigest()
-        local_cid = f"Qm{content_hash[:44]}"  # Simulate IPFS CID format
+        return jsonify(store_and_pin_blob(file_bytes))
+        
+    except Exception as e:
+        print("Error in /upload_ipfs:", e)
+        return {"error": str(e)}, 500
+
+# ---------- CHUNKED (RESUMABLE) UPLOADS ----------
+@app.route("/upload_ipfs/sessions", methods=["POST"])
+def create_upload_session():
+    """Open a resumable upload session; the body is JSON {"size": <bytes>}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        session = upload_manager.create_session(data.get("size"))
+        return jsonify({"success": True, **session})
+    except ChunkedUploadError as e:
+        return {"error": str(e)}, e.status_code
+    except Exception as e:
+        print("Error in /upload_ipfs/sessions:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/upload_ipfs/sessions/<session_id>", methods=["GET"])
+def get_upload_session(session_id):
+    """Report received and missing chunks so an interrupted upload can resume"""
+    try:
+        return jsonify({"success": True, **upload_manager.get_status(session_id)})
+    except ChunkedUploadError as e:
+        return {"error": str(e)}, e.status_code
+    except Exception as e:
+        print(f"Error in /upload_ipfs/sessions/{session_id}:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/upload_ipfs/sessions/<session_id>", methods=["DELETE"])
+def abort_upload_session(session_id):
+    """Abandon an upload session and delete its temporary file"""
+    try:
+        upload_manager.discard(session_id)
+        return {"ok": True}
+    except ChunkedUploadError as e:
+        return {"error": str(e)}, e.status_code
+
+@app.route("/upload_ipfs/sessions/<session_id>/chunks/<int:index>", methods=["PUT"])
+def put_upload_chunk(session_id, index):
+    """Store one raw binary chunk (application/octet-stream body)"""
+    try:
+        result = upload_manager.write_chunk(
+            session_id, index, request.get_data(cache=False),
+            expected_sha256=request.headers.get("X-Chunk-Sha256")
+        )
+        return jsonify({"success": True, **result})
+    except ChunkedUploadError as e:
+        return {"error": str(e)}, e.status_code
+    except Exception as e:
+        print(f"Error in /upload_ipfs/sessions/{session_id}/chunks/{index}:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/upload_ipfs/sessions/<session_id>/finalize", methods=["POST"])
+def finalize_upload_session(session_id):
+    """Commit a completed upload to blob storage and pin it, like /upload_ipfs"""
+    upload = None
+    try:
+        upload = upload_manager.finalize(session_id)
+        local_cid = f"Qm{upload['sha256'][:44]}"
         
-        # Store the file locally with the CID as filename (fallback)
-        ipfs_dir = "ipfs_storage"
-        os.makedirs(ipfs_dir, exist_ok=True)
-        file_path = os.path.join(ipfs_dir, local_cid)
+        with open(upload["path"], "rb") as f:
+            file_bytes = f.read()
         
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
+        blob_storage.put_file("ipfs", local_cid, upload["path"])
+        upload_manager.discard(session_id)
         
-        result = {
-            "cid": local_cid,
-            "local_url": f"http://localhost:5000/ipfs/{local_cid}",
-            "pinata_enabled": PINATA_ENABLED
-        }
-          # Try to upload to Pinata IPFS if configured
-        if PINATA_ENABLED:
-            try:
-                print("Uploading to Pinata IPFS...")
-                pinata_cid = upload_to_pinata(file_bytes)
-                pinata_url = get_pinata_gateway_url(pinata_cid)
-                
-                # Also store the file locally with the Pinata CID for faster access
-                pinata_file_path = os.path.join(ipfs_dir, pinata_cid)
-                with open(pinata_file_path, "wb") as f:
-                    f.write(file_bytes)
-                
-                result.update({
-                    "pinata_cid": pinata_cid,
-                    "pinata_url": pinata_url,
-                    "ipfs_urls": [pinata_url, f"http://localhost:5000/ipfs/{pinata_cid}"]
-                })
-                print(f"Successfully uploaded to Pinata: {pinata_cid}")
-                
-                # Use Pinata CID as primary CID if upload successful
-                result["cid"] = pinata_cid
-                
-            except Exception as e:
-                print(f"Pinata upload failed, using local storage only: {e}")
-                result.update({
-                    "pinata_error": str(e),
-                    "ipfs_urls": [f"http://localhost:5000/ipfs/{local_cid}"]
-                })
-        else:
-            result["ipfs_urls"] = [f"http://localhost:5000/ipfs/{local_cid}"]
-            
+        result = pin_stored_blob(file_bytes, local_cid)
+        result["size"] = upload["size"]
         return jsonify(result)
-        
+    except ChunkedUploadError as e:
+        return {"error": str(e)}, e.status_code
     except Exception as e:
-        print("Error in /upload_ipfs:", e)
+        print(f"Error in /upload_ipfs/sessions/{session_id}/finalize:", e)
+        if upload:
+            # Let the client retry the finalize (a no-op once the session was discarded)
+            upload_manager.release_finalize(session_id)
         return {"error": str(e)}, 500
 
 @app.route("/pixelated/<cid>")
 def pixelated(cid):
     """
-    Serve pixelated images from IPFS storage or local storage
-    Priority: Local > IPFS > Generate on-the-fly
+    Serve pixelated images from blob storage
+    Priority: Stored preview > Generate on-the-fly from IPFS storage
     """
     print(f"Pixelated request for CID: {cid}")
+    key = f"{cid}.png"
     
-    # First, try local storage
-    local_path = os.path.join("pixelated", f"{cid}.png")
-    print(f"Checking local pixelated file: {local_path}")
-    
-    if os.path.exists(local_path):
-        print(f"Serving local pixelated file: {local_path}")
-        try:
-            with open(local_path, 'rb') as f:
-                file_data = f.read()
+    try:
+        # Large downloads go straight from the bucket when presigned redirects are enabled
+        presigned = blob_storage.presigned_url("pixelated", key)
+        if presigned and blob_storage.exists("pixelated", key):
+            return redirect(presigned, code=302)
+        
+        file_data = blob_storage.get("pixelated", key)
+        if file_data is not None:
+            print(f"Serving stored pixelated file: {key}")
             return file_data, 200, {'Content-Type': 'image/png'}
-        except Exception as e:
-            print(f"Error reading local pixelated file: {e}")
+    except ValueError:
+        return "Invalid CID", 400
+    except Exception as e:
+        print(f"Error reading stored pixelated file: {e}")
     
     # Try to generate on-the-fly from IPFS storage
-    print(f"Pixelated file not found locally, attempting to generate from IPFS: {cid}")
+    print(f"Pixelated file not found in storage, attempting to generate from IPFS: {cid}")
     try:
         # Try to get the original image from IPFS storage
-        ipfs_path = os.path.join("ipfs_storage", cid)
-        if os.path.exists(ipfs_path):
-            print(f"Found IPFS file: {ipfs_path}")
-            # Read the encrypted/original image
-            with open(ipfs_path, 'rb') as f:
-                image_data = f.read()
+        image_data = blob_storage.get("ipfs", cid)
+        if image_data is not None:
+            print(f"Found IPFS file: {cid}")
             
             # Try to decode as image and pixelate it
             try:
@@ -803,21 +1002,19 @@ def pixelated(cid):
                 pixelated_image.save(buf, format="PNG")
                 pixelated_data = buf.getvalue()
                 
-                # Save locally for future requests
+                # Save for future requests
                 try:
-                    os.makedirs("pixelated", exist_ok=True)
-                    with open(local_path, 'wb') as f:
-                        f.write(pixelated_data)
-                    print(f"Saved generated pixelated image locally: {local_path}")
+                    blob_storage.put("pixelated", key, pixelated_data)
+                    print(f"Saved generated pixelated image: {key}")
                 except Exception as save_error:
-                    print(f"Could not save pixelated image locally: {save_error}")
+                    print(f"Could not save pixelated image: {save_error}")
                 
                 return pixelated_data, 200, {'Content-Type': 'image/png'}
                 
             except Exception as image_error:
                 print(f"Could not process image for pixelation: {image_error}")
         else:
-            print(f"IPFS file not found: {ipfs_path}")
+            print(f"IPFS file not found: {cid}")
     except Exception as e:
         print(f"Error generating pixelated image: {e}")
     
@@ -827,11 +1024,22 @@ def pixelated(cid):
 
 @app.route("/ipfs/<cid>")
 def serve_ipfs(cid):
-    # Serve files from local IPFS storage
-    path = os.path.join("ipfs_storage", cid)
-    print(f"IPFS request for CID: {cid}, looking for file: {path}")
-    if not os.path.exists(path):
-        print(f"IPFS file not found locally: {path}")
+    # Serve files from blob storage
+    print(f"IPFS request for CID: {cid}")
+    try:
+        presigned = blob_storage.presigned_url("ipfs", cid)
+        if presigned and blob_storage.exists("ipfs", cid):
+            # Redirect large downloads to the bucket instead of proxying them
+            return redirect(presigned, code=302)
+        file_data = blob_storage.get("ipfs", cid)
+    except ValueError:
+        return "Invalid CID", 400
+    except Exception as e:
+        print(f"Error serving IPFS file: {e}")
+        return "Error reading file", 500
+    
+    if file_data is None:
+        print(f"IPFS file not found in storage: {cid}")
         
         # If Pinata is enabled, try to fetch from Pinata gateway
         if PINATA_ENABLED:
@@ -841,10 +1049,8 @@ def serve_ipfs(cid):
                 response = requests.get(pinata_url, timeout=10)
                 response.raise_for_status()
                 
-                # Cache the file locally for future requests
-                os.makedirs("ipfs_storage", exist_ok=True)
-                with open(path, 'wb') as f:
-                    f.write(response.content)
+                # Cache the file for future requests
+                blob_storage.put("ipfs", cid, response.content)
                 print(f"Successfully fetched and cached from Pinata: {cid}")
                 
                 return response.content, 200, {'Content-Type': 'application/octet-stream'}
@@ -853,15 +1059,8 @@ def serve_ipfs(cid):
         
         return "Not found", 404
     
-    print(f"Serving IPFS file: {path}")
-    try:
-        # Read file and return with proper headers
-        with open(path, 'rb') as f:
-            file_data = f.read()
-        return file_data, 200, {'Content-Type': 'application/octet-stream'}
-    except Exception as e:
-        print(f"Error serving IPFS file: {e}")
-        return "Error reading file", 500
+    print(f"Serving IPFS file: {cid}")
+    return file_data, 200, {'Content-Type': 'application/octet-stream'}
 
 @app.route("/save_pixelated", methods=["POST"])
 def save_pixelated():
@@ -872,23 +1071,19 @@ def save_pixelated():
         print(f"save_pixelated called with cid={cid}, preview_id={preview_id}")
         if not cid or not preview_id:
             return {"error": "Missing cid or preview_id"}, 400
-            
-        src = os.path.join("pixelated", f"{preview_id}.png")
-        dst = os.path.join("pixelated", f"{cid}.png")
+        
+        src = f"{preview_id}.png"
+        dst = f"{cid}.png"
         print(f"Renaming {src} to {dst}")
         
-        if not os.path.exists(src):
-            print(f"Source file {src} does not exist")
+        if not blob_storage.rename("pixelated", src, dst):
+            print(f"Source preview {src} does not exist")
             return {"error": "Preview not found"}, 404
-            
-        # Read the pixelated image data
-        with open(src, 'rb') as f:
-            pixelated_data = f.read()
-              # Rename locally
-        os.rename(src, dst)
         print(f"Successfully renamed {src} to {dst}")
         
         return {"ok": True}
+    except ValueError as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         print("Error in /save_pixelated:", e)
         return {"error": str(e)}, 500
@@ -906,44 +1101,119 @@ def get_image_processing_config():
         return jsonify({"error": str(e)}), 500
 
 # ---------- DATABASE API ENDPOINTS ----------
+# CAPSULE_API_FIELDS and SUMMARY_API_FIELDS (the list endpoints' default) come from
+# the database module, which stores each capsule's summary as ready-to-send JSON;
+# /api/capsules/<id> always returns every field
+
+def parse_fields_param():
+    """
+    API fields requested with ?fields=a,b,c (or fields=all), defaulting to the summary.
+    Raises ValueError for unknown field names.
+    """
+    value = request.args.get("fields", "").strip()
+    if not value:
+        return SUMMARY_API_FIELDS
+    if value == "all":
+        return list(CAPSULE_API_FIELDS)
+    fields = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in CAPSULE_API_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def capsule_columns(fields):
+    """Database columns needed for the given API fields"""
+    return [CAPSULE_API_FIELDS[name] for name in fields]
+
+def capsule_source(columns):
+    """The read model when enabled and it holds the requested columns, otherwise the database"""
+    if read_model is not None and read_model.covers(columns):
+        return read_model
+    return db
+
+def query_columns(fields, source):
+    """Columns to read from source: the stored summary JSON when the database serves the default fields"""
+    if source is db and fields == SUMMARY_API_FIELDS:
+        return [SUMMARY_JSON_COLUMN]
+    return capsule_columns(fields)
+
+def format_capsule(capsule, fields=None):
+    """Format a database row for frontend compatibility (camelCase keys)"""
+    formatted = {}
+    for name in fields or CAPSULE_API_FIELDS:
+        value = capsule.get(CAPSULE_API_FIELDS[name])
+        if name == "encryptedStory" and isinstance(value, bytes):
+            value = value.hex()
+        elif name == "isRevealed":
+            value = bool(value)
+        elif name == "pixelatedImageCID":
+            value = value or ""
+        formatted[name] = value
+    return formatted
+
+def json_text_response(body):
+    return app.response_class(body, mimetype="application/json")
+
+def summary_json(capsule):
+    """A row's stored summary JSON, or its formatted summary if the stored copy is missing"""
+    if capsule[SUMMARY_JSON_COLUMN] is not None:
+        return capsule[SUMMARY_JSON_COLUMN]
+    return json.dumps(format_capsule(db.get_capsule(capsule["id"]) or capsule, SUMMARY_API_FIELDS))
+
+def capsule_list_response(capsules, fields, **payload):
+    """
+    JSON response {"success": true, "capsules": [...], **payload}. Rows read with
+    SUMMARY_JSON_COLUMN are spliced in as stored instead of being formatted and
+    encoded again.
+    """
+    if capsules and SUMMARY_JSON_COLUMN in capsules[0]:
+        envelope = json.dumps({"success": True, **payload})
+        items = ",".join(summary_json(capsule) for capsule in capsules)
+        return json_text_response(f'{envelope[:-1]}, "capsules": [{items}]}}')
+    return jsonify({
+        "success": True,
+        "capsules": [format_capsule(capsule, fields) for capsule in capsules],
+        **payload
+    })
+
 @app.route("/api/capsules", methods=["GET"])
 def get_capsules():
-    """Get capsules from database with pagination and optional tag filtering"""
+    """
+    Get capsules from database with pagination and optional tag filtering.
+    Pass after_id (the previous response's next_cursor) for stable keyset
+    pagination; offset is still accepted for older clients. fields= selects
+    the returned fields (summary by default).
+    """
     try:
+        try:
+            fields = parse_fields_param()
+        except ValueError as e:
+            return {"error": str(e)}, 400
         offset = int(request.args.get("offset", 0))
         limit = int(request.args.get("limit", 10))
         revealed_only = request.args.get("revealed_only", "false").lower() == "true"
         tag = request.args.get("tag", "").strip()
+        after_id = request.args.get("after_id", type=int)
         
         # Pass tag filter to database if provided
         tag_filter = tag if tag else None
-        capsules = db.get_capsules(offset=offset, limit=limit, revealed_only=revealed_only, tag=tag_filter)
-        total_count = db.get_capsule_count()# Format capsules for frontend compatibility
-        formatted_capsules = []
-        for capsule in capsules:
-            formatted_capsule = {
-                "id": capsule["id"],
-                "creator": capsule["creator"],
-                "title": capsule["title"],
-                "tags": capsule["tags"],
-                "encryptedStory": capsule["encrypted_story"].hex() if isinstance(capsule["encrypted_story"], bytes) else capsule["encrypted_story"],
-                "decryptedStory": capsule["decrypted_story"],
-                "isRevealed": bool(capsule["is_revealed"]),
-                "revealTime": capsule["reveal_time"],
-                "shutterIdentity": capsule["shutter_identity"],
-                "imageCID": capsule["image_cid"],
-                "pixelatedImageCID": capsule.get("pixelated_image_cid", "")
-            }
-            formatted_capsules.append(formatted_capsule)
+        source = capsule_source(capsule_columns(fields))
+        # One extra row tells whether another page exists, in offset and cursor mode
+        # alike (total_count ignores the tag and revealed filters)
+        capsules = source.get_capsules(offset=offset, limit=limit + 1, revealed_only=revealed_only, tag=tag_filter,
+                                       after_id=after_id, columns=query_columns(fields, source))
+        has_more = limit > 0 and len(capsules) > limit
+        capsules = capsules[:max(limit, 0)]
+        total_count = source.get_capsule_count()
         
-        return jsonify({
-            "success": True,
-            "capsules": formatted_capsules,
-            "total_count": total_count,
-            "offset": offset,
-            "limit": limit,
-            "has_more": (offset + limit) < total_count
-        })
+        return capsule_list_response(
+            capsules, fields,
+            total_count=total_count,
+            offset=offset,
+            limit=limit,
+            has_more=has_more,
+            next_cursor=capsules[-1]["id"] if has_more else None
+        )
         
     except Exception as e:
         print("Error in /api/capsules:", e)
@@ -953,28 +1223,19 @@ def get_capsules():
 def get_capsule(capsule_id):
     """Get a single capsule by ID"""
     try:
-        capsule = db.get_capsule(capsule_id)
+        capsule = db.get_capsule(capsule_id, columns=[SUMMARY_JSON_COLUMN, "encrypted_story"])
         
         if not capsule:
-            return {"error": "Capsule not found"}, 404        # Format for frontend compatibility
-        formatted_capsule = {
-            "id": capsule["id"],
-            "creator": capsule["creator"],
-            "title": capsule["title"],
-            "tags": capsule["tags"],
-            "encryptedStory": capsule["encrypted_story"].hex() if isinstance(capsule["encrypted_story"], bytes) else capsule["encrypted_story"],
-            "decryptedStory": capsule["decrypted_story"],
-            "isRevealed": bool(capsule["is_revealed"]),
-            "revealTime": capsule["reveal_time"],
-            "shutterIdentity": capsule["shutter_identity"],
-            "imageCID": capsule["image_cid"],
-            "pixelatedImageCID": capsule.get("pixelated_image_cid", "")
-        }
+            return {"error": "Capsule not found"}, 404
+        encrypted_story = capsule["encrypted_story"]
+        if encrypted_story is None:
+            # Compacted: archived in blob storage, or dropped (null)
+            encrypted_story = load_archived_ciphertext(blob_storage, capsule_id)
         
-        return jsonify({
-            "success": True,
-            "capsule": formatted_capsule
-        })
+        # The stored summary with the ciphertext appended
+        encrypted_json = json.dumps(encrypted_story.hex() if encrypted_story is not None else None)
+        detail = f'{summary_json(capsule)[:-1]}, "encryptedStory": {encrypted_json}}}'
+        return json_text_response(f'{{"success": true, "capsule": {detail}}}')
         
     except Exception as e:
         print(f"Error in /api/capsules/{capsule_id}:", e)
@@ -982,39 +1243,38 @@ def get_capsule(capsule_id):
 
 @app.route("/api/capsules/search", methods=["GET"])
 def search_capsules():
-    """Search capsules by title, tags, or creator"""
+    """Full-text search over title, tags, creator and revealed story, ranked by relevance"""
     try:
         query = request.args.get("q", "").strip()
-        limit = int(request.args.get("limit", 10))
+        limit = max(1, min(int(request.args.get("limit", 10)), 100))
+        cursor = request.args.get("cursor")
         
         if not query:
             return {"error": "Search query is required"}, 400
         
-        capsules = db.search_capsules(query, limit=limit)
+        try:
+            fields = parse_fields_param()
+            after = None
+            if cursor:
+                try:
+                    after = decode_cursor(cursor, size=3)
+                except ValueError:
+                    # Cursors issued before search windows: [search_rank, id]
+                    after = decode_cursor(cursor)
+        except ValueError as e:
+            return {"error": str(e)}, 400
         
-        # Format capsules for frontend
-        formatted_capsules = []
-        for capsule in capsules:
-            formatted_capsule = {
-                "id": capsule["id"],
-                "creator": capsule["creator"],
-                "title": capsule["title"],
-                "tags": capsule["tags"],
-                "encryptedStory": capsule["encrypted_story"].hex() if isinstance(capsule["encrypted_story"], bytes) else capsule["encrypted_story"],
-                "decryptedStory": capsule["decrypted_story"],
-                "isRevealed": bool(capsule["is_revealed"]),
-                "revealTime": capsule["reveal_time"],
-                "shutterIdentity": capsule["shutter_identity"],
-                "imageCID": capsule["image_cid"]
-            }
-            formatted_capsules.append(formatted_capsule)
+        capsules = db.search_capsules(query, limit=limit, after=after, columns=query_columns(fields, db))
+        next_cursor = None
+        if len(capsules) == limit:
+            next_cursor = encode_cursor([capsules[-1]["search_rank"], capsules[-1]["id"], capsules[-1]["search_window"]])
         
-        return jsonify({
-            "success": True,
-            "capsules": formatted_capsules,
-            "query": query,
-            "count": len(formatted_capsules)
-        })
+        return capsule_list_response(
+            capsules, fields,
+            query=query,
+            count=len(capsules),
+            next_cursor=next_cursor
+        )
         
     except Exception as e:
         print("Error in /api/capsules/search:", e)
@@ -1022,45 +1282,90 @@ def search_capsules():
 
 @app.route("/api/capsules/creator/<creator_address>", methods=["GET"])
 def get_capsules_by_creator(creator_address):
-    """Get capsules created by a specific address"""
+    """
+    Get capsules created by an address (matched in any casing), newest first.
+    Pass after_id (the previous response's next_cursor) for the next page.
+    """
     try:
         limit = int(request.args.get("limit", 10))
+        after_id = request.args.get("after_id", type=int)
+        try:
+            fields = parse_fields_param()
+        except ValueError as e:
+            return {"error": str(e)}, 400
         
-        capsules = db.get_capsules_by_creator(creator_address, limit=limit)
-        
-        # Format capsules for frontend
-        formatted_capsules = []
-        for capsule in capsules:
-            formatted_capsule = {
-                "id": capsule["id"],
-                "creator": capsule["creator"],
-                "title": capsule["title"],
-                "tags": capsule["tags"],
-                "encryptedStory": capsule["encrypted_story"],
-                "decryptedStory": capsule["decrypted_story"],
-                "isRevealed": bool(capsule["is_revealed"]),
-                "revealTime": capsule["reveal_time"],
-                "shutterIdentity": capsule["shutter_identity"],
-                "imageCID": capsule["image_cid"]
-            }
-            formatted_capsules.append(formatted_capsule)
+        source = capsule_source(capsule_columns(fields))
+        capsules = source.get_capsules_by_creator(creator_address, limit=limit, after_id=after_id,
+                                                  columns=query_columns(fields, source))
+        next_cursor = capsules[-1]["id"] if len(capsules) == limit and limit > 0 else None
         
-        return jsonify({
-            "success": True,
-            "capsules": formatted_capsules,
-            "creator": creator_address,
-            "count": len(formatted_capsules)
-        })
+        return capsule_list_response(
+            capsules, fields,
+            creator=creator_address,
+            count=len(capsules),
+            total_count=source.get_creator_count(creator_address),
+            next_cursor=next_cursor
+        )
         
     except Exception as e:
         print(f"Error in /api/capsules/creator/{creator_address}:", e)
         return {"error": str(e)}, 500
 
+def reveal_window_response(fetch, **extra):
+    """
+    Page of a reveal-window query as a JSON response; fetch(limit, after, columns)
+    returns the rows. Pages continue with the previous response's next_cursor.
+    """
+    limit = min(int(request.args.get("limit", 10)), 100)
+    cursor = request.args.get("cursor")
+    try:
+        fields = parse_fields_param()
+        after = [int(value) for value in decode_cursor(cursor)] if cursor else None
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    capsules = fetch(limit, after, query_columns(fields, db))
+    next_cursor = None
+    if len(capsules) == limit and limit > 0:
+        next_cursor = encode_cursor([capsules[-1]["reveal_time"], capsules[-1]["id"]])
+
+    return capsule_list_response(
+        capsules, fields,
+        count=len(capsules),
+        next_cursor=next_cursor,
+        timestamp=int(time.time()),
+        **extra
+    )
+
+@app.route("/api/capsules/reveals/upcoming", methods=["GET"])
+def get_upcoming_reveals():
+    """Unrevealed capsules that become revealable within the next ?hours= (default 24), soonest first"""
+    try:
+        hours = min(float(request.args.get("hours", 24)), 24 * 366)
+        return reveal_window_response(
+            lambda limit, after, columns: db.get_upcoming_reveals(hours=hours, limit=limit, after=after, columns=columns),
+            hours=hours
+        )
+    except Exception as e:
+        print("Error in /api/capsules/reveals/upcoming:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/api/capsules/reveals/overdue", methods=["GET"])
+def get_overdue_reveals():
+    """Capsules past their reveal time that have not been revealed yet, longest overdue first"""
+    try:
+        return reveal_window_response(
+            lambda limit, after, columns: db.get_overdue_reveals(limit=limit, after=after, columns=columns)
+        )
+    except Exception as e:
+        print("Error in /api/capsules/reveals/overdue:", e)
+        return {"error": str(e)}, 500
+
 @app.route("/api/capsules/count", methods=["GET"])
 def get_capsule_count():
     """Get total number of capsules in the database"""
     try:
-        total_count = db.get_capsule_count()
+        total_count = (read_model or db).get_capsule_count()
         
         return jsonify({
             "success": True,
@@ -1111,11 +1416,11 @@ def force_sync():
 
 @app.route("/api/stats", methods=["GET"])
 def get_stats():
-    """Get general statistics"""
+    """Get general statistics (served from counters maintained on every write)"""
     try:
-        total_capsules = db.get_capsule_count()
-        recent_capsules = len(db.get_recent_capsules(hours=24, limit=100))
-        revealed_capsules = len(db.get_capsules(limit=1000, revealed_only=True))
+        stats = db.get_stats()
+        if not stats:
+            return {"error": "Statistics unavailable"}, 500
         
         # Get sync health if available
         sync_health = None
@@ -1128,10 +1433,12 @@ def get_stats():
         return jsonify({
             "success": True,
             "statistics": {
-                "total_capsules": total_capsules,
-                "revealed_capsules": revealed_capsules,
-                "unrevealed_capsules": total_capsules - revealed_capsules,
-                "recent_capsules_24h": recent_capsules,
+                "total_capsules": stats["total"],
+                "revealed_capsules": stats["revealed"],
+                "unrevealed_capsules": stats["unrevealed"],
+                "recent_capsules_24h": stats["recent_24h"],
+                "recent_reveals_24h": stats["revealed_24h"],
+                "daily_created": stats["daily_created"],
                 "database_healthy": sync_health is not None and sync_health.get("is_healthy", False),
                 "last_sync": sync_health.get("last_sync_time") if sync_health else None
             }
@@ -1185,6 +1492,163 @@ def test_speed_comparison():
         print("Error in /api/test/speed-comparison:", e)
         return {"error": str(e)}, 500
 
+# ---------- ADMIN ENDPOINTS ----------
+@app.route("/api/admin/pins/reconcile", methods=["POST"])
+@require_admin_token
+def reconcile_pins():
+    """
+    Start checking every capsule CID against the Pinata pin list and re-pinning
+    gaps from blob storage. The pass lists every pin and uploads the gaps, which
+    takes longer than a request may, so it runs in the background: returns 202,
+    or 409 while a pass is running. GET this URL for its status and report.
+    """
+    try:
+        if not pin_reconciler:
+            return {"error": "Pinata not configured"}, 503
+        
+        dry_run = request.args.get("dry_run", "false").lower() == "true"
+        workers = min(int(request.args.get("workers", 4)), 16)
+        
+        status = pin_reconciler.start(dry_run=dry_run, max_workers=workers)
+        if status is None:
+            return {"error": "A pin reconciliation pass is already running", "status": pin_reconciler.status()}, 409
+        return jsonify({"success": True, "status": status}), 202
+        
+    except Exception as e:
+        print("Error in /api/admin/pins/reconcile:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/api/admin/pins/reconcile", methods=["GET"])
+@require_admin_token
+def reconcile_pins_status():
+    """Status of the latest pin reconciliation pass, with its report once it finished"""
+    try:
+        if not pin_reconciler:
+            return {"error": "Pinata not configured"}, 503
+        return jsonify({"success": True, "status": pin_reconciler.status()})
+        
+    except Exception as e:
+        print("Error in /api/admin/pins/reconcile:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/api/admin/export.car", methods=["GET"])
+@require_admin_token
+def export_car():
+    """
+    Stream the images and previews of capsules with id > since_id as one CARv1 archive.
+    Each request covers at most limit (CAR_EXPORT_MAX_CAPSULES) capsules; while
+    X-Export-Complete is false, request the next part with since_id=X-Export-Last-Capsule-Id.
+    """
+    try:
+        since_id = int(request.args.get("since_id", -1))
+        limit = min(int(request.args.get("limit", CAR_EXPORT_MAX_CAPSULES)), CAR_EXPORT_MAX_CAPSULES)
+        if limit < 1:
+            return {"error": "limit must be at least 1"}, 400
+        
+        exporter = CarExporter(db, blob_storage, gateway_url_fn=get_pinata_gateway_url, gateway_timeout=5)
+        plan = exporter.prepare(since_id=since_id, limit=limit, time_budget=CAR_EXPORT_PREPARE_SECONDS)
+        summary = plan["summary"]
+        
+        headers = {
+            "Content-Disposition": f'attachment; filename="capsules_since_{since_id}.car"',
+            "X-Export-Blobs": str(summary["blobs"]),
+            "X-Export-Missing": str(len(summary["missing"])),
+            "X-Export-Last-Capsule-Id": str(summary["last_capsule_id"]),
+            "X-Export-Complete": str(summary["complete"]).lower()
+        }
+        response = Response(stream_with_context(exporter.stream(plan)), mimetype=CAR_MIME_TYPE, headers=headers)
+        # Spooled downloads are released even if the body is never sent
+        response.call_on_close(lambda: exporter.close_plan(plan))
+        return response
+        
+    except Exception as e:
+        print("Error in /api/admin/export.car:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/api/admin/query-stats", methods=["GET"])
+@require_admin_token
+def query_stats():
+    """Per-statement latency histograms of the database, most expensive first (?reset=true clears them)"""
+    try:
+        if db.query_stats is None:
+            return {"error": f"Query stats not available for the {db.name} backend"}, 501
+
+        limit = int(request.args.get("limit", 50))
+        statements = db.query_stats.snapshot(limit=limit)
+        if request.args.get("reset", "false").lower() == "true":
+            db.query_stats.reset()
+
+        return jsonify({
+            "success": True,
+            "backend": db.name,
+            "slow_query_ms": db.query_stats.slow_query_ms,
+            "writer": db.writer.stats() if db.writer else None,
+            "statements": statements
+        })
+
+    except Exception as e:
+        print("Error in /api/admin/query-stats:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/api/admin/db-snapshot", methods=["POST"])
+@require_admin_token
+def create_db_snapshot():
+    """Take a database snapshot now (e.g. before a deploy restarts the dynos)"""
+    try:
+        if not db_snapshotter:
+            return {"error": "Database snapshots not enabled (set DB_SNAPSHOT_INTERVAL_MINUTES, SQLite only)"}, 501
+
+        return jsonify({
+            "success": True,
+            "snapshot": db_snapshotter.create_snapshot()
+        })
+
+    except Exception as e:
+        print("Error in /api/admin/db-snapshot:", e)
+        return {"error": str(e)}, 500
+
+@app.route("/api/admin/compact-ciphertext", methods=["POST"])
+@require_admin_token
+def compact_ciphertext():
+    """
+    Archive (mode=archive, default) or drop (mode=drop) the ciphertext of revealed
+    capsules and vacuum the freed pages. dry_run=true only counts them.
+    
+    Each call covers at most COMPACTION_REQUEST_MAX_CAPSULES capsules; while
+    report.complete is false, call again with after_id=report.next_after_id.
+    A database file that still needs its one-off full VACUUM
+    (report.vacuum.needs_full_vacuum) is converted by the daily pass or by
+    python backend/ciphertext_compactor.py, not here. Returns 409 while
+    another pass is running.
+    """
+    try:
+        if not ciphertext_compactor:
+            return {"error": f"Ciphertext compaction is not supported by the {db.name} database backend"}, 501
+        mode = request.args.get("mode", "archive")
+        if mode not in ("archive", "drop"):
+            return {"error": "mode must be archive or drop"}, 400
+        dry_run = request.args.get("dry_run", "false").lower() == "true"
+        min_age_days = float(request.args.get("min_age_days", CIPHERTEXT_COMPACTION_MIN_AGE_DAYS))
+        after_id = int(request.args.get("after_id", -1))
+
+        report = ciphertext_compactor.compact(
+            dry_run=dry_run, mode=mode, min_age_seconds=int(min_age_days * 86400), after_id=after_id,
+            max_capsules=COMPACTION_REQUEST_MAX_CAPSULES, time_budget=COMPACTION_REQUEST_SECONDS,
+            max_vacuum_pages=COMPACTION_REQUEST_VACUUM_PAGES, full_vacuum=False, blocking=False
+        )
+        return jsonify({
+            "success": True,
+            "report": report
+        })
+
+    except CompactionInProgress as e:
+        return {"error": str(e)}, 409
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        print("Error in /api/admin/compact-ciphertext:", e)
+        return {"error": str(e)}, 500
+
 @app.route("/debug/contract")
 def debug_contract():
     """Debug endpoint to show current contract configuration"""
@@ -0,0 +1,274 @@
+# blob_storage.py - Pluggable storage for encrypted images and pixelated previews
+import os
+import re
+import shutil
+import tempfile
+import logging
+from typing import Optional, Iterator
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Blob keys are CIDs or generated file names - never paths
+_VALID_KEY_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+# Default local directories, kept compatible with the pre-existing layout
+LOCAL_NAMESPACE_DIRS = {
+    "ipfs": "ipfs_storage",
+    "pixelated": "pixelated",
+    "snapshots": "db_snapshots",
+    "ciphertext": "ciphertext_archive",
+    "reports": "admin_reports"
+}
+
+
+def validate_key(key: str) -> str:
+    if not key or not _VALID_KEY_RE.match(key) or key in (".", ".."):
+        raise ValueError(f"Invalid blob key: {key!r}")
+    return key
+
+
+class BlobStorage:
+    """
+    Interface for blob storage backends.
+
+    Blobs are addressed by (namespace, key): namespace "ipfs" holds encrypted
+    images keyed by CID, "pixelated" holds preview PNGs keyed by file name,
+    "snapshots" holds gzipped SQLite database snapshots and their manifest,
+    "ciphertext" archived capsule ciphertext and "reports" the status of
+    background admin jobs.
+    """
+    name = "base"
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """Return the blob contents, or None if it does not exist"""
+        raise NotImplementedError
+
+    def put(self, namespace: str, key: str, data: bytes):
+        """Store a blob, replacing any existing one"""
+        raise NotImplementedError
+
+    def put_file(self, namespace: str, key: str, path: str):
+        """Store a local file as a blob; the file is consumed (moved or deleted)"""
+        raise NotImplementedError
+
+    def exists(self, namespace: str, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def rename(self, namespace: str, src_key: str, dst_key: str) -> bool:
+        """Rename a blob; returns False if the source does not exist"""
+        raise NotImplementedError
+
+    def iter_chunks(self, namespace: str, key: str, chunk_size: int = 256 * 1024) -> Optional[Iterator[bytes]]:
+        """Stream a blob in chunks without loading it fully, or None if it does not exist"""
+        raise NotImplementedError
+
+    def presigned_url(self, namespace: str, key: str, expires_in: int = 3600) -> Optional[str]:
+        """Direct download URL that bypasses this process, if the backend supports it"""
+        return None
+
+
+class LocalBlobStorage(BlobStorage):
+    """Blobs stored as files on local disk (ephemeral on Heroku dynos)"""
+    name = "local"
+
+    def __init__(self, root_dir: str = ".", namespace_dirs: Optional[dict] = None):
+        self.root_dir = root_dir
+        self.namespace_dirs = namespace_dirs or LOCAL_NAMESPACE_DIRS
+
+    def _path(self, namespace: str, key: str) -> str:
+        directory = os.path.join(self.root_dir, self.namespace_dirs.get(namespace, namespace))
+        return os.path.join(directory, validate_key(key))
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(namespace, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, namespace: str, key: str, data: bytes):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers never see a partially written blob; a unique
+        # tmp file per call keeps concurrent writers of one key from interleaving
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def put_file(self, namespace: str, key: str, path: str):
+        target = self._path(namespace, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError:
+            # Different filesystem - fall back to copying
+            shutil.move(path, target)
+
+    def exists(self, namespace: str, key: str) -> bool:
+        return os.path.exists(self._path(namespace, key))
+
+    def delete(self, namespace: str, key: str):
+        try:
+            os.remove(self._path(namespace, key))
+        except FileNotFoundError:
+            pass
+
+    def rename(self, namespace: str, src_key: str, dst_key: str) -> bool:
+        src = self._path(namespace, src_key)
+        if not os.path.exists(src):
+            return False
+        os.replace(src, self._path(namespace, dst_key))
+        return True
+
+    def iter_chunks(self, namespace: str, key: str, chunk_size: int = 256 * 1024) -> Optional[Iterator[bytes]]:
+        path = self._path(namespace, key)
+        if not os.path.exists(path):
+            return None
+
+        def generate():
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(chunk_size), b""):
+                    yield block
+        return generate()
+
+
+class S3BlobStorage(BlobStorage):
+    """
+    Blobs stored in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Survives dyno restarts and is shared between web dynos. With presigned
+    redirects enabled, downloads go straight from the bucket to the client.
+    """
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, access_key: Optional[str] = None,
+                 secret_key: Optional[str] = None, presigned_redirects: bool = False):
+        """
+        Args:
+            bucket: Bucket name
+            prefix: Key prefix inside the bucket (e.g. "mainnet/")
+            endpoint_url: Custom endpoint for S3-compatible services such as MinIO
+            region: Bucket region
+            access_key: Access key id (defaults to the boto3 credential chain)
+            secret_key: Secret access key
+            presigned_redirects: Whether routes should redirect downloads to presigned URLs
+        """
+        # boto3 is only needed when the S3 backend is selected
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presigned_redirects = presigned_redirects
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(signature_version="s3v4", retries={"max_attempts": 3})
+        )
+        logger.info(f"S3 blob storage configured: bucket={bucket}, prefix={prefix!r}, endpoint={endpoint_url or 'aws'}")
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}/{validate_key(key)}"
+
+    def _is_missing(self, error) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(namespace, key))
+            return response["Body"].read()
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def put(self, namespace: str, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(namespace, key), Body=data,
+                               ContentType=self._content_type(namespace))
+
+    def put_file(self, namespace: str, key: str, path: str):
+        self.client.upload_file(path, self.bucket, self._key(namespace, key),
+                                ExtraArgs={"ContentType": self._content_type(namespace)})
+        os.remove(path)
+
+    def exists(self, namespace: str, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(namespace, key))
+            return True
+        except ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+
+    def delete(self, namespace: str, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(namespace, key))
+
+    def rename(self, namespace: str, src_key: str, dst_key: str) -> bool:
+        if not self.exists(namespace, src_key):
+            return False
+        self.client.copy_object(Bucket=self.bucket, Key=self._key(namespace, dst_key),
+                                CopySource={"Bucket": self.bucket, "Key": self._key(namespace, src_key)})
+        self.delete(namespace, src_key)
+        return True
+
+    def iter_chunks(self, namespace: str, key: str, chunk_size: int = 256 * 1024) -> Optional[Iterator[bytes]]:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(namespace, key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return response["Body"].iter_chunks(chunk_size)
+
+    def presigned_url(self, namespace: str, key: str, expires_in: int = 3600) -> Optional[str]:
+        if not self.presigned_redirects:
+            return None
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(namespace, key)},
+            ExpiresIn=expires_in
+        )
+
+    def _content_type(self, namespace: str) -> str:
+        return "image/png" if namespace == "pixelated" else "application/octet-stream"
+
+
+def create_blob_storage_from_env() -> BlobStorage:
+    """Build the storage backend selected by BLOB_STORAGE_BACKEND (local or s3)"""
+    backend = os.environ.get("BLOB_STORAGE_BACKEND", "local").lower()
+
+    if backend == "s3":
+        bucket = os.environ.get("AWS_BUCKET_NAME")
+        if not bucket:
+            raise ValueError("BLOB_STORAGE_BACKEND=s3 requires AWS_BUCKET_NAME")
+        return S3BlobStorage(
+            bucket=bucket,
+            prefix=os.environ.get("S3_KEY_PREFIX", ""),
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+            region=os.environ.get("AWS_REGION") or None,
+            access_key=os.environ.get("AWS_ACCESS_KEY_ID") or None,
+            secret_key=os.environ.get("AWS_SECRET_ACCESS_KEY") or None,
+            presigned_redirects=os.environ.get("S3_PRESIGNED_REDIRECTS", "false").lower() == "true"
+        )
+
+    if backend != "local":
+        raise ValueError(f"Unknown BLOB_STORAGE_BACKEND: {backend}")
+    return LocalBlobStorage(os.environ.get("LOCAL_BLOB_ROOT", "."))
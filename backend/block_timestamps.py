@@ -0,0 +1,98 @@
+# block_timestamps.py - Block timestamp lookups for the sync, batched over JSON-RPC and cached
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BlockTimestampError(Exception):
+    """A block header could not be fetched; the synced range must be retried"""
+
+
+class BlockTimestampCache:
+    """
+    Timestamps of blocks by number, for dating synced events.
+
+    Blocks not in the cache are fetched with eth_getBlockByNumber (headers
+    only), up to batch_size per HTTP request as a JSON-RPC batch, so a sync
+    range costs one round trip per batch_size distinct blocks. Timestamps
+    are kept in an LRU cache of max_entries blocks. Providers that reject
+    batch requests are queried one block at a time from then on.
+    """
+    def __init__(self, rpc_url: str, batch_size: int = 100, max_entries: int = 100_000,
+                 timeout: float = 30, session: Optional[requests.Session] = None):
+        self.rpc_url = rpc_url
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.batch_supported = True
+        self.requests_made = 0
+        self._cache: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_timestamps(self, block_numbers: Iterable[int]) -> Dict[int, int]:
+        """
+        Unix timestamps of the given blocks
+
+        Raises:
+            BlockTimestampError: If any header cannot be fetched
+        """
+        timestamps, missing = {}, []
+        with self._lock:
+            for number in sorted(set(block_numbers)):
+                if number in self._cache:
+                    self._cache.move_to_end(number)
+                    timestamps[number] = self._cache[number]
+                else:
+                    missing.append(number)
+
+        for start in range(0, len(missing), self.batch_size):
+            fetched = self._fetch(missing[start:start + self.batch_size])
+            timestamps.update(fetched)
+            with self._lock:
+                self._cache.update(fetched)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return timestamps
+
+    def _fetch(self, numbers: List[int]) -> Dict[int, int]:
+        if not self.batch_supported or len(numbers) == 1:
+            return {number: self._timestamp(number, self._post(self._request(0, number))) for number in numbers}
+
+        replies = self._post([self._request(index, number) for index, number in enumerate(numbers)])
+        if not isinstance(replies, list):
+            # A single error object instead of a list: the provider does not take batches
+            logger.warning(f"RPC provider rejected a batch request ({replies}), fetching block headers one by one")
+            self.batch_supported = False
+            return self._fetch(numbers)
+
+        by_id = {reply.get("id"): reply for reply in replies if isinstance(reply, dict)}
+        return {number: self._timestamp(number, by_id.get(index)) for index, number in enumerate(numbers)}
+
+    @staticmethod
+    def _request(request_id: int, number: int) -> dict:
+        return {"jsonrpc": "2.0", "id": request_id, "method": "eth_getBlockByNumber", "params": [hex(number), False]}
+
+    def _post(self, payload):
+        self.requests_made += 1
+        try:
+            response = self.session.post(self.rpc_url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise BlockTimestampError(f"Block header request failed: {e}")
+
+    @staticmethod
+    def _timestamp(number: int, reply: Optional[dict]) -> int:
+        block = (reply or {}).get("result")
+        if not block:
+            error = (reply or {}).get("error", "no response")
+            raise BlockTimestampError(f"Header of block {number} unavailable: {error}")
+        return int(block["timestamp"], 16)
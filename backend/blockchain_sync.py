@@ -6,7 +6,7 @@ import logging
 from typing import Optional, Dict, Any
 from web3 import Web3
 from web3.contract import Contract
-from database import CapsuleDatabase
+from database import BaseCapsuleDatabase
 import json
 
 # Setup logging
@@ -14,7 +14,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class BlockchainSyncService:
-    def __init__(self, rpc_url: str, contract_address: str, contract_abi: list, db: CapsuleDatabase):
+    def __init__(self, rpc_url: str, contract_address: str, contract_abi: list, db: BaseCapsuleDatabase):
         """
         Initialize blockchain sync service
         
@@ -5,7 +5,9 @@ import logging
 from typing import Optional, Dict, Any, List
 from web3 import Web3
 from web3.datastructures import AttributeDict
-from database import CapsuleDatabase
+from database import BaseCapsuleDatabase
+from read_model import CapsuleReadModel
+from block_timestamps import BlockTimestampCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +25,8 @@ class EventBasedBlockchainSyncService:
     Sync Efficiency:
     - CapsuleCreated: 0 RPC calls (all data including encryptedStory in event)
     - CapsuleRevealed: 0 RPC calls (all data in event)
-    - Overall: 100% event-based sync with ZERO blockchain calls
+    - Block timestamps: one JSON-RPC batch of header lookups per range, cached by block number
+    - Overall: 100% event-based sync with ZERO contract calls
     
     Performance Benefits:
     - Zero blockchain state reads during normal operation
@@ -37,7 +40,8 @@ class EventBasedBlockchainSyncService:
     - Perfect separation of concerns
     - Ultimate blockchain optimization achieved
     """
-    def __init__(self, rpc_url: str, contract_address: str, contract_abi: list, db: CapsuleDatabase, start_block: int = 0):
+    def __init__(self, rpc_url: str, contract_address: str, contract_abi: list, db: BaseCapsuleDatabase, start_block: int = 0,
+                 read_model: Optional[CapsuleReadModel] = None):
         """
         Initialize event-based blockchain sync service
         
@@ -47,18 +51,23 @@ class EventBasedBlockchainSyncService:
             contract_abi: Contract ABI definition
             db: Database instance for storing capsule data
             start_block: Block number to start syncing from (default: 0, use contract deployment block for efficiency)
+            read_model: In-memory read model to update after each committed batch
         """
         self.rpc_url = rpc_url
         self.contract_address = contract_address
         self.contract_abi = contract_abi
         self.db = db
         self.start_block = start_block
+        self.read_model = read_model
 
         # Initialize Web3 connection
         self.w3 = Web3(Web3.HTTPProvider(rpc_url))
         if not self.w3.is_connected():
             raise Exception(f"Failed to connect to blockchain at {rpc_url}")
 
+        # created_at / revealed_at come from the events' block timestamps
+        self.block_times = BlockTimestampCache(rpc_url)
+
         # Initialize contract
         self.contract = self.w3.eth.contract(
             address=Web3.to_checksum_address(contract_address),
@@ -186,10 +195,21 @@ class EventBasedBlockchainSyncService:
             # Main sync iteration log message
             logger.info(f"Sync to block {to_block}, {blocks_behind} blocks behind, checked range: {from_block}-{to_block}, found {total_events} events ({len(created_events)} created, {len(revealed_events)} revealed)")
 
+            # Date events by their blocks: one header lookup per distinct block, batched and cached
+            block_times = self.block_times.get_timestamps(
+                event['blockNumber'] for event in created_events + revealed_events
+            )
+
+            # Build all rows first; they are stored together with the new block cursor below
+            created_rows = []
+            reveals = []
+
             # Process CapsuleCreated events
             for event in created_events:
                 try:
-                    if self._process_capsule_created_event(event):
+                    capsule_data = self._process_capsule_created_event(event, block_times.get(event['blockNumber']))
+                    if capsule_data:
+                        created_rows.append(capsule_data)
                         sync_result["capsules_created"] += 1
                         logger.info(f"  → CapsuleCreated #{event['args']['id']} in block {event['blockNumber']} (tx: {event['transactionHash'].hex()[:10]}...)")
                     sync_result["events_processed"] += 1
@@ -201,7 +221,9 @@ class EventBasedBlockchainSyncService:
             # Process CapsuleRevealed events
             for event in revealed_events:
                 try:
-                    if self._process_capsule_revealed_event(event):
+                    reveal = self._process_capsule_revealed_event(event, block_times.get(event['blockNumber']))
+                    if reveal:
+                        reveals.append(reveal)
                         sync_result["capsules_revealed"] += 1
                         logger.info(f"  → CapsuleRevealed #{event['args']['id']} in block {event['blockNumber']} (tx: {event['transactionHash'].hex()[:10]}...)")
                     sync_result["events_processed"] += 1
@@ -210,15 +232,21 @@ class EventBasedBlockchainSyncService:
                     logger.error(error_msg)
                     sync_result["errors"].append(error_msg)
 
-            # Update sync status
-            sync_result["database_total"] = self.db.get_capsule_count()
+            # Store the rows and advance the sync status in one transaction
             error_summary = "; ".join(sync_result["errors"][-5:])  # Keep last 5 errors
-
-            self.db.update_sync_status(
-                last_block=to_block,
-                total_capsules=sync_result["database_total"],
-                errors=error_summary
-            )
+            missing_reveals = self.db.apply_batch(created_rows, reveals, last_block=to_block, errors=error_summary)
+            if missing_reveals is None:
+                raise Exception(f"Failed to store blocks {from_block}-{to_block}, range will be retried")
+            if self.read_model is not None:
+                self.read_model.apply_batch(created_rows, reveals)
+            for capsule_id in missing_reveals:
+                # This shouldn't happen in normal operation: a reveal for a capsule we never
+                # stored points at a gap in the synced ranges, so surface it rather than guess
+                error_msg = f"Capsule {capsule_id} not found in database during reveal event"
+                logger.warning(error_msg)
+                sync_result["errors"].append(error_msg)
+                sync_result["capsules_revealed"] -= 1
+            sync_result["database_total"] = self.db.get_capsule_count()
 
             sync_result["success"] = True
             sync_result["sync_time"] = time.time() - start_time
@@ -251,6 +279,9 @@ class EventBasedBlockchainSyncService:
             
         Returns:
             List of event dictionaries
+            
+        Raises:
+            Exception: If the logs cannot be fetched - the range must not be marked as synced
         """
         try:
             # Use getLogs directly instead of creating a filter on the RPC server
@@ -267,17 +298,19 @@ class EventBasedBlockchainSyncService:
             logger.error(f"Event filter: {event_filter}")
             import traceback
             logger.error(f"Full traceback: {traceback.format_exc()}")
-            return []
+            raise
     
-    def _process_capsule_created_event(self, event: AttributeDict) -> bool:
+    def _process_capsule_created_event(self, event: AttributeDict,
+                                       block_time: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
         Process a CapsuleCreated event
         
         Args:
             event: Event data from blockchain
+            block_time: Timestamp of the event's block (stored as created_at)
             
         Returns:
-            True if processed successfully, False otherwise
+            Capsule row to store, or None if the event could not be processed
         """
         try:
             args = event['args']
@@ -286,7 +319,7 @@ class EventBasedBlockchainSyncService:
             # Check if encryptedStory exists in the event
             if 'encryptedStory' not in args:
                 logger.error(f"encryptedStory not found in CapsuleCreated event {capsule_id}! Available: {list(args.keys())}")
-                return False
+                return None
             
             # All data is now available in the event - NO blockchain calls needed!
             # This achieves true zero-RPC event-based syncing
@@ -303,56 +336,46 @@ class EventBasedBlockchainSyncService:
                 'image_cid': args['imageCID'],
                 'pixelated_image_cid': args['pixelatedImageCID'],
                 'block_number': event['blockNumber'],
-                'transaction_hash': event['transactionHash'].hex()
+                'transaction_hash': event['transactionHash'].hex(),
+                'created_at': block_time
             }
             
-            # Insert in database - no blockchain calls required!
-            return self.db.insert_capsule(capsule_data)
+            # Stored by sync_events with the rest of the batch - no blockchain calls required!
+            return capsule_data
             
         except Exception as e:
             logger.error(f"Error processing CapsuleCreated event: {e}")
-            return False
+            return None
     
-    def _process_capsule_revealed_event(self, event: AttributeDict) -> bool:
+    def _process_capsule_revealed_event(self, event: AttributeDict,
+                                        block_time: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
         Process a CapsuleRevealed event
         
         Args:
             event: Event data from blockchain
+            block_time: Timestamp of the event's block (stored as revealed_at)
             
         Returns:
-            True if processed successfully, False otherwise
+            Reveal to apply (id, decrypted_story, block_number, transaction_hash, revealed_at),
+            or None if the event could not be processed
         """
         try:
             args = event['args']
-            capsule_id = args['id']
-            plaintext_story = args['plaintextStory']
-            
-            # Get existing capsule data from database
-            existing_capsule = self.db.get_capsule(capsule_id)
-            if not existing_capsule:
-                logger.warning(f"Capsule {capsule_id} not found in database during reveal event")
-                # This shouldn't happen in normal operation, but handle gracefully
-                # We could fetch full capsule data as fallback, but it's better to investigate
-                # why we're getting a reveal event for a capsule we don't know about
-                return False
             
-            # Update existing capsule data with reveal information
-            # No blockchain call needed - all data is in the event and database
-            capsule_data = dict(existing_capsule)
-            capsule_data.update({
-                'decrypted_story': plaintext_story,
-                'is_revealed': True,
+            # No blockchain or database read needed - the reveal is applied in place
+            # by sync_events with the rest of the batch
+            return {
+                'id': args['id'],
+                'decrypted_story': args['plaintextStory'],
                 'block_number': event['blockNumber'],
-                'transaction_hash': event['transactionHash'].hex()
-            })
-            
-            # Update in database
-            return self.db.insert_capsule(capsule_data)
+                'transaction_hash': event['transactionHash'].hex(),
+                'revealed_at': block_time
+            }
             
         except Exception as e:
             logger.error(f"Error processing CapsuleRevealed event: {e}")
-            return False
+            return None
     
     def _fetch_capsule_from_blockchain(self, capsule_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -0,0 +1,331 @@
+# car_export.py - Streaming CARv1 export of capsule images and previews
+import os
+import json
+import time
+import base64
+import hashlib
+import tempfile
+import logging
+from typing import Dict, Any, List, Optional, Iterator, Callable
+
+import requests
+
+from database import BaseCapsuleDatabase, create_database_from_env
+from blob_storage import BlobStorage
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# UnixFS import parameters matching `ipfs add --cid-version=1` (and Pinata's cidVersion 1):
+# 256 KiB chunks stored as raw leaves, balanced DAG with at most 174 links per node
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+CODEC_RAW = 0x55
+CODEC_DAG_PB = 0x70
+MULTIHASH_SHA2_256 = 0x12
+
+CAR_MIME_TYPE = "application/vnd.ipld.car"
+
+
+# ---------- encoding helpers ----------
+def encode_varint(value: int) -> bytes:
+    """Unsigned LEB128 varint as used by multiformats and protobuf"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def make_cid(codec: int, data: bytes) -> bytes:
+    """Binary CIDv1 with a sha2-256 multihash"""
+    digest = hashlib.sha256(data).digest()
+    return b"\x01" + encode_varint(codec) + bytes([MULTIHASH_SHA2_256, len(digest)]) + digest
+
+
+def cid_to_str(cid: bytes) -> str:
+    """Multibase base32 (lower case, no padding) string form of a binary CIDv1"""
+    return "b" + base64.b32encode(cid).decode("ascii").lower().rstrip("=")
+
+
+def _pb_bytes(field: int, value: bytes) -> bytes:
+    return encode_varint(field << 3 | 2) + encode_varint(len(value)) + value
+
+
+def _pb_varint(field: int, value: int) -> bytes:
+    return encode_varint(field << 3) + encode_varint(value)
+
+
+def encode_unixfs_file_node(links: List[Dict[str, Any]]) -> bytes:
+    """
+    dag-pb node for a UnixFS file whose data lives entirely in its children.
+    Canonical dag-pb field order: Links (2) before Data (1).
+    """
+    filesize = sum(link["filesize"] for link in links)
+    unixfs = _pb_varint(1, 2) + _pb_varint(3, filesize)  # Type=File, filesize
+    for link in links:
+        unixfs += _pb_varint(4, link["filesize"])  # blocksizes
+    node = b""
+    for link in links:
+        node += _pb_bytes(2, _pb_bytes(1, link["cid"]) + _pb_bytes(2, b"") + _pb_varint(3, link["tsize"]))
+    return node + _pb_bytes(1, unixfs)
+
+
+def _cbor_head(major: int, value: int) -> bytes:
+    if value < 24:
+        return bytes([major << 5 | value])
+    for additional, size in ((24, 1), (25, 2), (26, 4), (27, 8)):
+        if value < 1 << (8 * size):
+            return bytes([major << 5 | additional]) + value.to_bytes(size, "big")
+    raise ValueError("CBOR value too large")
+
+
+def encode_car_header(roots: List[bytes]) -> bytes:
+    """Varint-prefixed DAG-CBOR {"roots": [...], "version": 1} (keys in canonical order)"""
+    header = _cbor_head(5, 2)
+    header += _cbor_head(3, 5) + b"roots" + _cbor_head(4, len(roots))
+    for cid in roots:
+        # CIDs are tag 42 over a byte string with the identity multibase prefix
+        header += _cbor_head(6, 42) + _cbor_head(2, len(cid) + 1) + b"\x00" + cid
+    header += _cbor_head(3, 7) + b"version" + _cbor_head(0, 1)
+    return encode_varint(len(header)) + header
+
+
+def encode_car_block(cid: bytes, data: bytes) -> bytes:
+    return encode_varint(len(cid) + len(data)) + cid + data
+
+
+def rechunk(blocks: Iterator[bytes], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Turn an arbitrary byte stream into fixed-size chunks (last one may be shorter)"""
+    buffer = bytearray()
+    for block in blocks:
+        buffer.extend(block)
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def build_unixfs_dag(chunks: Iterator[bytes]) -> Dict[str, Any]:
+    """
+    Compute the UnixFS DAG for a file from its chunks.
+
+    Leaf data is not kept; only leaf CIDs and the (small) interior node
+    blocks are returned, so the leaves can be re-read when streaming.
+    """
+    leaves = []
+    for chunk in chunks:
+        leaves.append({"cid": make_cid(CODEC_RAW, chunk), "tsize": len(chunk), "filesize": len(chunk)})
+
+    if not leaves:
+        # Empty file: a single empty raw block
+        leaves.append({"cid": make_cid(CODEC_RAW, b""), "tsize": 0, "filesize": 0})
+
+    interior = []
+    level = leaves
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level), MAX_LINKS):
+            links = level[i:i + MAX_LINKS]
+            node = encode_unixfs_file_node(links)
+            cid = make_cid(CODEC_DAG_PB, node)
+            interior.append((cid, node))
+            next_level.append({
+                "cid": cid,
+                "tsize": len(node) + sum(link["tsize"] for link in links),
+                "filesize": sum(link["filesize"] for link in links)
+            })
+        level = next_level
+
+    return {"root": level[0]["cid"], "leaves": [leaf["cid"] for leaf in leaves],
+            "interior": interior, "size": level[0]["filesize"]}
+
+
+# ---------- export ----------
+class CarExporter:
+    """
+    Exports every capsule's encrypted image and pixelated preview as one CARv1 archive.
+
+    prepare() makes a first pass that computes each blob's root CID (the CAR
+    header needs them up front); stream() then yields the archive block by
+    block. Blobs are read from blob storage, falling back to the IPFS gateway;
+    gateway downloads are spooled to a temporary file between the two passes
+    and released by close_plan() (stream() calls it when it finishes).
+
+    prepare() can stop after a number of capsules or seconds, so an HTTP
+    request sends its first byte in time; the next export continues from the
+    summary's last_capsule_id.
+    """
+    def __init__(self, db: BaseCapsuleDatabase, storage: BlobStorage,
+                 gateway_url_fn: Optional[Callable[[str], str]] = None, gateway_timeout: int = 30):
+        self.db = db
+        self.storage = storage
+        self.gateway_url_fn = gateway_url_fn
+        self.gateway_timeout = gateway_timeout
+
+    def _open_blob(self, cid: str, spool: Dict[str, Any]) -> Optional[Iterator[bytes]]:
+        if cid in spool:
+            spool[cid].seek(0)
+            return iter(lambda: spool[cid].read(CHUNK_SIZE), b"")
+
+        try:
+            blocks = self.storage.iter_chunks("ipfs", cid, CHUNK_SIZE)
+        except ValueError:
+            return None
+        if blocks is not None:
+            return blocks
+        if not self.gateway_url_fn:
+            return None
+
+        try:
+            response = requests.get(self.gateway_url_fn(cid), stream=True, timeout=self.gateway_timeout)
+            response.raise_for_status()
+            tmp = tempfile.SpooledTemporaryFile(max_size=4 * CHUNK_SIZE)
+            for block in response.iter_content(CHUNK_SIZE):
+                tmp.write(block)
+            spool[cid] = tmp
+            logger.info(f"Fetched {cid} from gateway for export")
+        except Exception as e:
+            logger.warning(f"Could not fetch {cid} from gateway: {e}")
+            return None
+        return self._open_blob(cid, spool)
+
+    def prepare(self, since_id: int = -1, limit: Optional[int] = None,
+                time_budget: Optional[float] = None) -> Dict[str, Any]:
+        """
+        First pass: resolve and hash every blob of capsules with id > since_id
+
+        Args:
+            since_id: Only export capsules with a higher id
+            limit: Stop after this many capsules
+            time_budget: Start no new capsule after this many seconds (the first always runs)
+
+        Returns:
+            Export plan consumed by stream(), including a summary for reporting
+            (complete is False when limit or time_budget cut the export short)
+        """
+        spool: Dict[str, Any] = {}
+        entries = []
+        seen = set()
+        missing = []
+        mismatched = []
+        last_capsule_id = since_id
+        capsules = 0
+        complete = True
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+
+        try:
+            for row in self.db.get_capsule_cids(after_id=since_id):
+                # At least one capsule per call, so a continued export always advances
+                if capsules and ((limit is not None and capsules >= limit)
+                                 or (deadline is not None and time.monotonic() >= deadline)):
+                    complete = False
+                    break
+                capsules += 1
+                last_capsule_id = row["id"]
+                for field in ("image_cid", "pixelated_image_cid"):
+                    cid = row[field]
+                    if not cid or cid in seen:
+                        continue
+                    seen.add(cid)
+
+                    blocks = self._open_blob(cid, spool)
+                    if blocks is None:
+                        missing.append({"cid": cid, "capsule_id": row["id"], "field": field})
+                        continue
+
+                    dag = build_unixfs_dag(rechunk(blocks))
+                    root = cid_to_str(dag["root"])
+                    if root != cid:
+                        # Local fallback CIDs, or content not added with CIDv1 defaults
+                        mismatched.append({"cid": cid, "car_root": root, "capsule_id": row["id"]})
+                    entries.append({"cid": cid, "capsule_id": row["id"], **dag})
+        except BaseException:
+            self.close_plan({"spool": spool})
+            raise
+
+        return {
+            "since_id": since_id,
+            "entries": entries,
+            "spool": spool,
+            "summary": {
+                "since_id": since_id,
+                "last_capsule_id": last_capsule_id,
+                "capsules": capsules,
+                "complete": complete,
+                "blobs": len(entries),
+                "bytes": sum(entry["size"] for entry in entries),
+                "roots": {entry["cid"]: cid_to_str(entry["root"]) for entry in entries},
+                "missing": missing,
+                "cid_mismatch": mismatched
+            }
+        }
+
+    def close_plan(self, plan: Dict[str, Any]):
+        """Release the plan's spooled gateway downloads (safe to call more than once)"""
+        for tmp in plan["spool"].values():
+            tmp.close()
+
+    def stream(self, plan: Dict[str, Any]) -> Iterator[bytes]:
+        """Second pass: yield the CARv1 archive (header, then every blob's blocks)"""
+        try:
+            yield encode_car_header([entry["root"] for entry in plan["entries"]])
+
+            for entry in plan["entries"]:
+                blocks = self._open_blob(entry["cid"], plan["spool"])
+                if blocks is None:
+                    raise IOError(f"Blob {entry['cid']} disappeared during export")
+
+                for leaf_cid, chunk in zip(entry["leaves"], rechunk(blocks)):
+                    if make_cid(CODEC_RAW, chunk) != leaf_cid:
+                        raise IOError(f"Blob {entry['cid']} changed during export")
+                    yield encode_car_block(leaf_cid, chunk)
+                if entry["size"] == 0:
+                    yield encode_car_block(entry["leaves"][0], b"")
+
+                for cid, node in entry["interior"]:
+                    yield encode_car_block(cid, node)
+        finally:
+            self.close_plan(plan)
+
+
+if __name__ == "__main__":
+    import argparse
+    from blob_storage import create_blob_storage_from_env
+
+    parser = argparse.ArgumentParser(description="Export capsule blobs as a CARv1 archive")
+    parser.add_argument("--db", default=os.environ.get("CAPSULES_DB_PATH", "capsules.db"), help="SQLite database path (ignored when DATABASE_URL is set)")
+    parser.add_argument("--out", default="capsules.car", help="Output CAR file")
+    parser.add_argument("--since-id", type=int, default=-1, help="Only export capsules with a higher id")
+    parser.add_argument("--limit", type=int, default=None, help="Export at most this many capsules")
+    parser.add_argument("--no-gateway", action="store_true", help="Do not fall back to the IPFS gateway")
+    args = parser.parse_args()
+
+    gateway = os.environ.get('PINATA_GATEWAY', 'https://gateway.pinata.cloud')
+    exporter = CarExporter(
+        create_database_from_env(args.db),
+        create_blob_storage_from_env(),
+        gateway_url_fn=None if args.no_gateway else (lambda cid: f"{gateway}/ipfs/{cid}")
+    )
+
+    plan = exporter.prepare(since_id=args.since_id, limit=args.limit)
+    with open(args.out, "wb") as f:
+        for data in exporter.stream(plan):
+            f.write(data)
+
+    summary_path = f"{args.out}.json"
+    with open(summary_path, "w") as f:
+        json.dump(plan["summary"], f, indent=2)
+
+    summary = plan["summary"]
+    print(f"✅ Wrote {summary['blobs']} blobs ({summary['bytes']} bytes) to {args.out}")
+    print(f"📋 Summary: {summary_path} (next incremental export: --since-id {summary['last_capsule_id']})")
+    if summary["missing"]:
+        print(f"⚠️  {len(summary['missing'])} blobs could not be found")
@@ -0,0 +1,318 @@
+# chunked_upload.py - Resumable chunked uploads for large encrypted images
+import os
+import json
+import time
+import hashlib
+import secrets
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sessions are only safe within a single process
+    fcntl = None
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSION_ID_LENGTH = 32  # hex characters
+FINALIZE_TIMEOUT = 300  # seconds before an interrupted finalize may be retried
+
+
+class ChunkedUploadError(Exception):
+    """Raised for invalid chunked upload requests; carries the HTTP status to return"""
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChunkedUploadManager:
+    """
+    Resumable upload sessions for encrypted images.
+
+    Protocol:
+    1. create_session(total_size) -> session id, chunk size and chunk count
+    2. write_chunk(session_id, index, data) for every chunk, in any order;
+       a dropped request only needs that one chunk to be re-sent
+    3. finalize(session_id) -> path of the completed file and its sha256
+
+    Chunks are written straight into a preallocated temporary file at their
+    offset. A small JSON sidecar records which chunks arrived so that any
+    worker process can pick up the session; every read-modify-write of a
+    sidecar holds an flock on storage_dir/.lock, shared by all workers. The
+    sha256 is computed incrementally over the contiguous prefix of received
+    chunks, so finalizing an in-order upload does not re-read the file. The
+    sidecar counts chunk rewrites, which invalidates a worker's cached hash
+    once another worker has overwritten part of the hashed prefix.
+    """
+    def __init__(self, storage_dir: str = "upload_sessions", chunk_size: int = 1024 * 1024,
+                 max_total_size: int = 10 * 1024 * 1024, session_ttl: int = 3600):
+        """
+        Args:
+            storage_dir: Directory holding in-progress uploads
+            chunk_size: Size of every chunk except the last one, in bytes
+            max_total_size: Largest upload accepted, in bytes
+            session_ttl: Seconds after which an unfinished session is discarded
+        """
+        self.storage_dir = storage_dir
+        self.chunk_size = chunk_size
+        self.max_total_size = max_total_size
+        self.session_ttl = session_ttl
+
+        self._lock = threading.Lock()
+        # session_id -> (hasher, bytes hashed so far, rewrites seen); process-local cache
+        self._hashers: Dict[str, Any] = {}
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        self._lock_path = os.path.join(self.storage_dir, ".lock")
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock across the threads of this process and all worker processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------- paths & metadata ----------
+    def _validate_session_id(self, session_id: str):
+        if (not isinstance(session_id, str) or len(session_id) != SESSION_ID_LENGTH
+                or any(c not in "0123456789abcdef" for c in session_id)):
+            raise ChunkedUploadError("Invalid upload session id", 400)
+
+    def _part_path(self, session_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{session_id}.part")
+
+    def _meta_path(self, session_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{session_id}.json")
+
+    def _load_meta(self, session_id: str) -> Dict[str, Any]:
+        self._validate_session_id(session_id)
+        try:
+            with open(self._meta_path(session_id), "r") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise ChunkedUploadError("Upload session not found", 404)
+
+        if time.time() - meta["created_at"] > self.session_ttl:
+            self._discard(session_id)
+            raise ChunkedUploadError("Upload session expired", 410)
+        return meta
+
+    def _save_meta(self, meta: Dict[str, Any]):
+        # Write-then-rename so a concurrent reader never sees a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.storage_dir, prefix=f"{meta['session_id']}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self._meta_path(meta["session_id"]))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _discard(self, session_id: str):
+        self._hashers.pop(session_id, None)
+        for path in (self._part_path(session_id), self._meta_path(session_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _chunk_length(self, meta: Dict[str, Any], index: int) -> int:
+        if index == meta["total_chunks"] - 1:
+            return meta["total_size"] - index * meta["chunk_size"]
+        return meta["chunk_size"]
+
+    def _missing_chunks(self, meta: Dict[str, Any]) -> List[int]:
+        received = set(meta["received"])
+        return [i for i in range(meta["total_chunks"]) if i not in received]
+
+    # ---------- protocol ----------
+    def create_session(self, total_size: int) -> Dict[str, Any]:
+        """Open a new upload session for a blob of total_size bytes"""
+        if not isinstance(total_size, int) or total_size <= 0:
+            raise ChunkedUploadError("Upload size must be a positive integer", 400)
+        if total_size > self.max_total_size:
+            raise ChunkedUploadError(
+                f"Upload exceeds maximum size of {self.max_total_size} bytes", 413)
+
+        self.cleanup_expired()
+
+        session_id = secrets.token_hex(SESSION_ID_LENGTH // 2)
+        total_chunks = (total_size + self.chunk_size - 1) // self.chunk_size
+        meta = {
+            "session_id": session_id,
+            "total_size": total_size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": total_chunks,
+            "received": [],
+            "rewrites": 0,
+            "created_at": int(time.time())
+        }
+
+        # Preallocate the temporary file so chunks can land at any offset
+        with self._locked():
+            with open(self._part_path(session_id), "wb") as f:
+                f.truncate(total_size)
+            self._save_meta(meta)
+
+        logger.info(f"Created upload session {session_id}: {total_size} bytes in {total_chunks} chunks")
+        return self.get_status(session_id)
+
+    def get_status(self, session_id: str) -> Dict[str, Any]:
+        """Return which chunks have been received so a client can resume"""
+        with self._locked():
+            meta = self._load_meta(session_id)
+        return {
+            "session_id": session_id,
+            "total_size": meta["total_size"],
+            "chunk_size": meta["chunk_size"],
+            "total_chunks": meta["total_chunks"],
+            "received": sorted(meta["received"]),
+            "missing": self._missing_chunks(meta),
+            "expires_at": meta["created_at"] + self.session_ttl
+        }
+
+    def write_chunk(self, session_id: str, index: int, data: bytes,
+                    expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Store one chunk; re-sending an already received chunk overwrites it"""
+        with self._locked():
+            meta = self._load_meta(session_id)
+            if self._is_finalizing(meta):
+                raise ChunkedUploadError("Upload is being finalized", 409)
+
+            if index < 0 or index >= meta["total_chunks"]:
+                raise ChunkedUploadError(f"Chunk index {index} out of range", 400)
+            if len(data) != self._chunk_length(meta, index):
+                raise ChunkedUploadError(
+                    f"Chunk {index} must be {self._chunk_length(meta, index)} bytes, got {len(data)}", 400)
+            if expected_sha256 and hashlib.sha256(data).hexdigest() != expected_sha256.lower():
+                raise ChunkedUploadError(f"Chunk {index} failed checksum verification", 422)
+
+            offset = index * meta["chunk_size"]
+            with open(self._part_path(session_id), "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+
+            if index in meta["received"]:
+                # Overwritten content may already be part of a running hash, in any worker
+                meta["rewrites"] = meta.get("rewrites", 0) + 1
+            else:
+                meta["received"].append(index)
+            self._save_meta(meta)
+
+            self._advance_hash(session_id, meta, index, data)
+
+        return {
+            "session_id": session_id,
+            "index": index,
+            "received": len(meta["received"]),
+            "total_chunks": meta["total_chunks"]
+        }
+
+    def _advance_hash(self, session_id: str, meta: Dict[str, Any],
+                      index: Optional[int] = None, data: Optional[bytes] = None):
+        """Feed every contiguous received chunk after the hashed prefix into the hasher"""
+        rewrites = meta.get("rewrites", 0)
+        cached = self._hashers.get(session_id)
+        if cached and cached[2] == rewrites:
+            hasher, hashed = cached[0], cached[1]
+        else:
+            hasher, hashed = hashlib.sha256(), 0
+        received = set(meta["received"])
+        chunk_size = meta["chunk_size"]
+
+        next_index = hashed // chunk_size
+        if hashed < meta["total_size"] and next_index in received:
+            with open(self._part_path(session_id), "rb") as f:
+                while hashed < meta["total_size"] and next_index in received:
+                    if next_index == index and data is not None:
+                        chunk = data
+                    else:
+                        f.seek(next_index * chunk_size)
+                        chunk = f.read(self._chunk_length(meta, next_index))
+                    hasher.update(chunk)
+                    hashed += len(chunk)
+                    next_index += 1
+
+        self._hashers[session_id] = (hasher, hashed, rewrites)
+        return hasher, hashed
+
+    def _is_finalizing(self, meta: Dict[str, Any]) -> bool:
+        return time.time() - meta.get("finalizing_at", 0) < FINALIZE_TIMEOUT
+
+    def finalize(self, session_id: str) -> Dict[str, Any]:
+        """
+        Complete an upload once every chunk has arrived
+
+        Returns:
+            Dictionary with the temporary file path, its sha256 hex digest and size.
+            The caller takes ownership of the file (move it, then call discard(),
+            or release_finalize() if it could not be stored). Until then further
+            chunks and concurrent finalize calls are rejected with a 409.
+        """
+        with self._locked():
+            meta = self._load_meta(session_id)
+            missing = self._missing_chunks(meta)
+            if missing:
+                raise ChunkedUploadError(f"Upload incomplete, missing chunks: {missing[:20]}", 409)
+            if self._is_finalizing(meta):
+                raise ChunkedUploadError("Upload is already being finalized", 409)
+
+            hasher, hashed = self._advance_hash(session_id, meta)
+            meta["finalizing_at"] = time.time()
+            self._save_meta(meta)
+
+            return {
+                "session_id": session_id,
+                "path": self._part_path(session_id),
+                "sha256": hasher.hexdigest(),
+                "size": hashed
+            }
+
+    def release_finalize(self, session_id: str):
+        """Allow finalize() to be retried after the caller failed to store the file"""
+        with self._locked():
+            try:
+                meta = self._load_meta(session_id)
+            except ChunkedUploadError:
+                return
+            meta.pop("finalizing_at", None)
+            self._save_meta(meta)
+
+    def discard(self, session_id: str):
+        """Remove a session and whatever is left of its temporary file"""
+        self._validate_session_id(session_id)
+        with self._locked():
+            self._discard(session_id)
+
+    def cleanup_expired(self) -> int:
+        """Delete sessions older than the TTL; returns the number removed"""
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.storage_dir):
+            if not name.endswith(".json"):
+                continue
+            session_id = name[:-len(".json")]
+            try:
+                with open(os.path.join(self.storage_dir, name), "r") as f:
+                    created_at = json.load(f).get("created_at", 0)
+            except (OSError, ValueError):
+                continue
+            if now - created_at > self.session_ttl:
+                with self._locked():
+                    self._discard(session_id)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} expired upload sessions")
+        return removed
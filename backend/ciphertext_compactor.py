@@ -0,0 +1,221 @@
+# ciphertext_compactor.py - Move or drop the ciphertext of revealed capsules, then shrink the SQLite file
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from database import BaseCapsuleDatabase, create_database_from_env
+from blob_storage import BlobStorage
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CIPHERTEXT_NAMESPACE = "ciphertext"
+
+
+def ciphertext_key(capsule_id: int) -> str:
+    """Blob storage key of an archived capsule ciphertext"""
+    return f"capsule-{int(capsule_id)}.bin"
+
+
+def load_archived_ciphertext(storage: Optional[BlobStorage], capsule_id: int) -> Optional[bytes]:
+    """Ciphertext archived by CiphertextCompactor, None if it was dropped (or never compacted)"""
+    if storage is None:
+        return None
+    try:
+        return storage.get(CIPHERTEXT_NAMESPACE, ciphertext_key(capsule_id))
+    except Exception as e:
+        logger.warning(f"Could not load archived ciphertext of capsule {capsule_id}: {e}")
+        return None
+
+
+class CompactionInProgress(Exception):
+    """Raised by compact(blocking=False) while another pass is running"""
+
+
+class CiphertextCompactor:
+    """
+    Removes encrypted_story from revealed capsules.
+
+    Once a capsule is revealed its plaintext is stored and the ciphertext is
+    only of historical interest, yet it is most of the row's bytes. With a
+    storage the ciphertext is archived to the "ciphertext" namespace before
+    it is deleted; without one it is dropped (the CapsuleCreated event still
+    holds it and a full resync restores it). Afterwards the freed pages are
+    returned to the filesystem with an incremental vacuum, shrinking the
+    database file and the working set the page cache has to hold.
+    """
+    def __init__(self, db: BaseCapsuleDatabase, storage: Optional[BlobStorage] = None,
+                 batch_size: int = 500, min_age_seconds: int = 0):
+        """
+        Args:
+            db: Database whose backend supports payload compaction (SQLite)
+            storage: Archive for the ciphertext; None drops it
+            batch_size: Capsules archived and deleted per write
+            min_age_seconds: Only compact capsules revealed at least this long ago
+        """
+        if not db.payload_compaction:
+            raise ValueError(f"The {db.name} database backend does not support ciphertext compaction")
+        self.db = db
+        self.storage = storage
+        self.batch_size = batch_size
+        self.min_age_seconds = min_age_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def mode(self) -> str:
+        return "archive" if self.storage is not None else "drop"
+
+    def compact(self, dry_run: bool = False, vacuum: bool = True, max_vacuum_pages: int = 0,
+                after_id: int = -1, max_capsules: int = 0, time_budget: Optional[float] = None,
+                full_vacuum: bool = True, mode: Optional[str] = None,
+                min_age_seconds: Optional[int] = None, blocking: bool = True) -> Dict[str, Any]:
+        """
+        Run one compaction pass, or the part of it after after_id
+
+        Args:
+            dry_run: Only count the capsules and bytes that would be compacted
+            vacuum: Reclaim the freed pages afterwards
+            max_vacuum_pages: Pages to reclaim at most (0 = all)
+            after_id: Only look at capsules with a higher id
+            max_capsules: Stop after this many capsules (0 = no limit)
+            time_budget: Stop starting new batches after this many seconds
+                (at least one batch is always processed)
+            full_vacuum: Allow the one-off full VACUUM of older database files
+            mode: "archive" or "drop" for this pass instead of the configured mode
+            min_age_seconds: Minimum reveal age for this pass instead of the configured one
+            blocking: Raise CompactionInProgress instead of waiting for a running pass
+
+        Returns:
+            Report with the capsules and ciphertext bytes removed and the vacuum
+            outcome; complete is False when a limit stopped the pass early, and
+            next_after_id continues it
+        """
+        storage = self.storage
+        if mode == "drop":
+            storage = None
+        elif mode == "archive" and storage is None:
+            raise ValueError("No blob storage configured to archive ciphertext")
+        if not self._lock.acquire(blocking=blocking):
+            raise CompactionInProgress("A ciphertext compaction pass is already running")
+        try:
+            return self._compact(storage, dry_run, vacuum, max_vacuum_pages, after_id, max_capsules,
+                                 time_budget, full_vacuum,
+                                 self.min_age_seconds if min_age_seconds is None else min_age_seconds)
+        finally:
+            self._lock.release()
+
+    def _compact(self, storage: Optional[BlobStorage], dry_run: bool, vacuum: bool, max_vacuum_pages: int,
+                 after_id: int, max_capsules: int, time_budget: Optional[float], full_vacuum: bool,
+                 min_age_seconds: int) -> Dict[str, Any]:
+        start_time = time.time()
+        revealed_before = int(start_time) - min_age_seconds
+        capsules = 0
+        ciphertext_bytes = 0
+        errors = []
+
+        seen = 0
+        complete = False
+        while True:
+            if seen and ((max_capsules and seen >= max_capsules)
+                         or (time_budget is not None and time.time() - start_time >= time_budget)):
+                break
+            batch_size = min(self.batch_size, max_capsules - seen) if max_capsules else self.batch_size
+            rows = self.db.get_compactable_payloads(after_id, batch_size, revealed_before)
+            if not rows:
+                complete = True
+                break
+            after_id = rows[-1]["id"]
+            seen += len(rows)
+            if dry_run:
+                capsules += len(rows)
+                ciphertext_bytes += sum(len(row["encrypted_story"]) for row in rows)
+                continue
+
+            archived = []
+            for row in rows:
+                try:
+                    if storage is not None:
+                        storage.put(CIPHERTEXT_NAMESPACE, ciphertext_key(row["id"]), bytes(row["encrypted_story"]))
+                    archived.append(row)
+                except Exception as e:
+                    # Keep the ciphertext in the database when it cannot be archived
+                    errors.append({"capsule_id": row["id"], "error": str(e)})
+            if archived:
+                removed = self.db.delete_payloads([row["id"] for row in archived])
+                capsules += removed
+                if removed == len(archived):
+                    ciphertext_bytes += sum(len(row["encrypted_story"]) for row in archived)
+                else:
+                    # The batch stays in the database; the next pass archives it again
+                    errors.extend({"capsule_id": row["id"], "error": "ciphertext not removed from the database"}
+                                  for row in archived)
+
+        mode = "archive" if storage is not None else "drop"
+        report: Dict[str, Any] = {
+            "mode": mode,
+            "dry_run": dry_run,
+            "capsules": capsules,
+            "ciphertext_bytes": ciphertext_bytes,
+            "errors": errors,
+            "complete": complete,
+            "next_after_id": None if complete else after_id,
+            "vacuum": None
+        }
+        if vacuum and not dry_run:
+            report["vacuum"] = self.db.reclaim_space(max_vacuum_pages, full_vacuum=full_vacuum)
+        report["duration_seconds"] = round(time.time() - start_time, 3)
+
+        logger.info(f"Ciphertext compaction ({mode}): {capsules} capsules, {ciphertext_bytes} bytes, "
+                    f"{len(errors)} errors" + (f", {report['vacuum']['freed_pages']} pages freed" if report["vacuum"] else ""))
+        return report
+
+    def start(self, interval: float):
+        """Compact every `interval` seconds in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+        self._thread.start()
+        logger.info(f"Ciphertext compaction ({self.mode}) every {interval:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def _loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Ciphertext compaction failed: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from blob_storage import create_blob_storage_from_env
+
+    parser = argparse.ArgumentParser(description="Archive or drop the ciphertext of revealed capsules")
+    parser.add_argument("--db", default=os.environ.get("CAPSULES_DB_PATH", "capsules.db"), help="SQLite database path")
+    parser.add_argument("--drop", action="store_true", help="Delete the ciphertext without archiving it to blob storage")
+    parser.add_argument("--min-age-days", type=float, default=0, help="Only compact capsules revealed at least this long ago")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted")
+    parser.add_argument("--no-vacuum", action="store_true", help="Leave the freed pages in the database file")
+    args = parser.parse_args()
+
+    db = create_database_from_env(args.db)
+    try:
+        compactor = CiphertextCompactor(db, None if args.drop else create_blob_storage_from_env(),
+                                        min_age_seconds=int(args.min_age_days * 86400))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(json.dumps(compactor.compact(dry_run=args.dry_run, vacuum=not args.no_vacuum), indent=2))
+    db.close()
@@ -1,43 +1,436 @@
-# database.py - SQLite database management for Ethereum Time Capsule
+# database.py - Database management for Ethereum Time Capsule (SQLite backend and common interface)
+import os
+import re
 import sqlite3
 import json
 import time
+import queue
+import base64
+import unicodedata
 import threading
-from typing import Dict, List, Optional, Any
+from urllib.parse import quote
+from typing import Callable, Dict, List, Optional, Any, Sequence, Tuple
 from contextlib import contextmanager
 import logging
 
+from query_stats import QueryStats, InstrumentedConnection
+from db_writer import DatabaseWriter
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class CapsuleDatabase:
-    def __init__(self, db_path: str = "capsules.db"):
+# Columns of the capsules table that list queries may project
+CAPSULE_COLUMNS = (
+    "id", "creator", "title", "tags", "encrypted_story", "decrypted_story", "is_revealed",
+    "reveal_time", "shutter_identity", "image_cid", "pixelated_image_cid",
+    "block_number", "transaction_hash", "created_at", "updated_at", "revealed_at"
+)
+
+# Default projection of list queries: everything but the ciphertext BLOB,
+# which only the single-capsule endpoint needs
+SUMMARY_COLUMNS = tuple(column for column in CAPSULE_COLUMNS if column != "encrypted_story")
+
+# Columns the SQLite backend keeps in the capsule_payloads side table, so
+# scans of capsules never page through ciphertext they do not read
+PAYLOAD_COLUMNS = ("encrypted_story",)
+
+# API field name -> database column, in response order
+CAPSULE_API_FIELDS = {
+    "id": "id",
+    "creator": "creator",
+    "title": "title",
+    "tags": "tags",
+    "encryptedStory": "encrypted_story",
+    "decryptedStory": "decrypted_story",
+    "isRevealed": "is_revealed",
+    "revealTime": "reveal_time",
+    "shutterIdentity": "shutter_identity",
+    "imageCID": "image_cid",
+    "pixelatedImageCID": "pixelated_image_cid",
+    "createdAt": "created_at",
+    "revealedAt": "revealed_at"
+}
+
+# List endpoints leave out the ciphertext unless asked for with fields=
+SUMMARY_API_FIELDS = [name for name in CAPSULE_API_FIELDS if name != "encryptedStory"]
+
+# Pseudo-column of a capsule's SUMMARY_API_FIELDS as ready-to-send JSON text
+# (SQLite keeps it in capsule_json; changing the summary fields needs a migration)
+SUMMARY_JSON_COLUMN = "summary_json"
+
+def summary_json_sql(row: str, dialect: str = "sqlite") -> str:
+    """
+    SQL expression building the summary JSON object of a capsule row, formatted
+    like app.format_capsule: isRevealed a boolean, pixelatedImageCID never null
+    
+    Args:
+        row: Table alias (or NEW in a trigger)
+        dialect: "sqlite" (json_object) or "postgres" (json_build_object)
+    """
+    pairs = []
+    for field in SUMMARY_API_FIELDS:
+        value = f"{row}.{CAPSULE_API_FIELDS[field]}"
+        if field == "isRevealed" and dialect == "sqlite":
+            value = f"json(CASE WHEN {value} THEN 'true' ELSE 'false' END)"
+        elif field == "pixelatedImageCID":
+            value = f"COALESCE({value}, '')"
+        pairs.append(f"'{field}', {value}")
+    if dialect == "sqlite":
+        return f"json_object({', '.join(pairs)})"
+    return f"json_build_object({', '.join(pairs)})::text"
+
+def select_columns(columns: Optional[Sequence[str]] = None, alias: str = "c",
+                   payload_alias: Optional[str] = None, summary_json: Optional[str] = None) -> str:
+    """
+    SELECT list for a projection (validated against CAPSULE_COLUMNS, id always included)
+    
+    Args:
+        payload_alias: Table alias of PAYLOAD_COLUMNS when they live in a side table
+        summary_json: SQL of SUMMARY_JSON_COLUMN (a stored column or summary_json_sql);
+            the pseudo-column is rejected without it
+    """
+    columns = list(columns or SUMMARY_COLUMNS)
+    unknown = [column for column in columns if column not in CAPSULE_COLUMNS
+               and not (summary_json and column == SUMMARY_JSON_COLUMN)]
+    if unknown:
+        raise ValueError(f"Unknown capsule columns: {unknown}")
+    if "id" not in columns:
+        columns.insert(0, "id")
+    
+    def column_sql(column: str) -> str:
+        if column == SUMMARY_JSON_COLUMN:
+            return f"{summary_json} AS {SUMMARY_JSON_COLUMN}"
+        return f"{payload_alias if payload_alias and column in PAYLOAD_COLUMNS else alias}.{column}"
+    return ", ".join(column_sql(column) for column in columns)
+
+def split_tags(tags: str) -> List[str]:
+    """Normalize a comma-separated tag string the way the gallery matches tags (trimmed, case-folded)"""
+    normalized = []
+    for tag in (tags or "").split(","):
+        tag = tag.strip().casefold()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+# Bounds used as open-ended keyset cursors (SQLite INTEGER / PostgreSQL BIGINT range)
+MAX_ID = 2 ** 63 - 1
+MIN_REVEAL_TIME = -2 ** 63
+
+def reveal_columns(columns: Optional[Sequence[str]] = None) -> List[str]:
+    """Projection of reveal-window queries: reveal_time is part of their cursor"""
+    columns = list(columns or SUMMARY_COLUMNS)
+    if "reveal_time" not in columns:
+        columns.append("reveal_time")
+    return columns
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque pagination cursor for API responses"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int = 2) -> List[Any]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if (not isinstance(values, list) or len(values) != size
+            or not all(isinstance(v, (int, float, str)) for v in values)):
+        raise ValueError("Invalid cursor")
+    return values
+
+# Columns of capsules_fts and their weight in the search score
+SEARCH_COLUMN_WEIGHTS = (("title", 8), ("tags", 4), ("creator", 2), ("decrypted_story", 1))
+
+# A prefix that expands to more known terms than this is handed to FTS5 as a prefix query
+MAX_PREFIX_TERMS = 32
+
+def tokenize_text(text: str) -> List[str]:
+    """Split text into terms the way the FTS5 unicode61 tokenizer does (case-folded, no diacritics)"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.findall(r"[^\W_]+", stripped.casefold())
+
+class ConnectionPool:
+    """
+    Pool of reusable SQLite connections.
+
+    Connections are handed out to one thread at a time and returned to the
+    pool afterwards, so both thread-per-request servers and long-lived
+    threads (the sync loop) reuse connections instead of reconnecting and
+    re-applying pragmas on every call.
+    """
+    def __init__(self, connect, max_idle: int = 8):
+        self._connect = connect
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            # Never hand out a connection with a dangling transaction (and its locks)
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class BaseCapsuleDatabase:
+    """
+    Interface for capsule database backends.
+
+    CapsuleDatabase stores everything in a local SQLite file; the PostgreSQL
+    backend (database_postgres.PostgresCapsuleDatabase) is shared by every
+    web dyno and survives restarts. Both return capsules as plain dicts keyed
+    by CAPSULE_COLUMNS.
+    """
+    name = "base"
+    fts_enabled = False
+    # QueryStats of backends that time their own statements, None otherwise
+    query_stats = None
+    # DatabaseWriter of backends that serialize writes through one thread, None otherwise
+    writer = None
+    # Whether revealed capsules' ciphertext can be removed (ciphertext_compactor)
+    payload_compaction = False
+
+    def insert_capsule(self, capsule_data: Dict[str, Any]) -> bool:
+        """Insert or update a capsule"""
+        raise NotImplementedError
+
+    def reveal_capsule(self, capsule_id: int, decrypted_story: str,
+                       block_number: Optional[int] = None, transaction_hash: Optional[str] = None,
+                       revealed_at: Optional[int] = None) -> Optional[bool]:
+        """Store a capsule's plaintext; True if updated, False if not stored, None on error"""
+        raise NotImplementedError
+
+    def apply_batch(self, created: List[Dict[str, Any]], revealed: List[Dict[str, Any]],
+                    last_block: int, errors: str = '') -> Optional[List[int]]:
+        """Store a synced block range and its cursor atomically; returns ids of unknown reveals, None on error"""
+        raise NotImplementedError
+
+    def get_capsule(self, capsule_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get a single capsule by ID (columns defaults to CAPSULE_COLUMNS; SUMMARY_JSON_COLUMN may be selected)"""
+        raise NotImplementedError
+
+    def get_capsules(self, offset: int = 0, limit: int = 10, revealed_only: bool = False, tag: str = None,
+                     after_id: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_capsule_count(self) -> int:
+        raise NotImplementedError
+
+    def get_stats(self, days: int = 7) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def update_sync_status(self, last_block: int, total_capsules: int, errors: str = '') -> bool:
+        raise NotImplementedError
+
+    def get_sync_status(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def search_capsules(self, query: str, limit: int = 10, after: Optional[List[Any]] = None,
+                        columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _search_windows(self, search_window: Callable[[int, Optional[List[Any]], int], List[Dict[str, Any]]],
+                        window_bounds: Callable[[int], Tuple[Optional[int], int]], limit: int,
+                        after: Optional[List[Any]]) -> List[Dict[str, Any]]:
+        """
+        Page through full-text matches one window of search_candidates at a time
+
+        search_window(below, keyset, limit) returns the page of the newest
+        search_candidates matches with id < below, ranked, after keyset
+        ([search_rank, id]); window_bounds(below) returns that window's lowest
+        id and size. A page that runs past its window continues in the next
+        older one, so every match stays reachable. Each result carries the
+        'search_window' bound its cursor continues from.
+        """
+        below = after[2] if after and len(after) > 2 else MAX_ID
+        keyset = after[:2] if after else None
+        results: List[Dict[str, Any]] = []
+        while len(results) < limit:
+            rows = search_window(below, keyset, limit - len(results))
+            for row in rows:
+                row['search_window'] = below
+            results.extend(rows)
+            if len(results) >= limit:
+                break
+            low, size = window_bounds(below)
+            if low is None or size < self.search_candidates:
+                break
+            below, keyset = low, None
+        return results
+
+    def get_capsules_by_creator(self, creator_address: str, limit: int = 10, after_id: Optional[int] = None,
+                                columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_creator_count(self, creator_address: str) -> int:
+        raise NotImplementedError
+
+    def get_recent_capsules(self, hours: int = 24, limit: int = 10,
+                            columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_upcoming_reveals(self, hours: int = 24, limit: int = 10, after: Optional[List[int]] = None,
+                             columns: Optional[Sequence[str]] = None, now: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Unrevealed capsules whose reveal_time falls within the next N hours, soonest first
+        
+        Args:
+            after: Keyset cursor, [reveal_time, id] of the last capsule of the previous page
+            columns: Columns to return (defaults to SUMMARY_COLUMNS; reveal_time is always included)
+            now: Current unix time (defaults to the clock)
+        """
+        now = int(time.time()) if now is None else now
+        return self._get_unrevealed(after or [now, MAX_ID], now + int(hours * 3600), limit, columns)
+
+    def get_overdue_reveals(self, limit: int = 10, after: Optional[List[int]] = None,
+                            columns: Optional[Sequence[str]] = None, now: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Unrevealed capsules already past their reveal_time, longest overdue first (see get_upcoming_reveals)"""
+        now = int(time.time()) if now is None else now
+        return self._get_unrevealed(after or [MIN_REVEAL_TIME, MAX_ID], now, limit, columns)
+
+    def _get_unrevealed(self, after: List[int], until: int, limit: int,
+                        columns: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+        """Unrevealed capsules with (reveal_time, id) > after and reveal_time <= until, ascending"""
+        raise NotImplementedError
+
+    def get_content_cids(self) -> Dict[str, List[int]]:
+        raise NotImplementedError
+
+    def get_capsule_cids(self, after_id: int = -1) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_compactable_payloads(self, after_id: int = -1, limit: int = 500,
+                                 revealed_before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """id and encrypted_story of revealed capsules with id > after_id that still store their ciphertext, oldest first"""
+        raise NotImplementedError
+
+    def delete_payloads(self, capsule_ids: List[int]) -> int:
+        """Remove the ciphertext of revealed capsules; returns the number removed (0 on error)"""
+        raise NotImplementedError
+
+    def reclaim_space(self, max_pages: int = 0, full_vacuum: bool = True) -> Dict[str, Any]:
+        """
+        Return free pages to the filesystem (0 = all of them); full_vacuum=False
+        skips a conversion that would have to rewrite the whole file
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release pooled connections"""
+        raise NotImplementedError
+
+
+# Bump when adding a step to CapsuleDatabase._migrate
+SCHEMA_VERSION = 7
+
+# SQLite capsules table (also used to rebuild it in migrations); the
+# ciphertext lives in capsule_payloads
+CAPSULES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY,
+        creator TEXT NOT NULL,
+        creator_lc TEXT GENERATED ALWAYS AS (lower(creator)) VIRTUAL,
+        title TEXT NOT NULL,
+        tags TEXT NOT NULL,
+        decrypted_story TEXT DEFAULT '',
+        is_revealed BOOLEAN DEFAULT 0,
+        reveal_time INTEGER NOT NULL,
+        shutter_identity TEXT NOT NULL,
+        image_cid TEXT NOT NULL,
+        pixelated_image_cid TEXT DEFAULT '',
+        block_number INTEGER,
+        transaction_hash TEXT,
+        created_at INTEGER DEFAULT (strftime('%s', 'now')),
+        updated_at INTEGER DEFAULT (strftime('%s', 'now')),
+        revealed_at INTEGER
+    )
+"""
+
+# Stored (non-generated) columns of CAPSULES_TABLE_SQL
+CAPSULES_TABLE_COLUMNS = tuple(
+    column for column in CAPSULE_COLUMNS if column not in PAYLOAD_COLUMNS
+)
+
+# A queued write waits behind other groups, each of which may wait busy_timeout
+# for the lock, so callers give up after this many busy timeouts
+WRITE_TIMEOUT_BUSY_TIMEOUTS = 12
+
+class CapsuleDatabase(BaseCapsuleDatabase):
+    """Capsule database in a local SQLite file"""
+    name = "sqlite"
+    payload_compaction = True
+    
+    def __init__(self, db_path: str = "capsules.db", mmap_size: int = 256 * 1024 * 1024,
+                 cache_size_kb: int = 16 * 1024, busy_timeout_ms: int = 5000, max_idle_connections: int = 8,
+                 search_candidates: int = 1000, slow_query_ms: float = 100.0, group_commit_ms: float = 2.0):
+        """
+        Args:
+            db_path: SQLite database file
+            mmap_size: Bytes of the database file to memory-map for reads
+            cache_size_kb: Page cache size per connection, in KiB
+            busy_timeout_ms: How long a connection waits on a lock before failing; queued
+                writes give up after WRITE_TIMEOUT_BUSY_TIMEOUTS times as long
+            max_idle_connections: Idle connections kept per pool (read and write pools)
+            search_candidates: Newest full-text matches considered when ranking a search
+            slow_query_ms: Statements slower than this are logged with their query plan
+            group_commit_ms: How long the writer thread gathers queued writes into one transaction
+        """
         self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_timeout = busy_timeout_ms / 1000 * WRITE_TIMEOUT_BUSY_TIMEOUTS
+        self.search_candidates = search_candidates
+        self.query_stats = QueryStats(slow_query_ms)
+
+        self._write_pool = ConnectionPool(lambda: self._connect(readonly=False), max_idle_connections)
+        self._read_pool = ConnectionPool(lambda: self._connect(readonly=True), max_idle_connections)
         self.init_database()
+        # All writes after initialization go through one thread, so the sync and
+        # request threads never race for the write lock ("database is locked")
+        self.writer = DatabaseWriter(lambda: self._connect(readonly=False), group_commit_ms=group_commit_ms)
         
+    def _write(self, write: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run a write on the writer thread, waiting at most write_timeout for its commit"""
+        return self.writer.execute(write, timeout=self.write_timeout)
+    
     def init_database(self):
         """Initialize the database with required tables"""
         with self.get_connection() as conn:
+            conn.execute(CAPSULES_TABLE_SQL.format(name="capsules"))
+            # Ciphertext, read only by single-capsule lookups
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS capsules (
-                    id INTEGER PRIMARY KEY,
-                    creator TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    tags TEXT NOT NULL,
-                    encrypted_story BLOB NOT NULL,
-                    decrypted_story TEXT DEFAULT '',
-                    is_revealed BOOLEAN DEFAULT 0,
-                    reveal_time INTEGER NOT NULL,
-                    shutter_identity TEXT NOT NULL,
-                    image_cid TEXT NOT NULL,
-                    pixelated_image_cid TEXT DEFAULT '',
-                    block_number INTEGER,
-                    transaction_hash TEXT,
-                    created_at INTEGER DEFAULT (strftime('%s', 'now')),
-                    updated_at INTEGER DEFAULT (strftime('%s', 'now'))
+                CREATE TABLE IF NOT EXISTS capsule_payloads (
+                    capsule_id INTEGER PRIMARY KEY,
+                    encrypted_story BLOB NOT NULL
                 )
             """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS capsules_payload_delete AFTER DELETE ON capsules BEGIN
+                    DELETE FROM capsule_payloads WHERE capsule_id = OLD.id;
+                END
+            """)
+            self._init_summary_json(conn)
             
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS sync_status (
@@ -65,56 +458,495 @@ class CapsuleDatabase:
                 else:
                     print(f"Migration warning: {e}")
             
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS capsule_tags (
+                    tag TEXT NOT NULL,
+                    capsule_id INTEGER NOT NULL,
+                    PRIMARY KEY (tag, capsule_id)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_capsule_tags_capsule ON capsule_tags (capsule_id)")
+            # Upcoming and overdue reveal windows
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_capsules_reveal ON capsules (is_revealed, reveal_time, id)")
+            
+            self._init_fts(conn)
+            self._init_counters(conn)
+            
+            self._migrate(conn)
             conn.commit()
             logger.info("Database initialized successfully")
     
-    @contextmanager
-    def get_connection(self):
-        """Context manager for database connections"""
-        conn = sqlite3.connect(self.db_path)
+    def _init_counters(self, conn: sqlite3.Connection):
+        """
+        Counters behind /api/stats, kept current by triggers in the same
+        transaction as every insert, reveal and delete.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS capsule_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total INTEGER NOT NULL DEFAULT 0,
+                revealed INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO capsule_stats (id, total, revealed) VALUES (1, 0, 0)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS capsule_daily_counts (
+                day INTEGER PRIMARY KEY,
+                created INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_capsules_created_at ON capsules (created_at)")
+        
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS capsules_stats_insert AFTER INSERT ON capsules BEGIN
+                UPDATE capsule_stats SET total = total + 1, revealed = revealed + (NEW.is_revealed != 0) WHERE id = 1;
+                INSERT INTO capsule_daily_counts (day, created) VALUES (NEW.created_at / 86400, 1)
+                    ON CONFLICT (day) DO UPDATE SET created = created + 1;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS capsules_stats_delete AFTER DELETE ON capsules BEGIN
+                UPDATE capsule_stats SET total = total - 1, revealed = revealed - (OLD.is_revealed != 0) WHERE id = 1;
+                UPDATE capsule_daily_counts SET created = created - 1 WHERE day = OLD.created_at / 86400;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS capsules_stats_update AFTER UPDATE OF is_revealed, created_at ON capsules BEGIN
+                UPDATE capsule_stats SET revealed = revealed + (NEW.is_revealed != 0) - (OLD.is_revealed != 0) WHERE id = 1;
+                UPDATE capsule_daily_counts SET created = created - 1
+                    WHERE day = OLD.created_at / 86400 AND OLD.created_at / 86400 != NEW.created_at / 86400;
+                INSERT INTO capsule_daily_counts (day, created)
+                    SELECT NEW.created_at / 86400, 1 WHERE OLD.created_at / 86400 != NEW.created_at / 86400
+                    ON CONFLICT (day) DO UPDATE SET created = created + 1;
+            END
+        """)
+    
+    def _init_summary_json(self, conn: sqlite3.Connection):
+        """
+        capsule_json: each capsule's summary as the JSON the list endpoints send,
+        rewritten by triggers whenever the row is inserted or updated (revealed),
+        so list responses are assembled from stored text
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS capsule_json (
+                capsule_id INTEGER PRIMARY KEY,
+                summary_json TEXT NOT NULL
+            )
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS capsules_json_insert AFTER INSERT ON capsules BEGIN
+                INSERT OR REPLACE INTO capsule_json (capsule_id, summary_json) VALUES (NEW.id, {summary_json_sql("NEW")});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS capsules_json_update AFTER UPDATE ON capsules BEGIN
+                INSERT INTO capsule_json (capsule_id, summary_json) VALUES (NEW.id, {summary_json_sql("NEW")})
+                ON CONFLICT (capsule_id) DO UPDATE SET summary_json = excluded.summary_json;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS capsules_json_delete AFTER DELETE ON capsules BEGIN
+                DELETE FROM capsule_json WHERE capsule_id = OLD.id;
+            END
+        """)
+    
+    def _rebuild_counters(self, conn: sqlite3.Connection):
+        """Recompute the stats counters from the capsules table (caller commits)"""
+        conn.execute("""
+            UPDATE capsule_stats SET
+                total = (SELECT COUNT(*) FROM capsules),
+                revealed = (SELECT COUNT(*) FROM capsules WHERE is_revealed != 0)
+            WHERE id = 1
+        """)
+        conn.execute("DELETE FROM capsule_daily_counts")
+        conn.execute("""
+            INSERT INTO capsule_daily_counts (day, created)
+            SELECT created_at / 86400, COUNT(*) FROM capsules GROUP BY created_at / 86400
+        """)
+    
+    def _init_fts(self, conn: sqlite3.Connection):
+        """Create the full-text index if this SQLite build has FTS5; search falls back to LIKE otherwise"""
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'capsules_fts'"
+        ).fetchone() is not None
+        try:
+            # Standalone index keyed by capsule id, maintained explicitly by the write paths
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS capsules_fts USING fts5(
+                    title, tags, creator, decrypted_story,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            """)
+            # Every indexed term, so prefix queries can be expanded with a B-tree range scan
+            conn.execute("CREATE TABLE IF NOT EXISTS capsule_terms (term TEXT PRIMARY KEY) WITHOUT ROWID")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            self.fts_enabled = False
+            logger.warning(f"FTS5 not available, search will use LIKE scans: {e}")
+            return
+        
+        if not existed:
+            conn.execute("DELETE FROM capsule_terms")
+            rows = conn.execute("SELECT id, title, tags, creator, decrypted_story FROM capsules").fetchall()
+            self._write_fts(conn, [dict(row) for row in rows])
+            logger.info(f"Built full-text index for {len(rows)} capsules")
+    
+    def _write_fts(self, conn: sqlite3.Connection, capsules: List[Dict[str, Any]]):
+        """Replace the full-text index entries of the given capsules (caller commits)"""
+        if not self.fts_enabled:
+            return
+        conn.executemany("DELETE FROM capsules_fts WHERE rowid = ?", [(c['id'],) for c in capsules])
+        conn.executemany("""
+            INSERT INTO capsules_fts (rowid, title, tags, creator, decrypted_story)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(c['id'], c['title'], c['tags'], c['creator'], c.get('decrypted_story') or '') for c in capsules])
+        terms = set()
+        for capsule_data in capsules:
+            for column, _ in SEARCH_COLUMN_WEIGHTS:
+                terms.update(tokenize_text(capsule_data.get(column) or ''))
+        conn.executemany("INSERT OR IGNORE INTO capsule_terms (term) VALUES (?)", [(term,) for term in terms])
+    
+    def _build_fts_query(self, conn: sqlite3.Connection, query: str) -> str:
+        """
+        Turn free text into a safe FTS5 query: every word becomes a quoted term
+        and all terms must match. The last word also matches as a prefix, so
+        partially typed input works ("the dev" finds "The Devcon").
+        
+        The prefix is expanded into an OR of the known terms starting with it:
+        FTS5 reads OR-ed terms lazily in rowid order, whereas a native prefix
+        query merges every matching doclist up front.
+        """
+        tokens = tokenize_text(query)
+        if not tokens:
+            return ""
+        
+        last = tokens[-1]
+        expansions = [row['term'] for row in conn.execute(
+            "SELECT term FROM capsule_terms WHERE term >= ? AND term < ? ORDER BY term LIMIT ?",
+            (last, last + "\U0010ffff", MAX_PREFIX_TERMS + 1)
+        )]
+        terms = [f'"{token}"' for token in tokens[:-1]]
+        if len(expansions) > MAX_PREFIX_TERMS:
+            terms.append(f'"{last}"*')
+        elif expansions:
+            terms.append("(" + " OR ".join(f'"{term}"' for term in expansions) + ")")
+        else:
+            terms.append(f'"{last}"')
+        return " AND ".join(terms)
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        """Run one-off data migrations, tracked with PRAGMA user_version"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        
+        if version < 1:
+            # Backfill the normalized tag index for capsules stored before it existed
+            conn.execute("DELETE FROM capsule_tags")
+            rows = conn.execute("SELECT id, tags FROM capsules").fetchall()
+            self._write_tags(conn, [dict(row) for row in rows])
+            logger.info(f"Migration 1: indexed tags of {len(rows)} capsules")
+        
+        if version < 2:
+            # Seed the stats counters; triggers keep them current from here on
+            self._rebuild_counters(conn)
+            logger.info("Migration 2: initialized capsule counters")
+        
+        if version < 3:
+            # Creator lookups match any address casing; events carry the checksummed form
+            columns = [row['name'] for row in conn.execute("PRAGMA table_xinfo(capsules)")]
+            if "creator_lc" not in columns:
+                conn.execute("ALTER TABLE capsules ADD COLUMN creator_lc TEXT GENERATED ALWAYS AS (lower(creator)) VIRTUAL")
+            conn.execute("DROP INDEX IF EXISTS idx_capsules_creator")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_capsules_creator_lc ON capsules (creator_lc, id DESC)")
+            logger.info("Migration 3: indexed lower-case creator addresses")
+        
+        if version < 4:
+            # Block time of the reveal; earlier reveals are dated by their last update
+            columns = [row['name'] for row in conn.execute("PRAGMA table_xinfo(capsules)")]
+            if "revealed_at" not in columns:
+                conn.execute("ALTER TABLE capsules ADD COLUMN revealed_at INTEGER")
+            conn.execute("UPDATE capsules SET revealed_at = updated_at WHERE is_revealed != 0 AND revealed_at IS NULL")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_capsules_revealed_at ON capsules (revealed_at)")
+            logger.info("Migration 4: added reveal timestamps")
+        
+        if version < 5:
+            # Ciphertext moves out of capsules into capsule_payloads
+            columns = [row['name'] for row in conn.execute("PRAGMA table_xinfo(capsules)")]
+            if "encrypted_story" in columns:
+                self._move_payloads(conn)
+        
+        if version < 6:
+            # Seed the stored summary JSON; triggers keep it current from here on
+            count = conn.execute(f"""
+                INSERT OR REPLACE INTO capsule_json (capsule_id, summary_json)
+                SELECT id, {summary_json_sql("capsules")} FROM capsules
+            """).rowcount
+            logger.info(f"Migration 6: stored summary JSON of {count} capsules")
+        
+        if version < 7:
+            # capsules_json_update inserts the row when it is missing instead of updating nothing
+            conn.execute("DROP TRIGGER IF EXISTS capsules_json_update")
+            self._init_summary_json(conn)
+            count = conn.execute(f"""
+                INSERT INTO capsule_json (capsule_id, summary_json)
+                SELECT id, {summary_json_sql("capsules")} FROM capsules
+                WHERE id NOT IN (SELECT capsule_id FROM capsule_json)
+            """).rowcount
+            logger.info(f"Migration 7: stored missing summary JSON of {count} capsules")
+        
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    def _move_payloads(self, conn: sqlite3.Connection):
+        """
+        Copy encrypted_story into capsule_payloads and rebuild capsules without
+        it (caller commits). A full rebuild rather than ALTER TABLE DROP COLUMN,
+        which needs SQLite 3.35; indexes and triggers are re-created from
+        their stored definitions.
+        """
+        count = conn.execute("""
+            INSERT OR REPLACE INTO capsule_payloads (capsule_id, encrypted_story)
+            SELECT id, encrypted_story FROM capsules
+        """).rowcount
+        schema = [row['sql'] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'capsules' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        )]
+        columns = ", ".join(CAPSULES_TABLE_COLUMNS)
+        conn.execute("DROP TABLE IF EXISTS capsules_rebuild")
+        conn.execute(CAPSULES_TABLE_SQL.format(name="capsules_rebuild"))
+        conn.execute(f"INSERT INTO capsules_rebuild ({columns}) SELECT {columns} FROM capsules")
+        # DROP TABLE fires no delete triggers, so the counters and payloads are untouched
+        conn.execute("DROP TABLE capsules")
+        conn.execute("ALTER TABLE capsules_rebuild RENAME TO capsules")
+        for sql in schema:
+            conn.execute(sql)
+        logger.info(f"Migration 5: moved {count} ciphertexts to capsule_payloads")
+    
+    def _projection(self, columns: Optional[Sequence[str]] = None) -> Tuple[str, str]:
+        """SELECT list of a projection and the side table joins it needs ("" if none)"""
+        columns = list(columns or SUMMARY_COLUMNS)
+        joins = []
+        if any(column in PAYLOAD_COLUMNS for column in columns):
+            joins.append("LEFT JOIN capsule_payloads p ON p.capsule_id = c.id")
+        if SUMMARY_JSON_COLUMN in columns:
+            joins.append("LEFT JOIN capsule_json j ON j.capsule_id = c.id")
+        return select_columns(columns, payload_alias="p", summary_json=f"j.{SUMMARY_JSON_COLUMN}"), " ".join(joins)
+    
+    def _write_tags(self, conn: sqlite3.Connection, capsules: List[Dict[str, Any]]):
+        """Replace the capsule_tags rows of the given capsules (caller commits)"""
+        conn.executemany("DELETE FROM capsule_tags WHERE capsule_id = ?", [(c['id'],) for c in capsules])
+        conn.executemany(
+            "INSERT OR IGNORE INTO capsule_tags (tag, capsule_id) VALUES (?, ?)",
+            [(tag, c['id']) for c in capsules for tag in split_tags(c['tags'])]
+        )
+    
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """Open a connection with the tuned pragmas applied"""
+        if readonly and self.db_path != ":memory:":
+            # Read-only URI connections can never take the write lock
+            conn = sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True, factory=InstrumentedConnection,
+                                   timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False,
+                                   factory=InstrumentedConnection)
         conn.row_factory = sqlite3.Row
+        conn.query_stats = self.query_stats
+
+        if not readonly:
+            # Only takes effect while the file is still empty (switching to WAL
+            # writes its header); reclaim_space converts older files
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # WAL lets API readers run concurrently with the sync thread's writes;
+            # NORMAL is durable across application crashes in WAL mode
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    @contextmanager
+    def get_connection(self, readonly: bool = False):
+        """
+        Context manager for pooled database connections
+        
+        Args:
+            readonly: Use a read-only connection (API reads); never blocks on or blocks the writer
+        """
+        pool = self._read_pool if readonly else self._write_pool
+        conn = pool.acquire()
         try:
             yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
         finally:
-            conn.close()
+            pool.release(conn)
+    
+    def _write_capsules(self, conn: sqlite3.Connection, capsules: List[Dict[str, Any]]):
+        """Insert or update capsule rows with their tag and full-text entries (caller commits)"""
+        # An upsert rather than INSERT OR REPLACE: REPLACE deletes the old row without
+        # firing delete triggers (which would skew the counters) and resets created_at.
+        # created_at is the block timestamp when the sync provides one, otherwise the
+        # insert time; a block always predates its rows, so MIN() lets a re-sync correct
+        # insert-time values while a write without a timestamp keeps the stored one
+        conn.executemany("""
+            INSERT INTO capsules (
+                id, creator, title, tags, decrypted_story,
+                is_revealed, reveal_time, shutter_identity, image_cid, pixelated_image_cid,
+                block_number, transaction_hash, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, strftime('%s', 'now')), strftime('%s', 'now'))
+            ON CONFLICT (id) DO UPDATE SET
+                creator = excluded.creator,
+                title = excluded.title,
+                tags = excluded.tags,
+                decrypted_story = excluded.decrypted_story,
+                is_revealed = excluded.is_revealed,
+                reveal_time = excluded.reveal_time,
+                shutter_identity = excluded.shutter_identity,
+                image_cid = excluded.image_cid,
+                pixelated_image_cid = excluded.pixelated_image_cid,
+                block_number = excluded.block_number,
+                transaction_hash = excluded.transaction_hash,
+                created_at = MIN(capsules.created_at, excluded.created_at),
+                updated_at = excluded.updated_at
+        """, [(
+            capsule_data['id'],
+            capsule_data['creator'],
+            capsule_data['title'],
+            capsule_data['tags'],
+            capsule_data['decrypted_story'],
+            capsule_data['is_revealed'],
+            capsule_data['reveal_time'],
+            capsule_data['shutter_identity'],
+            capsule_data['image_cid'],
+            capsule_data.get('pixelated_image_cid', ''),
+            capsule_data.get('block_number'),
+            capsule_data.get('transaction_hash'),
+            capsule_data.get('created_at')
+        ) for capsule_data in capsules])
+        conn.executemany("""
+            INSERT INTO capsule_payloads (capsule_id, encrypted_story) VALUES (?, ?)
+            ON CONFLICT (capsule_id) DO UPDATE SET encrypted_story = excluded.encrypted_story
+        """, [(capsule_data['id'], capsule_data['encrypted_story']) for capsule_data in capsules])
+        # A batch may hold several versions of a capsule (created, then revealed); index the last one
+        latest = list({capsule_data['id']: capsule_data for capsule_data in capsules}.values())
+        self._write_tags(conn, latest)
+        self._write_fts(conn, latest)
     
     def insert_capsule(self, capsule_data: Dict[str, Any]) -> bool:
         """Insert or update a capsule in the database"""
         try:
-            with self.get_connection() as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO capsules (
-                        id, creator, title, tags, encrypted_story, decrypted_story,
-                        is_revealed, reveal_time, shutter_identity, image_cid, pixelated_image_cid,
-                        block_number, transaction_hash, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, strftime('%s', 'now'))
-                """, (
-                    capsule_data['id'],
-                    capsule_data['creator'],
-                    capsule_data['title'], 
-                    capsule_data['tags'],
-                    capsule_data['encrypted_story'],
-                    capsule_data['decrypted_story'],
-                    capsule_data['is_revealed'],
-                    capsule_data['reveal_time'],
-                    capsule_data['shutter_identity'],
-                    capsule_data['image_cid'],
-                    capsule_data.get('pixelated_image_cid', ''),
-                    capsule_data.get('block_number'),
-                    capsule_data.get('transaction_hash')
-                ))
-                conn.commit()
-                return True
+            self._write(lambda conn: self._write_capsules(conn, [capsule_data]))
+            return True
         except Exception as e:
             logger.error(f"Error inserting capsule {capsule_data.get('id')}: {e}")
             return False
     
-    def get_capsule(self, capsule_id: int) -> Optional[Dict[str, Any]]:
+    def _reveal_rows(self, conn: sqlite3.Connection, reveals: List[Dict[str, Any]]) -> List[int]:
+        """
+        Mark capsules revealed in place (caller commits). Only the reveal
+        columns and the story's full-text entry are touched; the ciphertext
+        and the rest of the row stay where they are.
+        
+        Returns:
+            Ids of reveals whose capsule is not stored
+        """
+        missing, revealed = [], []
+        for reveal in reveals:
+            cursor = conn.execute("""
+                UPDATE capsules SET
+                    decrypted_story = ?,
+                    is_revealed = 1,
+                    block_number = ?,
+                    transaction_hash = ?,
+                    updated_at = strftime('%s', 'now'),
+                    revealed_at = COALESCE(?, strftime('%s', 'now'))
+                WHERE id = ?
+            """, (reveal['decrypted_story'], reveal.get('block_number'),
+                  reveal.get('transaction_hash'), reveal.get('revealed_at'), reveal['id']))
+            (revealed if cursor.rowcount else missing).append(reveal)
+        
+        if revealed and self.fts_enabled:
+            conn.executemany("UPDATE capsules_fts SET decrypted_story = ? WHERE rowid = ?",
+                             [(reveal['decrypted_story'] or '', reveal['id']) for reveal in revealed])
+            terms = set()
+            for reveal in revealed:
+                terms.update(tokenize_text(reveal['decrypted_story'] or ''))
+            conn.executemany("INSERT OR IGNORE INTO capsule_terms (term) VALUES (?)", [(term,) for term in terms])
+        return [reveal['id'] for reveal in missing]
+    
+    def reveal_capsule(self, capsule_id: int, decrypted_story: str,
+                       block_number: Optional[int] = None, transaction_hash: Optional[str] = None,
+                       revealed_at: Optional[int] = None) -> Optional[bool]:
+        """
+        Store the plaintext of a revealed capsule with a targeted UPDATE
+        
+        Returns:
+            True if the capsule was updated, False if it is not stored, None on error
+        """
+        try:
+            missing = self._write(lambda conn: self._reveal_rows(conn, [{
+                'id': capsule_id,
+                'decrypted_story': decrypted_story,
+                'block_number': block_number,
+                'transaction_hash': transaction_hash,
+                'revealed_at': revealed_at
+            }]))
+            return not missing
+        except Exception as e:
+            logger.error(f"Error revealing capsule {capsule_id}: {e}")
+            return None
+    
+    def apply_batch(self, created: List[Dict[str, Any]], revealed: List[Dict[str, Any]],
+                    last_block: int, errors: str = '') -> Optional[List[int]]:
+        """
+        Apply one synced block range atomically: store created capsules, apply
+        reveals and advance sync_status to last_block in a single transaction.
+        
+        Either everything is stored and the block cursor moves, or nothing
+        changes and the range is synced again, so a crash can never leave the
+        cursor ahead of the data.
+        
+        Args:
+            created: Capsules from CapsuleCreated events, with created_at set to the block timestamp
+            revealed: Reveals from CapsuleRevealed events, each with id, decrypted_story,
+                block_number, transaction_hash and optionally revealed_at (block timestamp);
+                applied after created, so a capsule created earlier in the range can be revealed
+            last_block: Last block of the synced range
+            errors: Sync error summary to record
+            
+        Returns:
+            Ids of reveals whose capsule is not stored (empty if all applied), or None on error
+        """
+        def write(conn: sqlite3.Connection) -> List[int]:
+            if created:
+                self._write_capsules(conn, created)
+            missing = self._reveal_rows(conn, revealed) if revealed else []
+            conn.execute("""
+                UPDATE sync_status SET 
+                    last_synced_block = ?,
+                    last_sync_time = strftime('%s', 'now'),
+                    total_capsules = (SELECT total FROM capsule_stats WHERE id = 1),
+                    sync_errors = ?
+                WHERE id = 1
+            """, (last_block, errors))
+            return missing
+        
+        try:
+            return self._write(write)
+        except Exception as e:
+            logger.error(f"Error applying sync batch up to block {last_block}: {e}")
+            return None
+    
+    def get_capsule(self, capsule_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
         """Get a single capsule by ID"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM capsules WHERE id = ?
+            with self.get_connection(readonly=True) as conn:
+                projection, payload_join = self._projection(columns or CAPSULE_COLUMNS)
+                cursor = conn.execute(f"""
+                    SELECT {projection} FROM capsules c {payload_join} WHERE id = ?
                 """, (capsule_id,))
                 row = cursor.fetchone()
                 if row:
@@ -124,56 +956,114 @@ class CapsuleDatabase:
             logger.error(f"Error fetching capsule {capsule_id}: {e}")
             return None
     
-    def get_capsules(self, offset: int = 0, limit: int = 10, revealed_only: bool = False, tag: str = None) -> List[Dict[str, Any]]:
-        """Get multiple capsules with pagination and optional tag filtering"""
+    def get_capsules(self, offset: int = 0, limit: int = 10, revealed_only: bool = False, tag: str = None,
+                     after_id: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get multiple capsules, newest first, with optional tag filtering (exact, case-insensitive tag match)
+        
+        Args:
+            offset: Rows to skip (ignored in cursor mode)
+            limit: Maximum rows
+            revealed_only: Only revealed capsules
+            tag: Tag filter
+            after_id: Cursor mode - only capsules with id < after_id (the last id of the previous page)
+            columns: Projection (defaults to SUMMARY_COLUMNS, without the ciphertext)
+        """
         try:
-            with self.get_connection() as conn:
-                where_conditions = []
-                params = []
-                
-                if revealed_only:
-                    where_conditions.append("is_revealed = 1")
+            projection, payload_join = self._projection(columns)
+            with self.get_connection(readonly=True) as conn:
+                revealed_clause = "AND c.is_revealed = 1" if revealed_only else ""
+                # Tag queries walk capsule_tags, so the cursor applies to its capsule_id
+                key_column = "t.capsule_id" if tag else "c.id"
+                cursor_clause, cursor_params = "", []
+                if after_id is not None:
+                    # Keyset pagination: seeks straight to the page instead of skipping rows
+                    cursor_clause, cursor_params, offset = f"AND {key_column} < ?", [after_id], 0
                 
                 if tag:
-                    # Case-insensitive tag search - tags are stored as comma-separated values
-                    where_conditions.append("LOWER(tags) LIKE ?")
-                    params.append(f"%{tag.lower()}%")
-                
-                where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+                    # Index range scan over capsule_tags (tag, capsule_id), newest first
+                    cursor = conn.execute(f"""
+                        SELECT {projection} FROM capsule_tags t
+                        JOIN capsules c ON c.id = t.capsule_id {payload_join}
+                        WHERE t.tag = ? {cursor_clause} {revealed_clause}
+                        ORDER BY t.capsule_id DESC LIMIT ? OFFSET ?
+                    """, [tag.strip().casefold()] + cursor_params + [limit, offset])
+                    return [dict(row) for row in cursor.fetchall()]
                 
                 cursor = conn.execute(f"""
-                    SELECT * FROM capsules {where_clause}
-                    ORDER BY id DESC LIMIT ? OFFSET ?
-                """, params + [limit, offset])
+                    SELECT {projection} FROM capsules c {payload_join} WHERE 1 = 1 {cursor_clause} {revealed_clause}
+                    ORDER BY c.id DESC LIMIT ? OFFSET ?
+                """, cursor_params + [limit, offset])
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error fetching capsules: {e}")
             return []
     
     def get_capsule_count(self) -> int:
-        """Get total number of capsules"""
+        """Get total number of capsules (from the maintained counter)"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute("SELECT COUNT(*) as count FROM capsules")
-                return cursor.fetchone()['count']
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute("SELECT total FROM capsule_stats WHERE id = 1")
+                return cursor.fetchone()['total']
         except Exception as e:
             logger.error(f"Error getting capsule count: {e}")
             return 0
     
+    def get_stats(self, days: int = 7) -> Dict[str, Any]:
+        """
+        Capsule statistics from the maintained counters
+        
+        Args:
+            days: Number of most recent daily creation buckets to include
+        
+        Returns:
+            total, revealed, unrevealed, recent_24h, revealed_24h and
+            daily_created ([{day, created}], oldest first)
+        """
+        try:
+            with self.get_connection(readonly=True) as conn:
+                counters = conn.execute("SELECT total, revealed FROM capsule_stats WHERE id = 1").fetchone()
+                # Index range counts over the last day's rows only
+                recent = conn.execute(
+                    "SELECT COUNT(*) AS count FROM capsules WHERE created_at > ?",
+                    (int(time.time()) - 86400,)
+                ).fetchone()['count']
+                recent_reveals = conn.execute(
+                    "SELECT COUNT(*) AS count FROM capsules WHERE revealed_at > ?",
+                    (int(time.time()) - 86400,)
+                ).fetchone()['count']
+                first_day = int(time.time()) // 86400 - days + 1
+                buckets = conn.execute(
+                    "SELECT day, created FROM capsule_daily_counts WHERE day >= ? AND created > 0 ORDER BY day",
+                    (first_day,)
+                ).fetchall()
+                return {
+                    "total": counters['total'],
+                    "revealed": counters['revealed'],
+                    "unrevealed": counters['total'] - counters['revealed'],
+                    "recent_24h": recent,
+                    "revealed_24h": recent_reveals,
+                    "daily_created": [
+                        {"day": time.strftime("%Y-%m-%d", time.gmtime(row['day'] * 86400)), "created": row['created']}
+                        for row in buckets
+                    ]
+                }
+        except Exception as e:
+            logger.error(f"Error getting capsule stats: {e}")
+            return {}
+    
     def update_sync_status(self, last_block: int, total_capsules: int, errors: str = '') -> bool:
         """Update synchronization status"""
         try:
-            with self.get_connection() as conn:
-                conn.execute("""
-                    UPDATE sync_status SET 
-                        last_synced_block = ?,
-                        last_sync_time = strftime('%s', 'now'),
-                        total_capsules = ?,
-                        sync_errors = ?
-                    WHERE id = 1
-                """, (last_block, total_capsules, errors))
-                conn.commit()
-                return True
+            self._write(lambda conn: conn.execute("""
+                UPDATE sync_status SET 
+                    last_synced_block = ?,
+                    last_sync_time = strftime('%s', 'now'),
+                    total_capsules = ?,
+                    sync_errors = ?
+                WHERE id = 1
+            """, (last_block, total_capsules, errors)))
+            return True
         except Exception as e:
             logger.error(f"Error updating sync status: {e}")
             return False
@@ -181,7 +1071,7 @@ class CapsuleDatabase:
     def get_sync_status(self) -> Dict[str, Any]:
         """Get current synchronization status"""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(readonly=True) as conn:
                 cursor = conn.execute("SELECT * FROM sync_status WHERE id = 1")
                 row = cursor.fetchone()
                 if row:
@@ -191,40 +1081,131 @@ class CapsuleDatabase:
             logger.error(f"Error getting sync status: {e}")
             return {}
     
-    def search_capsules(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search capsules by title, tags, or creator"""
+    def search_capsules(self, query: str, limit: int = 10, after: Optional[List[Any]] = None,
+                        columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Full-text search over title, tags, creator and revealed story
+        
+        Args:
+            query: Free text; each word matches as a prefix
+            limit: Maximum results
+            after: [search_rank, id, search_window] of the last result of the previous page
+            columns: Projection (defaults to SUMMARY_COLUMNS, without the ciphertext)
+        
+        Returns:
+            Capsules ordered by relevance (best first) within each window, each
+            with 'search_rank' and 'search_window' keys
+        
+        Relevance is the weighted sum of the columns matching the whole query
+        (see SEARCH_COLUMN_WEIGHTS), newest first among equal scores. Matches
+        are scored search_candidates at a time, newest window first, which
+        keeps latency flat as the table grows; corpus-wide bm25 would have to
+        visit every match. Paging past a window continues with older matches.
+        """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM capsules 
-                    WHERE title LIKE ? OR tags LIKE ? OR creator LIKE ?
-                    ORDER BY id DESC LIMIT ?
-                """, (f"%{query}%", f"%{query}%", f"%{query}%", limit))
-                return [dict(row) for row in cursor.fetchall()]
+            projection, payload_join = self._projection(columns)
+            with self.get_connection(readonly=True) as conn:
+                if not self.fts_enabled:
+                    return self._search_capsules_like(conn, query, limit, after, projection, payload_join)
+                
+                fts_query = self._build_fts_query(conn, query)
+                if not fts_query:
+                    return []
+                
+                # Column matches are looked up only within the candidates' rowid range
+                score = " + ".join(
+                    f"{weight} * (rowid IN (SELECT rowid FROM capsules_fts WHERE capsules_fts MATCH "
+                    f"'{{{column}}} : (' || :query || ')' AND rowid >= (SELECT low FROM bounds)))"
+                    for column, weight in SEARCH_COLUMN_WEIGHTS
+                )
+                candidates = """
+                    SELECT rowid FROM capsules_fts WHERE capsules_fts MATCH :query AND rowid < :below
+                    ORDER BY rowid DESC LIMIT :window
+                """
+                
+                def search_window(below, keyset, page_limit):
+                    params: Dict[str, Any] = {"query": fts_query, "window": self.search_candidates,
+                                              "below": below, "limit": page_limit}
+                    keyset_sql = ""
+                    if keyset:
+                        keyset_sql = "WHERE score < :after_score OR (score = :after_score AND rowid < :after_id)"
+                        params.update(after_score=keyset[0], after_id=keyset[1])
+                    cursor = conn.execute(f"""
+                        WITH candidates AS ({candidates}), bounds AS (
+                            SELECT MIN(rowid) AS low FROM candidates
+                        ), scored AS (
+                            SELECT rowid, {score} AS score FROM candidates
+                        ), page AS (
+                            SELECT rowid, score FROM scored {keyset_sql}
+                            ORDER BY score DESC, rowid DESC LIMIT :limit
+                        )
+                        SELECT {projection}, page.score AS search_rank FROM page
+                        JOIN capsules c ON c.id = page.rowid {payload_join}
+                        ORDER BY page.score DESC, page.rowid DESC
+                    """, params)
+                    return [dict(row) for row in cursor.fetchall()]
+                
+                def window_bounds(below):
+                    row = conn.execute(f"SELECT MIN(rowid), COUNT(*) FROM ({candidates})",
+                                       {"query": fts_query, "window": self.search_candidates, "below": below}).fetchone()
+                    return row[0], row[1]
+                
+                return self._search_windows(search_window, window_bounds, limit, after)
         except Exception as e:
             logger.error(f"Error searching capsules: {e}")
             return []
     
-    def get_capsules_by_creator(self, creator_address: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get capsules created by a specific address"""
+    def _search_capsules_like(self, conn: sqlite3.Connection, query: str, limit: int,
+                              after: Optional[List[Any]], projection: str, payload_join: str = "") -> List[Dict[str, Any]]:
+        """Unranked substring search for SQLite builds without FTS5 (newest first)"""
+        pattern = f"%{query}%"
+        cursor = conn.execute(f"""
+            SELECT {projection}, 0 AS search_rank FROM capsules c {payload_join}
+            WHERE (title LIKE ? OR tags LIKE ? OR creator LIKE ? OR decrypted_story LIKE ?) AND id < ?
+            ORDER BY id DESC LIMIT ?
+        """, (pattern, pattern, pattern, pattern, after[1] if after else 2 ** 63 - 1, limit))
+        return [dict(row, search_window=MAX_ID) for row in cursor.fetchall()]
+    
+    def get_capsules_by_creator(self, creator_address: str, limit: int = 10, after_id: Optional[int] = None,
+                                columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get capsules created by an address (any casing), newest first
+        
+        Args:
+            after_id: Keyset cursor, the id of the last capsule of the previous page
+            columns: Columns to return (defaults to SUMMARY_COLUMNS)
+        """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM capsules WHERE creator = ?
+            projection, payload_join = self._projection(columns)
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute(f"""
+                    SELECT {projection} FROM capsules c {payload_join} WHERE creator_lc = lower(?) AND id < ?
                     ORDER BY id DESC LIMIT ?
-                """, (creator_address, limit))
+                """, (creator_address, after_id if after_id is not None else 2 ** 63 - 1, limit))
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error fetching capsules by creator: {e}")
             return []
     
-    def get_recent_capsules(self, hours: int = 24, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get capsules created in the last N hours"""
+    def get_creator_count(self, creator_address: str) -> int:
+        """Number of capsules created by an address (any casing)"""
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute("SELECT COUNT(*) FROM capsules WHERE creator_lc = lower(?)", (creator_address,))
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error counting capsules by creator: {e}")
+            return 0
+    
+    def get_recent_capsules(self, hours: int = 24, limit: int = 10,
+                            columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Get capsules created in the last N hours (columns defaults to SUMMARY_COLUMNS)"""
         try:
             cutoff_time = int(time.time()) - (hours * 3600)
-            with self.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM capsules WHERE created_at > ?
+            projection, payload_join = self._projection(columns)
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute(f"""
+                    SELECT {projection} FROM capsules c {payload_join} WHERE created_at > ?
                     ORDER BY created_at DESC LIMIT ?
                 """, (cutoff_time, limit))
                 return [dict(row) for row in cursor.fetchall()]
@@ -232,7 +1213,137 @@ class CapsuleDatabase:
             logger.error(f"Error fetching recent capsules: {e}")
             return []
     
+    def _get_unrevealed(self, after: List[int], until: int, limit: int,
+                        columns: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+        """Reveal-window page, served by idx_capsules_reveal"""
+        try:
+            projection, payload_join = self._projection(reveal_columns(columns))
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute(f"""
+                    SELECT {projection} FROM capsules c {payload_join}
+                    WHERE is_revealed = 0 AND (reveal_time, id) > (?, ?) AND reveal_time <= ?
+                    ORDER BY reveal_time, id LIMIT ?
+                """, (int(after[0]), int(after[1]), until, limit))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error fetching unrevealed capsules: {e}")
+            return []
+    
+    def get_content_cids(self) -> Dict[str, List[int]]:
+        """Map every image_cid and pixelated_image_cid to the capsule ids referencing it"""
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute("SELECT id, image_cid, pixelated_image_cid FROM capsules")
+                cids: Dict[str, List[int]] = {}
+                for row in cursor:
+                    for cid in (row['image_cid'], row['pixelated_image_cid']):
+                        if cid:
+                            cids.setdefault(cid, []).append(row['id'])
+                return cids
+        except Exception as e:
+            logger.error(f"Error fetching content CIDs: {e}")
+            return {}
+    
+    def get_capsule_cids(self, after_id: int = -1) -> List[Dict[str, Any]]:
+        """Get id, image_cid and pixelated_image_cid of capsules with id > after_id, oldest first"""
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute("""
+                    SELECT id, image_cid, pixelated_image_cid FROM capsules
+                    WHERE id > ? ORDER BY id ASC
+                """, (after_id,))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error fetching capsule CIDs: {e}")
+            return []
+    
+    def get_compactable_payloads(self, after_id: int = -1, limit: int = 500,
+                                 revealed_before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Ciphertext of revealed capsules, for archiving before delete_payloads
+        
+        Args:
+            after_id: Keyset cursor, the last id of the previous page
+            revealed_before: Only capsules revealed at or before this unix time (reveals
+                synced before revealed_at was recorded count from their last update)
+        """
+        revealed_before = int(time.time()) if revealed_before is None else revealed_before
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.execute("""
+                    SELECT p.capsule_id AS id, p.encrypted_story FROM capsule_payloads p
+                    JOIN capsules c ON c.id = p.capsule_id
+                    WHERE p.capsule_id > ? AND c.is_revealed = 1
+                      AND COALESCE(c.revealed_at, c.updated_at) <= ?
+                    ORDER BY p.capsule_id LIMIT ?
+                """, (after_id, revealed_before, limit))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error fetching compactable payloads: {e}")
+            return []
+    
+    def delete_payloads(self, capsule_ids: List[int]) -> int:
+        """Delete capsule_payloads rows of revealed capsules (unrevealed ids are skipped)"""
+        def write(conn: sqlite3.Connection) -> int:
+            cursor = conn.executemany("""
+                DELETE FROM capsule_payloads WHERE capsule_id = ?
+                AND EXISTS (SELECT 1 FROM capsules WHERE id = capsule_id AND is_revealed = 1)
+            """, [(capsule_id,) for capsule_id in capsule_ids])
+            return cursor.rowcount
+        try:
+            return self._write(write)
+        except Exception as e:
+            logger.error(f"Error deleting ciphertext of {len(capsule_ids)} capsules: {e}")
+            return 0
+    
+    def reclaim_space(self, max_pages: int = 0, full_vacuum: bool = True) -> Dict[str, Any]:
+        """
+        Truncate free pages off the end of the file with PRAGMA incremental_vacuum
+        
+        Databases created before auto_vacuum was enabled are converted with one
+        full VACUUM first (it rewrites the whole file and holds the write lock
+        while it runs); with full_vacuum=False they are left as they are and
+        the report's needs_full_vacuum is set. Runs on the writer thread,
+        between write groups.
+        """
+        def vacuum(conn: sqlite3.Connection) -> Dict[str, Any]:
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            needs_full_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+            if needs_full_vacuum and full_vacuum:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            elif not needs_full_vacuum:
+                # Frees one page per step, and execute() stops after the first:
+                # executescript steps it to completion
+                conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+            free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            return {
+                "full_vacuum": needs_full_vacuum and full_vacuum,
+                "needs_full_vacuum": needs_full_vacuum and not full_vacuum,
+                "freed_pages": free_before - free_after,
+                "free_pages": free_after,
+                "page_size": page_size,
+                "database_bytes": conn.execute("PRAGMA page_count").fetchone()[0] * page_size
+            }
+        # Not bounded by write_timeout: a full VACUUM of a large file takes minutes
+        return self.writer.execute(vacuum, transaction=False)
+    
     def close(self):
-        """Close database connections (cleanup)"""
-        # Connections are automatically closed by context manager
-        pass
+        """Finish queued writes and close pooled database connections (cleanup)"""
+        self.writer.close()
+        self._read_pool.close()
+        self._write_pool.close()
+
+
+def create_database_from_env(default_path: str = "capsules.db") -> BaseCapsuleDatabase:
+    """PostgreSQL when DATABASE_URL is set (e.g. Heroku Postgres), otherwise SQLite at default_path"""
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        # psycopg2 is only needed when the PostgreSQL backend is selected
+        from database_postgres import PostgresCapsuleDatabase
+        return PostgresCapsuleDatabase(
+            database_url,
+            max_connections=int(os.environ.get("DATABASE_POOL_SIZE", "10"))
+        )
+    return CapsuleDatabase(default_path, slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", "100")))
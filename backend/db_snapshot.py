@@ -0,0 +1,264 @@
+# db_snapshot.py - Checksummed SQLite snapshots in blob storage, restored at boot for fast cold starts
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from urllib.parse import quote
+from typing import Dict, Any, Optional
+
+from database import CapsuleDatabase, SCHEMA_VERSION
+from blob_storage import BlobStorage
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAMESPACE = "snapshots"
+
+# Points at the newest snapshot; written after the snapshot itself, so it never names a partial upload
+MANIFEST_KEY = "latest.json"
+
+MANIFEST_FORMAT = 1
+
+
+class SnapshotError(Exception):
+    """A snapshot could not be taken, or failed verification and was not restored"""
+
+
+def read_sync_status(db_path: str) -> Optional[Dict[str, Any]]:
+    """sync_status row of a database file, or None if the file is missing or has none"""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+        try:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM sync_status WHERE id = 1").fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def read_manifest(storage: BlobStorage, namespace: str = SNAPSHOT_NAMESPACE) -> Optional[Dict[str, Any]]:
+    data = storage.get(namespace, MANIFEST_KEY)
+    if data is None:
+        return None
+    try:
+        manifest = json.loads(data)
+    except ValueError:
+        raise SnapshotError("Snapshot manifest is not valid JSON")
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise SnapshotError(f"Unsupported snapshot manifest format: {manifest.get('format')}")
+    return manifest
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatabaseSnapshotter:
+    """
+    Periodic snapshots of a SQLite capsule database in blob storage.
+
+    A snapshot is a VACUUM INTO copy (one consistent read transaction, so
+    capsules and sync_status always agree), gzipped and uploaded under a
+    new key; the manifest recording its sha256 and last synced block is
+    replaced afterwards. The newest `keep` snapshots are retained.
+    """
+    def __init__(self, db: CapsuleDatabase, storage: BlobStorage, namespace: str = SNAPSHOT_NAMESPACE,
+                 keep: int = 3, work_dir: Optional[str] = None, last_snapshot_block: Optional[int] = None):
+        self.db = db
+        self.storage = storage
+        self.namespace = namespace
+        self.keep = max(1, keep)
+        self.work_dir = work_dir
+        self.last_snapshot_block = last_snapshot_block
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def create_snapshot(self) -> Dict[str, Any]:
+        """Take a snapshot, upload it and point the manifest at it"""
+        with self._lock, tempfile.TemporaryDirectory(dir=self.work_dir) as tmp_dir:
+            start_time = time.time()
+            raw_path = os.path.join(tmp_dir, "capsules.db")
+            with self.db.get_connection(readonly=True) as conn:
+                conn.execute("VACUUM INTO ?", (raw_path,))
+            status = read_sync_status(raw_path) or {}
+
+            compressed_path = raw_path + ".gz"
+            with open(raw_path, "rb") as src, gzip.open(compressed_path, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+            last_block = status.get("last_synced_block", 0)
+            key = f"capsules-{last_block}-{int(start_time)}.db.gz"
+            sha256 = file_sha256(compressed_path)
+            size, compressed_size = os.path.getsize(raw_path), os.path.getsize(compressed_path)
+            self.storage.put_file(self.namespace, key, compressed_path)
+
+            try:
+                previous = (read_manifest(self.storage, self.namespace) or {}).get("snapshots", [])
+            except SnapshotError:
+                previous = []
+            retained = [key] + [old for old in previous if old != key][:self.keep - 1]
+            manifest = {
+                "format": MANIFEST_FORMAT,
+                "key": key,
+                "sha256": sha256,
+                "size": size,
+                "compressed_size": compressed_size,
+                "schema_version": SCHEMA_VERSION,
+                "last_synced_block": last_block,
+                "total_capsules": status.get("total_capsules", 0),
+                "created_at": int(start_time),
+                "snapshots": retained
+            }
+            self.storage.put(self.namespace, MANIFEST_KEY, json.dumps(manifest, indent=2).encode())
+
+        for old in previous:
+            if old not in retained:
+                try:
+                    self.storage.delete(self.namespace, old)
+                except Exception as e:
+                    logger.warning(f"Could not delete old snapshot {old}: {e}")
+
+        self.last_snapshot_block = last_block
+        logger.info(f"Database snapshot {key}: block {last_block}, {manifest['compressed_size'] // 1024} KiB "
+                    f"in {time.time() - start_time:.1f}s")
+        return manifest
+
+    def snapshot_if_changed(self) -> Optional[Dict[str, Any]]:
+        """Take a snapshot unless the sync has not advanced since the last one"""
+        last_block = self.db.get_sync_status().get("last_synced_block")
+        if last_block is None or last_block == self.last_snapshot_block:
+            return None
+        try:
+            return self.create_snapshot()
+        except Exception as e:
+            logger.error(f"Database snapshot failed: {e}")
+            return None
+
+    def start(self, interval: float):
+        """Snapshot every `interval` seconds in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), daemon=True)
+        self._thread.start()
+        logger.info(f"Database snapshots every {interval:.0f}s to blob storage '{self.namespace}'")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def _loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.snapshot_if_changed()
+
+
+def restore_snapshot(db_path: str, storage: BlobStorage, namespace: str = SNAPSHOT_NAMESPACE) -> Optional[Dict[str, Any]]:
+    """
+    Replace db_path with the newest snapshot if that is further synced.
+
+    Must run before the database is opened. The download is checked against
+    the manifest's sha256 and the decompressed file with PRAGMA quick_check;
+    db_path is only replaced once both pass.
+
+    Returns:
+        The manifest of the restored snapshot, or None if nothing was restored
+
+    Raises:
+        SnapshotError: If the snapshot is missing, corrupt or from a newer schema
+    """
+    manifest = read_manifest(storage, namespace)
+    if manifest is None:
+        logger.info("No database snapshot available")
+        return None
+
+    local_status = read_sync_status(db_path)
+    if local_status and local_status.get("last_synced_block", 0) >= manifest["last_synced_block"]:
+        logger.info(f"Local database (block {local_status['last_synced_block']}) is not behind "
+                    f"snapshot {manifest['key']} (block {manifest['last_synced_block']})")
+        return None
+    if manifest["schema_version"] > SCHEMA_VERSION:
+        raise SnapshotError(f"Snapshot {manifest['key']} has schema version {manifest['schema_version']}, "
+                            f"newer than {SCHEMA_VERSION}")
+
+    chunks = storage.iter_chunks(namespace, manifest["key"])
+    if chunks is None:
+        raise SnapshotError(f"Snapshot {manifest['key']} named by the manifest is missing")
+
+    # Same directory as db_path, so the final os.replace is atomic
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(db_path))) as tmp_dir:
+        compressed_path = os.path.join(tmp_dir, "snapshot.db.gz")
+        digest = hashlib.sha256()
+        with open(compressed_path, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+        if digest.hexdigest() != manifest["sha256"]:
+            raise SnapshotError(f"Snapshot {manifest['key']} does not match its sha256 checksum")
+
+        restored_path = os.path.join(tmp_dir, "capsules.db")
+        try:
+            with gzip.open(compressed_path, "rb") as src, open(restored_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            conn = sqlite3.connect(restored_path)
+            try:
+                check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            finally:
+                conn.close()
+        except (OSError, EOFError, sqlite3.Error) as e:
+            raise SnapshotError(f"Snapshot {manifest['key']} is unreadable: {e}")
+        if check != "ok":
+            raise SnapshotError(f"Snapshot {manifest['key']} failed the integrity check: {check}")
+        if (read_sync_status(restored_path) or {}).get("last_synced_block") != manifest["last_synced_block"]:
+            raise SnapshotError(f"Snapshot {manifest['key']} does not match its manifest")
+
+        # The old database's WAL must not be replayed onto the restored file
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        os.replace(restored_path, db_path)
+
+    logger.info(f"Restored database snapshot {manifest['key']} (block {manifest['last_synced_block']}, "
+                f"{manifest['total_capsules']} capsules)")
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+    from blob_storage import create_blob_storage_from_env
+
+    parser = argparse.ArgumentParser(description="Take or restore a SQLite database snapshot in blob storage")
+    parser.add_argument("command", choices=["create", "restore", "show"])
+    parser.add_argument("--db", default=os.environ.get("CAPSULES_DB_PATH", "capsules.db"), help="SQLite database path")
+    parser.add_argument("--keep", type=int, default=3, help="Snapshots to retain")
+    args = parser.parse_args()
+
+    storage = create_blob_storage_from_env()
+    try:
+        if args.command == "create":
+            result = DatabaseSnapshotter(CapsuleDatabase(args.db), storage, keep=args.keep).create_snapshot()
+        elif args.command == "restore":
+            result = restore_snapshot(args.db, storage)
+        else:
+            result = read_manifest(storage)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,209 @@
+# db_writer.py - Single writer thread that group-commits queued SQLite writes
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WriteFunction = Callable[[sqlite3.Connection], Any]
+# (context, write, future, transactional)
+QueuedWrite = Tuple[contextvars.Context, WriteFunction, Future, bool]
+
+# Queue sentinel that stops the writer thread once everything before it is written
+_STOP = object()
+
+
+class DatabaseWriter:
+    """
+    Serializes every write to a SQLite database through one thread.
+
+    Callers submit a function taking the writer's connection and get a
+    Future for its return value. The thread collects whatever is queued
+    (waiting at most group_commit_ms after the first write, up to
+    max_batch writes) and runs it in one BEGIN IMMEDIATE transaction, so
+    concurrent writers never contend for the database lock and a burst of
+    writes costs one commit. Each write runs in its own SAVEPOINT: one that
+    raises is rolled back alone and its Future gets the exception, while
+    the rest of the group commits. Futures resolve only after the commit.
+
+    Write functions run in the submitting thread's contextvars context and
+    must not commit or open transactions themselves. Statements that cannot
+    run in a transaction (VACUUM) are submitted with transaction=False and
+    run alone, in queue order.
+
+    If the thread stops unexpectedly (its connection cannot be opened, a
+    rollback fails), every unresolved Future gets the error and later
+    submits raise, so no caller waits on a writer that is gone.
+    """
+    def __init__(self, connect: Callable[[], sqlite3.Connection], group_commit_ms: float = 2.0,
+                 max_batch: int = 256, name: str = "db-writer"):
+        self.group_commit_ms = group_commit_ms
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self.largest_group = 0
+        self._connect = connect
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        # A non-transactional write taken off the queue while gathering a group
+        self._pending: "deque[QueuedWrite]" = deque()
+        # The group being written, failed along with the queue if the thread dies
+        self._in_flight: List[QueuedWrite] = []
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, write: WriteFunction, transaction: bool = True) -> Future:
+        """Queue a write; the Future resolves to its return value once committed"""
+        future: Future = Future()
+        with self._close_lock:
+            if self._closed:
+                if self._error is not None:
+                    raise RuntimeError(f"Database writer stopped: {self._error}")
+                raise RuntimeError("Database writer is closed")
+            self._queue.put((contextvars.copy_context(), write, future, transaction))
+        return future
+
+    def execute(self, write: WriteFunction, timeout: Optional[float] = None, transaction: bool = True) -> Any:
+        """Queue a write and wait for it to commit (re-raises its exception)"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Write functions cannot queue writes (the writer would wait on itself)")
+        return self.submit(write, transaction).result(timeout)
+
+    def close(self, timeout: float = 30):
+        """Write everything queued so far, then stop the thread"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "commits": self.commits,
+            "writes": self.writes,
+            "largest_group": self.largest_group,
+            "queued": self._queue.qsize()
+        }
+
+    def _next_group(self) -> Tuple[List[QueuedWrite], bool]:
+        """Block for one write, then gather more for up to group_commit_ms"""
+        first = self._pending.popleft() if self._pending else self._queue.get()
+        if first is _STOP:
+            return [], True
+        group = [first]
+        if not first[3]:
+            return group, False
+        deadline = time.monotonic() + self.group_commit_ms / 1000
+        while len(group) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            if not item[3]:
+                # Runs on its own after this group
+                self._pending.append(item)
+                break
+            group.append(item)
+        return group, False
+
+    def _run(self):
+        conn = None
+        try:
+            conn = self._connect()
+            stop = False
+            while not stop:
+                group, stop = self._next_group()
+                self._in_flight = [item for item in group if item[2].set_running_or_notify_cancel()]
+                if self._in_flight and not self._in_flight[0][3]:
+                    self._run_alone(conn, self._in_flight[0])
+                elif self._in_flight:
+                    self._commit_group(conn, self._in_flight)
+                self._in_flight = []
+            # Writes gathered before the stop sentinel
+            while self._pending:
+                item = self._pending.popleft()
+                if item[2].set_running_or_notify_cancel():
+                    self._in_flight = [item]
+                    self._run_alone(conn, item)
+                    self._in_flight = []
+        except BaseException as e:
+            logger.error(f"Database writer stopped: {e}")
+            self._fail_all(e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _fail_all(self, error: BaseException):
+        """Close the writer and fail every write it has not resolved"""
+        with self._close_lock:
+            self._closed = True
+            self._error = error
+        items = list(self._in_flight) + list(self._pending)
+        self._pending.clear()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                items.append(item)
+        for _, _, future, _ in items:
+            try:
+                future.set_exception(error)
+            except InvalidStateError:
+                # Already resolved, or cancelled by its caller
+                pass
+
+    def _run_alone(self, conn: sqlite3.Connection, item: QueuedWrite):
+        context, write, future, _ = item
+        try:
+            future.set_result(context.run(write, conn))
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            future.set_exception(e)
+
+    def _commit_group(self, conn: sqlite3.Connection, group: List[QueuedWrite]):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for context, write, _, _ in group:
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((True, context.run(write, conn)))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((False, e))
+            conn.commit()
+        except Exception as e:
+            # BEGIN or COMMIT failed (e.g. lock timeout, disk full): nothing in the group was written
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"Group commit of {len(group)} writes failed: {e}")
+            for _, _, future, _ in group:
+                future.set_exception(e)
+            return
+
+        self.commits += 1
+        self.writes += len(group)
+        self.largest_group = max(self.largest_group, len(group))
+        for (_, _, future, _), (succeeded, value) in zip(group, outcomes):
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
@@ -0,0 +1,271 @@
+# pin_reconciler.py - Bulk check that every capsule CID is pinned on Pinata, re-pinning gaps
+import os
+import re
+import sys
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional
+
+import requests
+
+from database import BaseCapsuleDatabase, create_database_from_env
+from blob_storage import BlobStorage
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PINATA_API_BASE = os.environ.get('PINATA_API_BASE', 'https://api.pinata.cloud')
+PINATA_UPLOADS_BASE = os.environ.get('PINATA_UPLOADS_BASE', 'https://uploads.pinata.cloud')
+
+# CIDs generated locally when a Pinata upload failed ("Qm" + sha256 hex prefix).
+# They never existed on IPFS, so re-pinning cannot make them resolvable.
+LOCAL_CID_RE = re.compile(r"^Qm[0-9a-f]{44}$")
+
+# Status of the latest background pass, in blob storage so every worker process sees it
+STATUS_NAMESPACE = "reports"
+STATUS_KEY = "pin-reconcile.json"
+# A pass marked running for longer than this is assumed to have died with its worker
+RUNNING_STALE_SECONDS = 3600
+
+
+class PinataClient:
+    """Minimal Pinata API client for listing pins in bulk and pinning files (V3 JWT or V2 API keys)"""
+    def __init__(self, version: str, jwt: Optional[str] = None, api_key: Optional[str] = None,
+                 secret_api_key: Optional[str] = None, api_base: str = PINATA_API_BASE,
+                 uploads_base: str = PINATA_UPLOADS_BASE, page_size: int = 1000, timeout: int = 30):
+        self.version = version
+        self.api_base = api_base.rstrip("/")
+        self.uploads_base = uploads_base.rstrip("/")
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        if version == "v3":
+            self.session.headers["Authorization"] = f"Bearer {jwt}"
+        else:
+            self.session.headers.update({
+                "pinata_api_key": api_key or "",
+                "pinata_secret_api_key": secret_api_key or ""
+            })
+
+    @classmethod
+    def from_env(cls) -> Optional["PinataClient"]:
+        """Build a client from the same environment variables the Flask app uses"""
+        jwt = os.environ.get('PINATA_JWT')
+        api_key = os.environ.get('PINATA_API_KEY')
+        secret_api_key = os.environ.get('PINATA_SECRET_API_KEY')
+        if jwt and jwt != "your_pinata_jwt_token_here":
+            return cls("v3", jwt=jwt)
+        if api_key and secret_api_key and api_key != "your_pinata_api_key_here":
+            return cls("v2", api_key=api_key, secret_api_key=secret_api_key)
+        return None
+
+    def iter_pinned_cids(self) -> Iterator[str]:
+        """Yield every pinned CID, one page of up to page_size entries per request"""
+        if self.version == "v3":
+            yield from self._iter_v3()
+        else:
+            yield from self._iter_v2()
+
+    def _iter_v2(self) -> Iterator[str]:
+        offset = 0
+        while True:
+            response = self.session.get(
+                f"{self.api_base}/data/pinList",
+                params={"status": "pinned", "pageLimit": self.page_size, "pageOffset": offset},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            rows = response.json().get("rows", [])
+            for row in rows:
+                yield row["ipfs_pin_hash"]
+            if len(rows) < self.page_size:
+                return
+            offset += len(rows)
+
+    def _iter_v3(self) -> Iterator[str]:
+        page_token = None
+        while True:
+            params = {"limit": self.page_size}
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.session.get(f"{self.api_base}/v3/files/public", params=params,
+                                        timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json().get("data", {})
+            for entry in data.get("files", []):
+                yield entry["cid"]
+            page_token = data.get("next_page_token")
+            if not page_token or not data.get("files"):
+                return
+
+    def pin_file(self, file_bytes: bytes, filename: str) -> str:
+        """Upload and pin a file; returns the CID Pinata assigned"""
+        files = {'file': (filename, file_bytes, 'application/octet-stream')}
+        if self.version == "v3":
+            response = self.session.post(f"{self.uploads_base}/v3/files", files=files,
+                                         data={'network': 'public', 'name': filename},
+                                         timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()['data']['cid']
+
+        response = self.session.post(f"{self.api_base}/pinning/pinFileToIPFS", files=files,
+                                     data={'pinataOptions': json.dumps({'cidVersion': 1})},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['IpfsHash']
+
+
+class PinReconciler:
+    """
+    Diffs the CIDs referenced by the capsules table against Pinata's pin list
+    in one pass and re-pins missing content from blob storage.
+
+    Re-pinning uploads the stored bytes with the original upload settings,
+    which reproduces the same CID; a different CID is reported as a mismatch
+    because the on-chain CID cannot be changed.
+
+    start() runs the pass in a background thread and keeps its status (and
+    finally its report) in blob storage, where status() reads it back.
+    """
+    def __init__(self, db: BaseCapsuleDatabase, storage: BlobStorage, pinata: PinataClient, max_workers: int = 4):
+        self.db = db
+        self.storage = storage
+        self.pinata = pinata
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def _repin(self, cid: str) -> Dict[str, Any]:
+        try:
+            data = self.storage.get("ipfs", cid)
+            if data is None:
+                return {"cid": cid, "status": "missing_locally"}
+            new_cid = self.pinata.pin_file(data, f"repin_{cid}")
+            if new_cid != cid:
+                return {"cid": cid, "status": "cid_mismatch", "pinned_cid": new_cid}
+            return {"cid": cid, "status": "repinned"}
+        except Exception as e:
+            return {"cid": cid, "status": "error", "error": str(e)}
+
+    def reconcile(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Run one reconciliation pass
+
+        Args:
+            dry_run: Only report missing pins, do not re-pin
+
+        Returns:
+            Report with counts and the CIDs in each outcome bucket
+        """
+        start_time = time.time()
+        db_cids = self.db.get_content_cids()
+        pinned = set(self.pinata.iter_pinned_cids())
+
+        missing = sorted(cid for cid in db_cids if cid not in pinned)
+        local_only = [cid for cid in missing if LOCAL_CID_RE.match(cid)]
+        to_repin = [cid for cid in missing if not LOCAL_CID_RE.match(cid)]
+
+        logger.info(f"Pin reconciliation: {len(db_cids)} CIDs in database, {len(pinned)} pinned on Pinata, "
+                    f"{len(missing)} missing ({len(local_only)} local-only)")
+
+        results: List[Dict[str, Any]] = []
+        if to_repin and not dry_run:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self._repin, to_repin))
+
+        buckets: Dict[str, List[Any]] = {"repinned": [], "cid_mismatch": [], "missing_locally": [], "error": []}
+        for result in results:
+            buckets[result["status"]].append(result if result["status"] in ("cid_mismatch", "error") else result["cid"])
+
+        report = {
+            "dry_run": dry_run,
+            "database_cids": len(db_cids),
+            "pinned_on_pinata": len(pinned),
+            "missing": len(missing),
+            "missing_cids": to_repin if dry_run else [],
+            "local_only": [{"cid": cid, "capsule_ids": db_cids[cid]} for cid in local_only],
+            "repinned": buckets["repinned"],
+            "cid_mismatch": buckets["cid_mismatch"],
+            "missing_locally": [{"cid": cid, "capsule_ids": db_cids[cid]} for cid in buckets["missing_locally"]],
+            "errors": buckets["error"],
+            "duration_seconds": round(time.time() - start_time, 3)
+        }
+        logger.info(f"Pin reconciliation finished: {len(buckets['repinned'])} re-pinned, "
+                    f"{len(buckets['missing_locally'])} missing locally, {len(buckets['error'])} errors")
+        return report
+
+    def status(self) -> Optional[Dict[str, Any]]:
+        """Status of the latest background pass from any worker, None if there was none"""
+        data = self.storage.get(STATUS_NAMESPACE, STATUS_KEY)
+        return json.loads(data) if data is not None else None
+
+    def _save_status(self, status: Dict[str, Any]):
+        self.storage.put(STATUS_NAMESPACE, STATUS_KEY, json.dumps(status).encode())
+
+    def start(self, dry_run: bool = False, max_workers: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Run reconcile() in a background thread
+
+        Args:
+            dry_run: Only report missing pins, do not re-pin
+            max_workers: Concurrent re-pin uploads for this pass
+
+        Returns:
+            The initial status, or None if a pass is already running (in this
+            process, or marked running by another worker less than
+            RUNNING_STALE_SECONDS ago)
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            current = self.status()
+            if current and current["running"] and time.time() - current["started_at"] < RUNNING_STALE_SECONDS:
+                self._lock.release()
+                return None
+            status = {"running": True, "dry_run": dry_run, "started_at": int(time.time()),
+                      "finished_at": None, "report": None, "error": None}
+            self._save_status(status)
+            if max_workers:
+                self.max_workers = max_workers
+            threading.Thread(target=self._run, args=(status,), daemon=True).start()
+        except BaseException:
+            self._lock.release()
+            raise
+        return dict(status)
+
+    def _run(self, status: Dict[str, Any]):
+        try:
+            status["report"] = self.reconcile(dry_run=status["dry_run"])
+        except Exception as e:
+            logger.error(f"Pin reconciliation failed: {e}")
+            status["error"] = str(e)
+        finally:
+            status.update(running=False, finished_at=int(time.time()))
+            try:
+                self._save_status(status)
+            except Exception as e:
+                logger.error(f"Could not store the pin reconciliation status: {e}")
+            self._lock.release()
+
+
+if __name__ == "__main__":
+    import argparse
+    from blob_storage import create_blob_storage_from_env
+
+    parser = argparse.ArgumentParser(description="Check that every capsule CID is pinned on Pinata")
+    parser.add_argument("--db", default=os.environ.get("CAPSULES_DB_PATH", "capsules.db"), help="SQLite database path (ignored when DATABASE_URL is set)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report missing pins")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent re-pin uploads")
+    args = parser.parse_args()
+
+    pinata = PinataClient.from_env()
+    if not pinata:
+        print("❌ Pinata not configured - set PINATA_JWT or PINATA_API_KEY/PINATA_SECRET_API_KEY")
+        sys.exit(1)
+
+    reconciler = PinReconciler(create_database_from_env(args.db), create_blob_storage_from_env(), pinata, max_workers=args.workers)
+    print(json.dumps(reconciler.reconcile(dry_run=args.dry_run), indent=2))
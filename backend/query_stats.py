@@ -0,0 +1,171 @@
+# query_stats.py - Per-statement latency histograms and slow-query log for SQLite connections
+import re
+import time
+import sqlite3
+import logging
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; one more bucket holds everything slower
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+def normalize_statement(sql: str) -> str:
+    """Statement text used as the stats key (whitespace collapsed)"""
+    return " ".join(sql.split())
+
+
+class StatementStats:
+    __slots__ = ("count", "errors", "slow", "total_ms", "max_ms", "buckets", "last_explained")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.last_explained = 0.0
+
+
+class QueryStats:
+    """
+    Latency of every statement run through an InstrumentedConnection,
+    grouped by statement text.
+
+    Statements slower than slow_query_ms are counted and logged with their
+    query plan (at most once per explain_interval seconds per statement, so
+    a slow hot query cannot flood the log). Timings cover execution up to
+    the first row, which is where SQLite sorts, aggregates and seeks;
+    iterating the remaining rows of a cursor is not included.
+    """
+    def __init__(self, slow_query_ms: float = 100.0, explain_interval: float = 60.0):
+        self.slow_query_ms = slow_query_ms
+        self.explain_interval = explain_interval
+        self._statements: Dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+        # A context variable rather than thread-local, so statements the
+        # database writer thread runs on a caller's behalf are captured too
+        self._capture: ContextVar[Optional[List[tuple]]] = ContextVar(f"query_capture_{id(self)}", default=None)
+
+    def record(self, sql: str, elapsed_ms: float, error: bool = False) -> bool:
+        """Record one execution; returns True if the caller should log it as slow with its plan"""
+        key = normalize_statement(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats()
+            stats.count += 1
+            stats.errors += error
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            bucket = 0
+            while bucket < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[bucket]:
+                bucket += 1
+            stats.buckets[bucket] += 1
+
+            if elapsed_ms < self.slow_query_ms:
+                return False
+            stats.slow += 1
+            now = time.monotonic()
+            if now - stats.last_explained < self.explain_interval and stats.last_explained:
+                return False
+            stats.last_explained = now
+            return True
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Statements by total time spent, most expensive first"""
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            rows = [{
+                "statement": statement,
+                "count": stats.count,
+                "errors": stats.errors,
+                "slow": stats.slow,
+                "total_ms": round(stats.total_ms, 3),
+                "mean_ms": round(stats.total_ms / stats.count, 3),
+                "max_ms": round(stats.max_ms, 3),
+                "histogram": dict(zip(labels, stats.buckets))
+            } for statement, stats in self._statements.items()]
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+    @contextmanager
+    def capture(self):
+        """Collect (sql, parameters) of the statements this context runs inside the block"""
+        statements: List[tuple] = []
+        token = self._capture.set(statements)
+        try:
+            yield statements
+        finally:
+            self._capture.reset(token)
+
+    def captured(self, sql: str, parameters: Any):
+        statements = self._capture.get()
+        if statements is not None:
+            statements.append((sql, parameters))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection factory (sqlite3.connect(..., factory=InstrumentedConnection))
+    that times execute/executemany into query_stats
+    """
+    query_stats: Optional[QueryStats] = None
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        stats = self.query_stats
+        if stats is None:
+            return super().execute(sql, parameters)
+        stats.captured(sql, parameters)
+        start = time.perf_counter()
+        try:
+            cursor = super().execute(sql, parameters)
+        except Exception:
+            stats.record(sql, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if stats.record(sql, elapsed_ms):
+            self._log_slow(sql, parameters, elapsed_ms)
+        return cursor
+
+    def executemany(self, sql: str, seq_of_parameters) -> sqlite3.Cursor:
+        stats = self.query_stats
+        if stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            cursor = super().executemany(sql, seq_of_parameters)
+        except Exception:
+            stats.record(sql, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if stats.record(sql, elapsed_ms):
+            logger.warning(f"Slow query ({elapsed_ms:.1f} ms, executemany): {normalize_statement(sql)}")
+        return cursor
+
+    def explain(self, sql: str, parameters: Any = ()) -> List[str]:
+        """EXPLAIN QUERY PLAN detail lines of a statement (without running it)"""
+        return [row[-1] for row in super().execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+
+    def _log_slow(self, sql: str, parameters: Any, elapsed_ms: float):
+        message = f"Slow query ({elapsed_ms:.1f} ms): {normalize_statement(sql)}"
+        if _EXPLAINABLE_RE.match(sql):
+            try:
+                message += "".join(f"\n    {line}" for line in self.explain(sql, parameters))
+            except sqlite3.Error as e:
+                message += f"\n    (plan unavailable: {e})"
+        logger.warning(message)
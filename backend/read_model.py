@@ -0,0 +1,215 @@
+# read_model.py - In-process read model for hot capsule list queries
+import sys
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, List, Optional, Any, Sequence
+
+from database import SUMMARY_COLUMNS, split_tags
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CapsuleSummary:
+    """One capsule without its ciphertext; __slots__ keeps it to a fixed set of references"""
+    __slots__ = SUMMARY_COLUMNS + ("tag_keys",)
+
+    def __init__(self, row: Dict[str, Any], now: int):
+        for column in SUMMARY_COLUMNS:
+            setattr(self, column, row.get(column))
+        # Creators repeat across capsules; share one string per address
+        self.creator = sys.intern(self.creator or "")
+        self.decrypted_story = self.decrypted_story or ""
+        self.pixelated_image_cid = self.pixelated_image_cid or ""
+        self.is_revealed = bool(self.is_revealed)
+        self.created_at = self.created_at or now
+        self.updated_at = self.updated_at or now
+        self.tag_keys = tuple(split_tags(self.tags))
+
+    def to_dict(self, columns: Sequence[str]) -> Dict[str, Any]:
+        return {column: getattr(self, column) for column in columns}
+
+
+def _insert_sorted(ids: List[int], capsule_id: int):
+    # Sync delivers ids in ascending order, so appending is the common case
+    if not ids or ids[-1] < capsule_id:
+        ids.append(capsule_id)
+    else:
+        index = bisect.bisect_left(ids, capsule_id)
+        if index == len(ids) or ids[index] != capsule_id:
+            ids.insert(index, capsule_id)
+
+
+def _remove_sorted(ids: List[int], capsule_id: int):
+    index = bisect.bisect_left(ids, capsule_id)
+    if index < len(ids) and ids[index] == capsule_id:
+        del ids[index]
+
+
+class CapsuleReadModel:
+    """
+    Capsule summaries held in memory, answering the gallery's list queries
+    without touching the database.
+
+    Summaries are kept in a dict by id plus ascending id lists for the whole
+    collection, each tag and each creator, so a page is a bisect and a slice.
+    The sync service applies every committed batch, which keeps the model
+    current as long as this process runs the sync for its database; with
+    several processes sharing one PostgreSQL database only the syncing one
+    sees new capsules.
+
+    Query methods mirror BaseCapsuleDatabase, so callers can use either.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._capsules: Dict[int, CapsuleSummary] = {}
+        self._ids: List[int] = []
+        self._by_tag: Dict[str, List[int]] = {}
+        # Keyed by lower-case address, like the database's creator_lc
+        self._by_creator: Dict[str, List[int]] = {}
+        self._revealed = 0
+
+    def load(self, db, page_size: int = 1000) -> int:
+        """Replace the model's contents with every capsule in db; returns the capsule count"""
+        start, now = time.time(), int(time.time())
+        summaries, after_id = [], None
+        while True:
+            page = db.get_capsules(limit=page_size, after_id=after_id, columns=SUMMARY_COLUMNS)
+            if not page:
+                break
+            summaries.extend(CapsuleSummary(row, now) for row in page)
+            after_id = page[-1]['id']
+        
+        # Pages come newest first; storing oldest first only ever appends to the id lists
+        fresh = CapsuleReadModel()
+        for summary in reversed(summaries):
+            fresh._store(summary)
+        with self._lock:
+            self._capsules, self._ids = fresh._capsules, fresh._ids
+            self._by_tag, self._by_creator, self._revealed = fresh._by_tag, fresh._by_creator, fresh._revealed
+        logger.info(f"Read model loaded {len(self._ids)} capsules in {time.time() - start:.2f}s")
+        return len(self._ids)
+
+    def apply_batch(self, created: List[Dict[str, Any]], revealed: List[Dict[str, Any]]):
+        """
+        Apply a batch committed to the database (same arguments as
+        BaseCapsuleDatabase.apply_batch); reveals of unknown capsules are ignored
+        """
+        now = int(time.time())
+        with self._lock:
+            for row in created:
+                self._store(CapsuleSummary(row, now))
+            for reveal in revealed:
+                summary = self._capsules.get(reveal['id'])
+                if summary is None:
+                    continue
+                if not summary.is_revealed:
+                    self._revealed += 1
+                summary.decrypted_story = reveal['decrypted_story'] or ""
+                summary.is_revealed = True
+                summary.block_number = reveal.get('block_number')
+                summary.transaction_hash = reveal.get('transaction_hash')
+                summary.updated_at = now
+                summary.revealed_at = reveal.get('revealed_at') or now
+
+    def _store(self, summary: CapsuleSummary):
+        previous = self._capsules.get(summary.id)
+        if previous is not None:
+            self._revealed -= previous.is_revealed
+            for tag in previous.tag_keys:
+                _remove_sorted(self._by_tag[tag], summary.id)
+            _remove_sorted(self._by_creator[previous.creator.lower()], summary.id)
+            # As in the database upsert, the earlier of the stored and the new creation time wins
+            # (a block timestamp corrects an insert time; a write without one keeps the stored time)
+            summary.created_at = min(previous.created_at, summary.created_at)
+        else:
+            _insert_sorted(self._ids, summary.id)
+
+        self._capsules[summary.id] = summary
+        self._revealed += summary.is_revealed
+        for tag in summary.tag_keys:
+            _insert_sorted(self._by_tag.setdefault(tag, []), summary.id)
+        _insert_sorted(self._by_creator.setdefault(summary.creator.lower(), []), summary.id)
+
+    @staticmethod
+    def covers(columns: Optional[Sequence[str]] = None) -> bool:
+        """Whether the model holds every requested column (it has no ciphertext)"""
+        return all(column in SUMMARY_COLUMNS for column in (columns or SUMMARY_COLUMNS))
+
+    def _page(self, ids: List[int], offset: int, limit: int, after_id: Optional[int],
+              revealed_only: bool, columns: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+        """Newest-first page of ids (ascending list) as dicts; caller holds the lock"""
+        columns = list(columns or SUMMARY_COLUMNS)
+        if "id" not in columns:
+            columns.insert(0, "id")
+
+        end = len(ids)
+        if after_id is not None:
+            end, offset = bisect.bisect_left(ids, after_id), 0
+        if not revealed_only:
+            start = max(end - offset - limit, 0)
+            return [self._capsules[capsule_id].to_dict(columns)
+                    for capsule_id in reversed(ids[start:max(end - offset, 0)])]
+
+        page, skipped = [], 0
+        for index in range(end - 1, -1, -1):
+            if len(page) >= limit:
+                break
+            summary = self._capsules[ids[index]]
+            if not summary.is_revealed:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            page.append(summary.to_dict(columns))
+        return page
+
+    def get_capsules(self, offset: int = 0, limit: int = 10, revealed_only: bool = False, tag: str = None,
+                     after_id: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Same results as BaseCapsuleDatabase.get_capsules, for summary columns"""
+        with self._lock:
+            ids = self._by_tag.get(tag.strip().casefold(), []) if tag else self._ids
+            return self._page(ids, offset, limit, after_id, revealed_only, columns)
+
+    def get_capsules_by_creator(self, creator_address: str, limit: int = 10, after_id: Optional[int] = None,
+                                columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Same results as BaseCapsuleDatabase.get_capsules_by_creator, for summary columns"""
+        with self._lock:
+            return self._page(self._by_creator.get(creator_address.lower(), []), 0, limit, after_id, False, columns)
+
+    def get_creator_count(self, creator_address: str) -> int:
+        return len(self._by_creator.get(creator_address.lower(), []))
+
+    def get_capsule_count(self) -> int:
+        return len(self._ids)
+
+    def get_revealed_count(self) -> int:
+        return self._revealed
+
+    def get_tag_count(self, tag: str) -> int:
+        """Number of capsules carrying a tag (exact, case-insensitive)"""
+        return len(self._by_tag.get(tag.strip().casefold(), []))
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the model (summaries, their values and the indexes)"""
+        seen = set()
+
+        def size(value) -> int:
+            if id(value) in seen:
+                return 0
+            seen.add(id(value))
+            return sys.getsizeof(value)
+
+        with self._lock:
+            total = size(self._capsules) + size(self._ids) + size(self._by_tag) + size(self._by_creator)
+            for summary in self._capsules.values():
+                total += size(summary) + size(summary.tag_keys)
+                total += sum(size(getattr(summary, column)) for column in SUMMARY_COLUMNS)
+                total += sum(size(tag) for tag in summary.tag_keys)
+            for index in (self._by_tag, self._by_creator):
+                total += sum(size(key) + size(ids) for key, ids in index.items())
+            # The id lists share the int objects of the summaries, counted above
+            return total
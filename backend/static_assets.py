@@ -0,0 +1,301 @@
+# static_assets.py - Response compression and precompressed, content-hashed static assets
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import posixpath
+import mimetypes
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "asset-manifest.json"
+ASSET_URL_PREFIX = "/assets"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# Text-like formats that compress well; images are already compressed
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".css", ".json", ".svg", ".wasm", ".txt", ".map"}
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/javascript", "text/html",
+                          "text/css", "text/plain", "image/svg+xml", "application/wasm"}
+
+mimetypes.add_type("application/wasm", ".wasm")
+
+# src/href references to local files, e.g. src="blst.js?v=2025062004" or href="../favicon.png"
+_ASSET_REFERENCE_RE = re.compile(r'(?P<attr>\b(?:src|href))="(?P<url>[^"#?:]+)(?P<query>\?[^"#]*)?"')
+
+
+def _file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()[:16]
+
+
+def _write_if_stale(source: str, target: str, data_fn) -> bool:
+    """Write target only if it is missing or older than source"""
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return False
+    data = data_fn()
+    with open(target, "wb") as f:
+        f.write(data)
+    return True
+
+
+def build_static_assets(static_dir: str, min_size: int = 1024) -> Dict[str, Any]:
+    """
+    Build step: write .gz/.br siblings for compressible files and a manifest
+    mapping every file to its content hash.
+
+    Identical files (e.g. blst.js/blst.wasm copied into chinese/ and spanish/)
+    share one digest, so the server keeps a single cached copy of them.
+
+    Args:
+        static_dir: Directory served as static files (frontend/)
+        min_size: Files smaller than this are not precompressed
+
+    Returns:
+        The manifest that was written
+    """
+    files: Dict[str, str] = {}
+    assets: Dict[str, str] = {}
+    written = 0
+
+    for root, dirs, names in os.walk(static_dir):
+        dirs.sort()
+        for name in sorted(names):
+            if name == MANIFEST_NAME or name.endswith((".gz", ".br")):
+                continue
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            digest = _file_digest(path)
+            files[rel_path] = digest
+            # The first path seen for a digest becomes the canonical copy
+            assets.setdefault(digest, rel_path)
+
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in COMPRESSIBLE_EXTENSIONS or os.path.getsize(path) < min_size:
+                continue
+
+            def read_source(path=path):
+                with open(path, "rb") as f:
+                    return f.read()
+
+            written += _write_if_stale(path, path + ".gz",
+                                       lambda: gzip.compress(read_source(), compresslevel=9, mtime=0))
+            if brotli is not None:
+                written += _write_if_stale(path, path + ".br",
+                                           lambda: brotli.compress(read_source(), quality=11))
+
+    manifest = {"files": files, "assets": assets}
+    with open(os.path.join(static_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    duplicates = len(files) - len(assets)
+    logger.info(f"Static assets built: {len(files)} files, {len(assets)} unique, "
+                f"{duplicates} duplicates, {written} compressed siblings written")
+    return manifest
+
+
+def negotiate_encoding(accept_encodings, available=("br", "gzip")) -> Optional[str]:
+    """Pick the best content coding the client accepts, or None for identity"""
+    candidates = [enc for enc in available if enc != "br" or brotli is not None]
+    if not candidates:
+        return None
+    return accept_encodings.best_match(candidates)
+
+
+def compress_bytes(data: bytes, encoding: str, best: bool = False) -> bytes:
+    """Compress with a fast level for per-response work, or the best level for cached output"""
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else 4)
+    return gzip.compress(data, compresslevel=9 if best else 6)
+
+
+def compress_response(response, request, min_size: int = 1024):
+    """
+    after_request hook: compress dynamic JSON/text responses above min_size
+    according to the client's Accept-Encoding.
+    """
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+class StaticAssetServer:
+    """
+    Serves files listed in the asset manifest:
+
+    - picks the precompressed .br/.gz sibling matching Accept-Encoding
+    - keeps one in-memory copy per (content hash, encoding), shared by all
+      identical files across the language folders
+    - exposes content-hashed URLs (/assets/<digest>/<path>) with a one-year
+      immutable Cache-Control, and rewrites local src/href references in
+      HTML pages to use them
+    """
+    def __init__(self, static_dir: str, max_cached_bytes: int = 64 * 1024 * 1024):
+        self.static_dir = static_dir
+        self.max_cached_bytes = max_cached_bytes
+        self.files: Dict[str, str] = {}
+        self.assets: Dict[str, str] = {}
+        self.manifest_digest = ""
+
+        self._cache: Dict[Tuple[str, str], bytes] = {}
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+        manifest_path = os.path.join(static_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            self.files = manifest.get("files", {})
+            self.assets = manifest.get("assets", {})
+            # Rewritten HTML embeds other files' digests, so its ETag covers the whole manifest
+            self.manifest_digest = hashlib.sha256(
+                json.dumps(self.files, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+            logger.info(f"Loaded asset manifest: {len(self.files)} files, {len(self.assets)} unique")
+        except FileNotFoundError:
+            logger.info(f"No asset manifest at {manifest_path} - run build_static_assets to enable precompressed assets")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.files)
+
+    def asset_url(self, rel_path: str) -> Optional[str]:
+        """Content-hashed URL for a static file, or None if it is not in the manifest"""
+        digest = self.files.get(rel_path)
+        if not digest:
+            return None
+        return f"{ASSET_URL_PREFIX}/{digest}/{rel_path}"
+
+    def _rewrite_html(self, rel_path: str, html: bytes) -> bytes:
+        base_dir = posixpath.dirname(rel_path)
+
+        def replace(match):
+            url = match.group("url")
+            if url.startswith("/"):
+                target = url.lstrip("/")
+            else:
+                target = posixpath.normpath(posixpath.join(base_dir, url))
+            if target.endswith(".html"):
+                return match.group(0)
+            hashed = self.asset_url(target)
+            if not hashed:
+                return match.group(0)
+            return f'{match.group("attr")}="{hashed}"'
+
+        return _ASSET_REFERENCE_RE.sub(replace, html.decode("utf-8")).encode("utf-8")
+
+    def _load(self, rel_path: str, encoding: Optional[str]) -> bytes:
+        digest = self.files[rel_path]
+        is_html = rel_path.endswith(".html")
+        # HTML is rewritten per page (relative links differ by folder), everything else by digest
+        key = (rel_path if is_html else digest, encoding or "identity")
+
+        with self._lock:
+            data = self._cache.get(key)
+        if data is not None:
+            return data
+
+        source = self.assets.get(digest, rel_path) if not is_html else rel_path
+        path = os.path.join(self.static_dir, *source.split("/"))
+        if is_html:
+            with open(path, "rb") as f:
+                data = self._rewrite_html(rel_path, f.read())
+            if encoding:
+                data = compress_bytes(data, encoding, best=True)
+        elif encoding and os.path.exists(f"{path}.{'br' if encoding == 'br' else 'gz'}"):
+            with open(f"{path}.{'br' if encoding == 'br' else 'gz'}", "rb") as f:
+                data = f.read()
+        elif encoding:
+            with open(path, "rb") as f:
+                data = compress_bytes(f.read(), encoding, best=True)
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+
+        with self._lock:
+            if self._cached_bytes + len(data) <= self.max_cached_bytes:
+                self._cache[key] = data
+                self._cached_bytes += len(data)
+        return data
+
+    def serve(self, rel_path: str, request, immutable: bool = False):
+        """Build a response for a manifest file; returns None if the file is unknown"""
+        from flask import Response
+
+        if rel_path not in self.files:
+            return None
+
+        digest = self.files[rel_path]
+        mimetype = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        compressible = os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+        encoding = negotiate_encoding(request.accept_encodings) if compressible else None
+
+        if rel_path.endswith(".html"):
+            digest = f"{digest}.{self.manifest_digest}"
+        etag = f"{digest}-{encoding or 'identity'}"
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "ETag": f'"{etag}"'
+        }
+        if compressible:
+            headers["Vary"] = "Accept-Encoding"
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        data = self._load(rel_path, encoding)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(data, mimetype=mimetype, headers=headers)
+
+    def serve_hashed(self, digest: str, rel_path: str, request):
+        """
+        Serve /assets/<digest>/<rel_path>.
+
+        The URL keeps the file's path so that scripts such as blst.js, which
+        load siblings (blst.wasm) relative to their own URL, request the
+        sibling from their own folder. A path whose content hash is not the
+        digest is such a sibling and is served with revalidation instead of
+        immutable.
+        """
+        if digest not in self.assets:
+            return None
+        rel_path = posixpath.normpath(rel_path)
+        return self.serve(rel_path, request, immutable=self.files.get(rel_path) == digest)
+
+if __name__ == "__main__":
+    # Build step: python backend/static_assets.py [frontend_dir]
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, "frontend")
+    if brotli is None:
+        print("ℹ️ brotli not installed - writing .gz siblings only")
+    manifest = build_static_assets(target_dir)
+    print(f"✅ Wrote {MANIFEST_NAME}: {len(manifest['files'])} files, {len(manifest['assets'])} unique")
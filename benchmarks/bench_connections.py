@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: API read throughput while the sync loop is writing.
+
+Compares the pooled WAL connection manager in CapsuleDatabase against the
+previous behaviour (a fresh connection per call on a rollback-journal
+database). Reader threads replay the gallery's request pattern (a page of
+capsules followed by single-capsule lookups) while one writer thread inserts
+capsules the way the event sync does.
+
+Usage:
+    python benchmarks/bench_connections.py [--seconds 10] [--readers 4] [--seed-rows 5000]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+
+
+class LegacyCapsuleDatabase(CapsuleDatabase):
+    """The previous connection handling: connect per call, default rollback journal"""
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.close()
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+    @contextmanager
+    def get_connection(self, readonly: bool = False):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def make_capsule(capsule_id: int) -> dict:
+    return {
+        'id': capsule_id,
+        'creator': f"0x{capsule_id % 500:040x}",
+        'title': f"Capsule {capsule_id}",
+        'tags': "ethereum, time capsule, art",
+        'encrypted_story': os.urandom(512),
+        'decrypted_story': '',
+        'is_revealed': False,
+        'reveal_time': int(time.time()) + 86400,
+        'shutter_identity': f"0x{capsule_id:064x}",
+        'image_cid': f"bafy{capsule_id:055d}",
+        'pixelated_image_cid': '',
+        'block_number': 22806303 + capsule_id,
+        'transaction_hash': f"0x{capsule_id:064x}"
+    }
+
+
+def run(db: CapsuleDatabase, seconds: float, readers: int, seed_rows: int) -> dict:
+    for capsule_id in range(seed_rows):
+        db.insert_capsule(make_capsule(capsule_id))
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def reader():
+        reads, errors, local_latencies = 0, 0, []
+        while not stop.is_set():
+            start = time.perf_counter()
+            page = db.get_capsules(offset=0, limit=12)
+            ok = bool(page)
+            for capsule in page[:3]:
+                ok = ok and db.get_capsule(capsule['id']) is not None
+            local_latencies.append(time.perf_counter() - start)
+            reads += 1
+            errors += 0 if ok else 1
+        with lock:
+            counts["reads"] += reads
+            counts["read_errors"] += errors
+            latencies.extend(local_latencies)
+
+    def writer():
+        capsule_id = seed_rows
+        while not stop.is_set():
+            if db.insert_capsule(make_capsule(capsule_id)):
+                counts["writes"] += 1
+            else:
+                counts["write_errors"] += 1
+            capsule_id += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0
+    return {
+        "requests_per_second": counts["reads"] / seconds,
+        "writes_per_second": counts["writes"] / seconds,
+        "read_errors": counts["read_errors"],
+        "write_errors": counts["write_errors"],
+        "p50_ms": p(0.50),
+        "p99_ms": p(0.99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read throughput under concurrent sync writes")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each run")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent reader threads")
+    parser.add_argument("--seed-rows", type=int, default=5000, help="Capsules inserted before measuring")
+    args = parser.parse_args()
+
+    print("📊 Connection benchmark: API reads while the sync loop writes")
+    print(f"   {args.readers} readers, 1 writer, {args.seconds}s per run, {args.seed_rows} seed rows")
+    print("=" * 70)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, factory in (("legacy (connect per call)", LegacyCapsuleDatabase),
+                              ("pooled WAL", CapsuleDatabase)):
+            db = factory(os.path.join(tmp_dir, f"{len(results)}.db"))
+            results[name] = run(db, args.seconds, args.readers, args.seed_rows)
+            db.close()
+
+    for name, result in results.items():
+        print(f"{name:28s} {result['requests_per_second']:9.1f} req/s  "
+              f"{result['writes_per_second']:8.1f} writes/s  "
+              f"p50 {result['p50_ms']:6.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+              f"errors {result['read_errors']}/{result['write_errors']}")
+
+
+if __name__ == "__main__":
+    main()
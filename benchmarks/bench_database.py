@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CapsuleDatabase at growing capsule counts, on synthetic data.
+
+Grows one database through the given sizes with synthetic_data (batch
+insert throughput is measured while filling) and, at each size, times the
+queries behind the API: gallery listing (first page, keyset page, stored
+summary JSON), tag filters, full-text search, creator lookups, single
+capsule reads, reveal windows and stats. Results are written as JSON;
+pass an earlier result file with --compare to print the change per query.
+
+Usage:
+    python benchmarks/bench_database.py [--sizes 10000,100000,1000000] [--repeat 50]
+        [--output results.json] [--compare previous.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import Counter
+from typing import Any, Callable, Dict
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase, SUMMARY_JSON_COLUMN
+from synthetic_data import SyntheticCapsules, fill_database, END_TIME
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def time_ms(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Median and 95th percentile of repeat runs, after one warm-up run"""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4)
+    }
+
+
+def build_queries(db: CapsuleDatabase, count: int, rng: random.Random,
+                  limit: int) -> Dict[str, Callable[[], Any]]:
+    """The timed operations, with parameters picked from the data at this size"""
+    with db.get_connection(readonly=True) as conn:
+        creators = Counter(row['creator'] for row in conn.execute("SELECT creator FROM capsules"))
+        tags = Counter(dict(conn.execute("SELECT tag, COUNT(*) FROM capsule_tags GROUP BY tag").fetchall()))
+    top_creator = creators.most_common(1)[0][0]
+    tail_creator = min(creators, key=lambda creator: (creators[creator], creator))
+    common_tag = tags.most_common(1)[0][0]
+    rare_tag = min(tags, key=lambda tag: (tags[tag], tag))
+    middle_id = count // 2
+    json_columns = [SUMMARY_JSON_COLUMN]
+
+    return {
+        "list first page": lambda: db.get_capsules(limit=limit),
+        "list keyset page": lambda: db.get_capsules(limit=limit, after_id=middle_id),
+        "list revealed only": lambda: db.get_capsules(limit=limit, revealed_only=True),
+        "list summary json": lambda: db.get_capsules(limit=limit, columns=json_columns),
+        "tag filter (common)": lambda: db.get_capsules(limit=limit, tag=common_tag),
+        "tag filter (rare)": lambda: db.get_capsules(limit=limit, tag=rare_tag),
+        "search word": lambda: db.search_capsules("ethereum", limit=limit),
+        "search prefix": lambda: db.search_capsules("valid", limit=limit),
+        "search two words": lambda: db.search_capsules("summer letter", limit=limit),
+        "creator (top)": lambda: db.get_capsules_by_creator(top_creator, limit=limit),
+        "creator (tail)": lambda: db.get_capsules_by_creator(tail_creator, limit=limit),
+        "creator count (top)": lambda: db.get_creator_count(top_creator),
+        "capsule by id": lambda: db.get_capsule(rng.randrange(count)),
+        "upcoming reveals": lambda: db.get_upcoming_reveals(hours=24 * 30, limit=limit, now=END_TIME),
+        "overdue reveals": lambda: db.get_overdue_reveals(limit=limit, now=END_TIME),
+        "stats": lambda: db.get_stats(),
+        "count": lambda: db.get_capsule_count()
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def print_comparison(results: Dict[str, Any], previous: Dict[str, Any]):
+    """Median change per query against an earlier run, for the sizes both measured"""
+    print(f"\n📈 Compared with {previous['meta'].get('revision') or 'previous run'} "
+          f"({previous['meta'].get('timestamp', '?')}); < 1.0x is faster")
+    for size, current in results["sizes"].items():
+        before = previous.get("sizes", {}).get(size)
+        if not before:
+            continue
+        print(f"\n{size} capsules")
+        old_rate, new_rate = before["insert"]["capsules_per_second"], current["insert"]["capsules_per_second"]
+        if old_rate and new_rate:
+            print(f"  {'batch insert':24s} {old_rate:10d}/s -> {new_rate:10d}/s")
+        for name, timing in current["queries"].items():
+            if name in before["queries"]:
+                old_ms = before["queries"][name]["median_ms"]
+                ratio = timing["median_ms"] / old_ms if old_ms else float("inf")
+                print(f"  {name:24s} {old_ms:10.3f} -> {timing['median_ms']:10.3f} ms  {ratio:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CapsuleDatabase latency and throughput on synthetic data")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated capsule counts")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed runs per query")
+    parser.add_argument("--limit", type=int, default=12, help="Page size")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Capsules per apply_batch while filling")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic data")
+    parser.add_argument("--work-dir", default=None, help="Directory for the database (default: system temp)")
+    parser.add_argument("--output", default=None, help="Result JSON (default: benchmarks/results/bench_database-<time>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    generator = SyntheticCapsules(seed=args.seed, total=sizes[-1])
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "args": vars(args)
+        },
+        "sizes": {}
+    }
+
+    print("📊 CapsuleDatabase benchmark: median / p95 latency per query (ms)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as tmp_dir:
+        db_path = os.path.join(tmp_dir, "capsules.db")
+        db = CapsuleDatabase(db_path, slow_query_ms=float("inf"))
+        count = 0
+        for size in sizes:
+            insert = fill_database(db, generator, size - count, args.batch_size)
+            count = size
+            stats = db.get_stats()
+            print(f"\n{size} capsules ({stats['revealed']} revealed), "
+                  f"batch insert {insert['capsules_per_second']}/s, {os.path.getsize(db_path) / 2 ** 20:.0f} MiB")
+
+            queries: Dict[str, Dict[str, float]] = {}
+            for name, fn in build_queries(db, count, rng, args.limit).items():
+                queries[name] = time_ms(fn, args.repeat)
+                print(f"  {name:24s} {queries[name]['median_ms']:10.3f} {queries[name]['p95_ms']:10.3f}")
+
+            results["sizes"][str(size)] = {
+                "insert": insert,
+                "revealed": stats["revealed"],
+                "database_bytes": os.path.getsize(db_path),
+                "queries": queries
+            }
+        db.close()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_database-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
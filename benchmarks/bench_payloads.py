@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark: table scans with the ciphertext inline in capsules rows versus
+in the capsule_payloads side table.
+
+Builds one database with the current layout, derives a copy with the
+previous layout (encrypted_story stored inline, in its old position in the
+middle of the row) and times the queries that walk the capsules table on
+both: LIKE scans as run by the search fallback, a full summary load as run
+by the read model, and an OFFSET page. Finally the inline copy is opened
+with CapsuleDatabase, which runs the migration, and its duration is shown.
+
+Every timed query runs on a fresh connection with a small page cache, so
+SQLite has to read the table's pages (from the OS cache) on every run.
+
+Usage:
+    python benchmarks/bench_payloads.py [--capsules 50000] [--story-bytes 4096] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase, SUMMARY_COLUMNS, CAPSULES_TABLE_COLUMNS
+from bench_search import make_capsule
+
+SUMMARY = ", ".join(SUMMARY_COLUMNS)
+
+QUERIES = {
+    "title LIKE scan": "SELECT COUNT(*) FROM capsules WHERE title LIKE '%zeppelin%'",
+    "story LIKE scan": "SELECT COUNT(*) FROM capsules WHERE decrypted_story LIKE '%zeppelin%'",
+    "summary load": f"SELECT {SUMMARY} FROM capsules",
+    "OFFSET page": f"SELECT {SUMMARY} FROM capsules ORDER BY id DESC LIMIT 12 OFFSET 20000"
+}
+
+# The capsules table before migration 5
+INLINE_TABLE_SQL = """
+    CREATE TABLE capsules_inline (
+        id INTEGER PRIMARY KEY,
+        creator TEXT NOT NULL,
+        creator_lc TEXT GENERATED ALWAYS AS (lower(creator)) VIRTUAL,
+        title TEXT NOT NULL,
+        tags TEXT NOT NULL,
+        encrypted_story BLOB NOT NULL,
+        decrypted_story TEXT DEFAULT '',
+        is_revealed BOOLEAN DEFAULT 0,
+        reveal_time INTEGER NOT NULL,
+        shutter_identity TEXT NOT NULL,
+        image_cid TEXT NOT NULL,
+        pixelated_image_cid TEXT DEFAULT '',
+        block_number INTEGER,
+        transaction_hash TEXT,
+        created_at INTEGER DEFAULT (strftime('%s', 'now')),
+        updated_at INTEGER DEFAULT (strftime('%s', 'now')),
+        revealed_at INTEGER
+    )
+"""
+
+
+def make_inline_copy(source: str, target: str):
+    """Copy of the database with encrypted_story moved back into capsules rows"""
+    shutil.copyfile(source, target)
+    conn = sqlite3.connect(target)
+    schema = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'capsules' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    )]
+    columns = ", ".join(CAPSULES_TABLE_COLUMNS)
+    conn.execute(INLINE_TABLE_SQL)
+    conn.execute(f"""
+        INSERT INTO capsules_inline ({columns}, encrypted_story)
+        SELECT {", ".join(f"c.{column}" for column in CAPSULES_TABLE_COLUMNS)}, p.encrypted_story
+        FROM capsules c JOIN capsule_payloads p ON p.capsule_id = c.id
+    """)
+    conn.execute("DROP TABLE capsules")
+    conn.execute("DROP TABLE capsule_payloads")
+    conn.execute("ALTER TABLE capsules_inline RENAME TO capsules")
+    for sql in schema:
+        if "capsule_payloads" not in sql:
+            conn.execute(sql)
+    conn.execute("PRAGMA user_version = 4")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def table_pages(path: str) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        return str(conn.execute("SELECT COUNT(*) FROM dbstat WHERE name = 'capsules'").fetchone()[0])
+    except sqlite3.OperationalError:
+        return "n/a"  # SQLite built without the dbstat virtual table
+    finally:
+        conn.close()
+
+
+def time_ms(path: str, sql: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        conn.execute("PRAGMA cache_size=-256")
+        conn.execute("PRAGMA mmap_size=0")
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+        conn.close()
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan speed with inline vs side-table ciphertext")
+    parser.add_argument("--capsules", type=int, default=50000, help="Capsules to generate")
+    parser.add_argument("--story-bytes", type=int, default=4096, help="Ciphertext size per capsule")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query (median reported)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print("📊 Capsule payload benchmark")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        split_path = os.path.join(tmp_dir, "split.db")
+        inline_path = os.path.join(tmp_dir, "inline.db")
+
+        db = CapsuleDatabase(split_path, slow_query_ms=float("inf"))
+        start = time.time()
+        for first in range(0, args.capsules, 5000):
+            batch = []
+            for capsule_id in range(first, min(first + 5000, args.capsules)):
+                capsule = make_capsule(capsule_id, rng)
+                capsule['encrypted_story'] = rng.randbytes(args.story_bytes)
+                batch.append(capsule)
+            db.apply_batch(batch, [], last_block=first)
+        db.close()
+        with sqlite3.connect(split_path) as conn:
+            conn.execute("VACUUM")
+        print(f"{args.capsules} capsules with {args.story_bytes} B ciphertext written in {time.time() - start:.1f}s")
+
+        make_inline_copy(split_path, inline_path)
+        print(f"capsules table pages: inline {table_pages(inline_path)}, side table {table_pages(split_path)}")
+
+        print(f"\n{'query':18s} {'inline (ms)':>12s} {'side table (ms)':>16s} {'speedup':>8s}")
+        for name, sql in QUERIES.items():
+            inline_ms = time_ms(inline_path, sql, args.repeat)
+            split_ms = time_ms(split_path, sql, args.repeat)
+            print(f"{name:18s} {inline_ms:12.1f} {split_ms:16.1f} {inline_ms / max(split_ms, 1e-6):7.1f}x")
+
+        start = time.time()
+        CapsuleDatabase(inline_path, slow_query_ms=float("inf")).close()
+        print(f"\nmigration of the inline database: {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
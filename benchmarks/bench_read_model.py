@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory footprint and query latency of the in-memory read model.
+
+Fills a SQLite database with synthetic capsules, loads them into
+CapsuleReadModel and reports the model's memory per 100k capsules
+(measured with tracemalloc) next to the median latency of the gallery's
+list queries served from SQLite and from the model.
+
+Usage:
+    python benchmarks/bench_read_model.py [--capsules 100000] [--repeat 200]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from read_model import CapsuleReadModel
+from bench_search import make_capsule
+
+QUERIES = {
+    "first page": {"limit": 12},
+    "cursor page": {"limit": 12, "after_id": None},  # after_id filled in with the middle id
+    "tag filter": {"limit": 12, "tag": "devcon"},
+    "revealed only": {"limit": 12, "revealed_only": True}
+}
+
+
+def time_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read model memory and latency")
+    parser.add_argument("--capsules", type=int, default=100000, help="Capsules to generate")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs per query (median reported)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print("📊 Read model benchmark")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        start = time.time()
+        for first in range(0, args.capsules, 5000):
+            batch = [make_capsule(i, rng) for i in range(first, min(first + 5000, args.capsules))]
+            db.apply_batch(batch, [], last_block=first)
+        print(f"{args.capsules} capsules written in {time.time() - start:.1f}s")
+
+        start = time.time()
+        model = CapsuleReadModel()
+        model.load(db)
+        load_seconds = time.time() - start
+
+        # Second load under tracemalloc (which slows it down), for the footprint only
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        traced_model = CapsuleReadModel()
+        traced_model.load(db)
+        traced = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del traced_model
+
+        per_100k = traced * 100000 / max(args.capsules, 1)
+        print(f"loaded in {load_seconds:.2f}s, tracemalloc {traced / 2**20:.1f} MiB "
+              f"({per_100k / 2**20:.1f} MiB per 100k capsules, {traced / max(args.capsules, 1):.0f} B/capsule), "
+              f"memory_usage() estimate {model.memory_usage() / 2**20:.1f} MiB")
+
+        QUERIES["cursor page"]["after_id"] = args.capsules // 2
+        print(f"\n{'query':16s} {'sqlite (us)':>12s} {'model (us)':>12s}")
+        for name, query in QUERIES.items():
+            db_us = time_us(lambda: db.get_capsules(**query), args.repeat)
+            model_us = time_us(lambda: model.get_capsules(**query), args.repeat)
+            print(f"{name:16s} {db_us:12.1f} {model_us:12.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/capsules/search latency as the capsule count grows.
+
+Grows one database through the given sizes and, at each size, times the
+FTS5 search against the previous LIKE scan for a few representative
+queries (common tag, rare word, creator address, partially typed word,
+two-word query).
+
+Usage:
+    python benchmarks/bench_search.py [--sizes 10000,100000,300000] [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase, select_columns
+
+WORDS = ["memories", "future", "hello", "friends", "ethereum", "devcon", "merge", "summer", "letter",
+         "dream", "wallet", "genesis", "story", "family", "builders", "validator", "hackathon", "coffee"]
+TAGS = ["Devcon", "The Merge", "Art", "DappCon", "Arbitrum", "Base", "ETHBelgium", "Family", "Personal"]
+
+QUERIES = {
+    "common tag": "devcon",
+    "rare word": "zeppelin",
+    "creator address": f"0x{1234:040x}",
+    "partial word": "valid",
+    "two words": "summer letter"
+}
+
+
+def make_capsule(capsule_id: int, rng: random.Random) -> dict:
+    title_words = rng.sample(WORDS, 3)
+    if capsule_id % 5000 == 0:
+        title_words.append("zeppelin")
+    revealed = rng.random() < 0.3
+    return {
+        'id': capsule_id,
+        'creator': f"0x{rng.randrange(2000):040x}",
+        'title': " ".join(title_words).title(),
+        'tags': ", ".join(rng.sample(TAGS, 2)),
+        'encrypted_story': os.urandom(64),
+        'decrypted_story': " ".join(rng.choices(WORDS, k=30)) if revealed else '',
+        'is_revealed': revealed,
+        'reveal_time': 1750000000 + capsule_id,
+        'shutter_identity': f"0x{capsule_id:064x}",
+        'image_cid': f"bafy{capsule_id:055d}",
+        'pixelated_image_cid': '',
+        'block_number': 22806303 + capsule_id,
+        'transaction_hash': f"0x{capsule_id:064x}"
+    }
+
+
+def time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency versus capsule count")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated capsule counts")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query (median reported)")
+    parser.add_argument("--limit", type=int, default=12, help="Page size")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    rng = random.Random(42)
+
+    print("📊 Search benchmark: median latency per query (ms), FTS5 vs LIKE")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        if not db.fts_enabled:
+            print("❌ This SQLite build has no FTS5")
+            sys.exit(1)
+
+        count = 0
+        for size in sizes:
+            start = time.time()
+            while count < size:
+                db.insert_capsule(make_capsule(count, rng))
+                count += 1
+            print(f"\n{size} capsules (inserted in {time.time() - start:.1f}s)")
+
+            for name, query in QUERIES.items():
+                fts_ms = time_ms(lambda: db.search_capsules(query, limit=args.limit), args.repeat)
+
+                def like_search():
+                    with db.get_connection(readonly=True) as conn:
+                        db._search_capsules_like(conn, query, args.limit, None, select_columns())
+                like_ms = time_ms(like_search, max(3, args.repeat // 4))
+
+                hits = len(db.search_capsules(query, limit=args.limit))
+                print(f"  {name:16s} fts {fts_ms:8.2f}  like {like_ms:8.2f}  ({hits} results)")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
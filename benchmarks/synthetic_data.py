@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Synthetic capsules for benchmarking CapsuleDatabase at scale.
+
+SyntheticCapsules generates a deterministic (seeded) stream of capsules
+shaped like production data: one to three tags drawn from the public
+config's tag_sections with a skewed popularity, log-normally distributed
+ciphertext sizes, creators following a power law (a few addresses create
+most capsules) and a mix of revealed, overdue and upcoming capsules.
+Batches come as (created, revealed) lists, the shape the event sync hands
+to apply_batch, so filling a database exercises the real write path.
+
+Usage:
+    python benchmarks/synthetic_data.py --capsules 100000 --db /tmp/capsules.db
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import itertools
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), '..', 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from public_config import public_config
+
+WORDS = ["memories", "future", "hello", "friends", "ethereum", "devcon", "merge", "summer", "letter",
+         "dream", "wallet", "genesis", "story", "family", "builders", "validator", "hackathon", "coffee",
+         "bridge", "rollup", "gas", "staking", "winter", "moon", "node", "client", "upgrade", "beacon"]
+
+# Timestamps of the generated history: capsules are created over one year
+# before END_TIME and reveal up to two years after their creation
+END_TIME = 1_760_000_000
+HISTORY_SECONDS = 365 * 86400
+MAX_REVEAL_DELAY = 2 * 365 * 86400
+FIRST_BLOCK = 22_000_000
+SECONDS_PER_BLOCK = 12
+
+
+def config_tags() -> List[str]:
+    """Tag names of the public config's tag_sections, in display order"""
+    return [tag["name"] for section in public_config.get("tag_sections", []) for tag in section["tags"]]
+
+
+def power_law_weights(count: int, exponent: float) -> List[float]:
+    """Cumulative weights of rank**-exponent over count ranks (for random.choices)"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class SyntheticCapsules:
+    """
+    Deterministic generator of realistic capsules.
+
+    Capsule ids are sequential and creation times increase with them. A
+    capsule whose reveal time has passed by END_TIME is revealed with
+    probability revealed_fraction; the rest of those are overdue.
+    """
+    def __init__(self, seed: int = 42, creators: int = 20000, creator_exponent: float = 1.1,
+                 tag_exponent: float = 0.8, median_story_bytes: int = 1024, max_story_bytes: int = 64 * 1024,
+                 revealed_fraction: float = 0.85, total: int = 100000):
+        """
+        Args:
+            creators: Distinct creator addresses
+            creator_exponent: Power-law exponent of capsules per creator (higher = more skewed)
+            tag_exponent: Power-law exponent of tag popularity
+            median_story_bytes: Median ciphertext size (sizes are log-normal)
+            max_story_bytes: Largest ciphertext generated
+            revealed_fraction: Share of capsules past their reveal time that are revealed
+            total: Capsules the history is spread over (sets the creation time step)
+        """
+        self.rng = random.Random(seed)
+        self.creators = [f"0x{self.rng.getrandbits(160):040x}" for _ in range(creators)]
+        self.creator_weights = power_law_weights(creators, creator_exponent)
+        self.tags = config_tags() or ["Art", "Personal"]
+        self.tag_weights = power_law_weights(len(self.tags), tag_exponent)
+        self.median_story_bytes = median_story_bytes
+        self.max_story_bytes = max_story_bytes
+        self.revealed_fraction = revealed_fraction
+        self.time_step = HISTORY_SECONDS / max(1, total)
+        self.next_id = 0
+
+    def _tags(self) -> str:
+        count = self.rng.choice((1, 1, 2, 2, 3))
+        tags: List[str] = []
+        while len(tags) < count:
+            tag = self.rng.choices(self.tags, cum_weights=self.tag_weights)[0]
+            if tag not in tags:
+                tags.append(tag)
+        return ", ".join(tags)
+
+    def _story_bytes(self) -> int:
+        size = int(self.rng.lognormvariate(math.log(self.median_story_bytes), 0.8))
+        return max(64, min(size, self.max_story_bytes))
+
+    def make_capsule(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """The next capsule, and its reveal if it has been revealed"""
+        capsule_id = self.next_id
+        self.next_id += 1
+        rng = self.rng
+        created_at = int(END_TIME - HISTORY_SECONDS + capsule_id * self.time_step)
+        block_number = FIRST_BLOCK + (created_at - (END_TIME - HISTORY_SECONDS)) // SECONDS_PER_BLOCK
+        reveal_time = created_at + rng.randrange(3600, MAX_REVEAL_DELAY)
+        capsule = {
+            'id': capsule_id,
+            'creator': rng.choices(self.creators, cum_weights=self.creator_weights)[0],
+            'title': " ".join(rng.sample(WORDS, rng.randint(2, 5))).capitalize(),
+            'tags': self._tags(),
+            'encrypted_story': rng.randbytes(self._story_bytes()),
+            'decrypted_story': '',
+            'is_revealed': False,
+            'reveal_time': reveal_time,
+            'shutter_identity': f"0x{rng.getrandbits(256):064x}",
+            'image_cid': f"bafy{rng.getrandbits(200):050x}",
+            'pixelated_image_cid': f"bafy{rng.getrandbits(200):050x}" if rng.random() < 0.9 else '',
+            'block_number': block_number,
+            'transaction_hash': f"0x{rng.getrandbits(256):064x}",
+            'created_at': created_at
+        }
+        reveal = None
+        if reveal_time < END_TIME and rng.random() < self.revealed_fraction:
+            revealed_at = min(END_TIME, reveal_time + rng.randrange(60, 7 * 86400))
+            reveal = {
+                'id': capsule_id,
+                'decrypted_story': " ".join(rng.choices(WORDS, k=rng.randint(20, 200))),
+                'block_number': block_number + (revealed_at - created_at) // SECONDS_PER_BLOCK,
+                'transaction_hash': f"0x{rng.getrandbits(256):064x}",
+                'revealed_at': revealed_at
+            }
+        return capsule, reveal
+
+    def batches(self, count: int, batch_size: int = 5000) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """count capsules as (created, revealed) batches of up to batch_size capsules"""
+        remaining = count
+        while remaining > 0:
+            created: List[Dict[str, Any]] = []
+            revealed: List[Dict[str, Any]] = []
+            for _ in range(min(batch_size, remaining)):
+                capsule, reveal = self.make_capsule()
+                created.append(capsule)
+                if reveal:
+                    revealed.append(reveal)
+            remaining -= len(created)
+            yield created, revealed
+
+
+def fill_database(db: CapsuleDatabase, generator: SyntheticCapsules, count: int,
+                  batch_size: int = 5000) -> Dict[str, Any]:
+    """
+    Append count capsules through apply_batch
+
+    Returns:
+        Capsules and reveals written, the seconds spent in apply_batch (excluding
+        generation) and the resulting write throughput
+    """
+    capsules = reveals = 0
+    write_seconds = 0.0
+    for created, revealed in generator.batches(count, batch_size):
+        start = time.perf_counter()
+        if db.apply_batch(created, revealed, last_block=created[-1]['block_number']) is None:
+            raise RuntimeError(f"apply_batch failed at capsule {created[0]['id']}")
+        write_seconds += time.perf_counter() - start
+        capsules += len(created)
+        reveals += len(revealed)
+    return {
+        "capsules": capsules,
+        "reveals": reveals,
+        "write_seconds": round(write_seconds, 3),
+        "capsules_per_second": round(capsules / write_seconds) if write_seconds else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a SQLite database with synthetic capsules")
+    parser.add_argument("--capsules", type=int, default=100000, help="Capsules to generate")
+    parser.add_argument("--db", required=True, help="SQLite database to fill (capsules with the same ids are overwritten)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Capsules per apply_batch")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    db = CapsuleDatabase(args.db, slow_query_ms=float("inf"))
+    result = fill_database(db, SyntheticCapsules(seed=args.seed, total=args.capsules), args.capsules, args.batch_size)
+    db.close()
+    print(f"✅ {result['capsules']} capsules ({result['reveals']} revealed) written to {args.db} "
+          f"in {result['write_seconds']}s ({result['capsules_per_second']}/s)")
+
+
+if __name__ == "__main__":
+    main()
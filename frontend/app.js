@@ -2013,9 +2013,62 @@ async function fileToHex(file) {
 }
 
 // Helper: upload to IPFS via backend
+// Uses resumable chunked uploads so a dropped connection only re-sends one chunk;
+// falls back to the single-request endpoint if the backend does not support sessions
+// or the chunked upload fails.
 async function uploadToIPFS(hexData) {
-  const res = await window.axios.post(`${getApiBaseUrl()}/upload_ipfs`, { hex: hexData });
-  return res.data;
+  const bytes = hexToBytes(hexData);
+  try {
+    const res = await window.axios.post(`${getApiBaseUrl()}/upload_ipfs/sessions`, { size: bytes.length });
+    const session = res.data;
+
+    for (let index = 0; index < session.total_chunks; index++) {
+      const start = index * session.chunk_size;
+      // slice() copies the chunk into its own buffer: axios sends a typed array's
+      // whole underlying buffer, which for a subarray would be the entire file
+      const chunk = bytes.slice(start, Math.min(start + session.chunk_size, bytes.length));
+      await putChunkWithRetry(session.session_id, index, chunk);
+    }
+
+    const finalized = await window.axios.post(`${getApiBaseUrl()}/upload_ipfs/sessions/${session.session_id}/finalize`);
+    return finalized.data;
+  } catch (error) {
+    console.warn('Chunked upload failed, falling back to single request:', error);
+    const res = await window.axios.post(`${getApiBaseUrl()}/upload_ipfs`, { hex: hexData });
+    return res.data;
+  }
+}
+
+// Helper: PUT a single upload chunk, retrying with backoff on network errors
+async function putChunkWithRetry(sessionId, index, chunk, maxAttempts = 5) {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      await window.axios.put(
+        `${getApiBaseUrl()}/upload_ipfs/sessions/${sessionId}/chunks/${index}`,
+        chunk,
+        { headers: { 'Content-Type': 'application/octet-stream' } }
+      );
+      return;
+    } catch (error) {
+      const status = error.response && error.response.status;
+      // Client errors (other than timeouts) will not succeed on retry
+      if (attempt >= maxAttempts || (status && status < 500 && status !== 408)) {
+        throw error;
+      }
+      console.warn(`Chunk ${index} upload failed (attempt ${attempt}), retrying...`, error);
+      await new Promise(resolve => setTimeout(resolve, 500 * 2 ** (attempt - 1)));
+    }
+  }
+}
+
+// Helper: convert 0x-prefixed hex string to bytes
+function hexToBytes(hexData) {
+  const hex = hexData.startsWith('0x') ? hexData.slice(2) : hexData;
+  const bytes = new Uint8Array(hex.length / 2);
+  for (let i = 0; i < bytes.length; i++) {
+    bytes[i] = parseInt(hex.substr(i * 2, 2), 16);
+  }
+  return bytes;
 }
 
 // Helper function to get current wallet address
@@ -17,7 +17,8 @@ let walletConnected = false;
 let appConfig = null;
 
 // Gallery state
-let currentOffset = 0;
+let listCursor = null; // next_cursor (last capsule id) of the last gallery page
+let searchCursor = null; // next_cursor of the last search page
 let currentFilter = 'all'; // 'all' or specific tag name
 let currentSearch = '';
 const batchSize = 12;
@@ -373,7 +374,7 @@ function renderTagFilters() {
 
 function setFilter(filter) {
   currentFilter = filter;
-  currentOffset = 0;
+  listCursor = null;
   hasMore = true;
   
   // Update button states
@@ -404,7 +405,8 @@ function setFilter(filter) {
 function performSearch() {
   const searchInput = document.getElementById('search-input');
   currentSearch = searchInput.value.trim();
-  currentOffset = 0;
+  listCursor = null;
+  searchCursor = null;
   hasMore = true;
   
   // Clear grid and reload
@@ -431,13 +433,19 @@ async function loadCapsules() {
       params = {
         q: currentSearch,
         limit: batchSize
-      };    } else {
+      };
+      if (searchCursor) {
+        params.cursor = searchCursor;
+      }    } else {
       // Normal load mode
       url = `${getApiBaseUrl()}/api/capsules`;
       params = {
-        offset: currentOffset,
         limit: batchSize
       };
+      // Keyset pagination: stable while new capsules arrive during scrolling
+      if (listCursor !== null) {
+        params.after_id = listCursor;
+      }
       
       // Add tag filtering if not 'all'
       if (currentFilter !== 'all') {
@@ -471,10 +479,12 @@ async function loadCapsules() {
     
     // Update pagination
     if (!currentSearch) {
-      currentOffset += batchSize;
-      hasMore = currentOffset < totalCount;
+      listCursor = response.data.next_cursor ?? null;
+      hasMore = listCursor !== null;
     } else {
-      hasMore = false; // Search shows all results at once
+      // Search results are paged by relevance with an opaque cursor
+      searchCursor = response.data.next_cursor || null;
+      hasMore = !!searchCursor;
     }
     
     // Update load status - count what we actually loaded, not DOM children
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for the pluggable blob storage backends:
+- Local disk backend (always), including concurrent writers of one key
+- S3 backend against a MinIO-style server, when S3_TEST_ENDPOINT_URL is set, e.g.
+  docker run -p 9000:9000 minio/minio server /data
+  S3_TEST_ENDPOINT_URL=http://localhost:9000 S3_TEST_BUCKET=capsules python test_blob_storage.py
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from blob_storage import LocalBlobStorage, S3BlobStorage
+
+def check_backend(storage):
+    """Exercise the BlobStorage interface on any backend"""
+    payload = os.urandom(300 * 1024)
+
+    assert storage.get("ipfs", "QmMissing") is None
+    assert not storage.exists("ipfs", "QmMissing")
+
+    storage.put("ipfs", "QmTestBlob", payload)
+    assert storage.exists("ipfs", "QmTestBlob")
+    assert storage.get("ipfs", "QmTestBlob") == payload
+    assert b"".join(storage.iter_chunks("ipfs", "QmTestBlob", chunk_size=64 * 1024)) == payload
+
+    storage.put("pixelated", "preview.png", b"png-bytes")
+    assert storage.rename("pixelated", "preview.png", "QmTestBlob.png")
+    assert storage.get("pixelated", "QmTestBlob.png") == b"png-bytes"
+    assert not storage.rename("pixelated", "preview.png", "other.png")
+
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(b"uploaded")
+    storage.put_file("ipfs", "QmFromFile", f.name)
+    assert not os.path.exists(f.name), "put_file should consume the source file"
+    assert storage.get("ipfs", "QmFromFile") == b"uploaded"
+
+    for key in ("../escape", "a/b", ""):
+        try:
+            storage.get("ipfs", key)
+            assert False, f"Key {key!r} should have been rejected"
+        except ValueError:
+            pass
+
+    for key in ("QmTestBlob", "QmFromFile"):
+        storage.delete("ipfs", key)
+    storage.delete("pixelated", "QmTestBlob.png")
+    assert not storage.exists("ipfs", "QmTestBlob")
+
+def test_local_backend():
+    """Test the local disk backend"""
+    print("🧪 Testing local blob storage...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(tmp_dir)
+        check_backend(storage)
+        assert storage.presigned_url("ipfs", "QmTestBlob") is None
+
+        # Threads writing the same key never mix their bytes or trip over each other's tmp file
+        payloads = [bytes([n]) * (256 * 1024) for n in range(8)]
+        errors = []
+
+        def write(payload):
+            try:
+                for _ in range(20):
+                    storage.put("ipfs", "QmShared", payload)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(payload,)) for payload in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        assert storage.get("ipfs", "QmShared") in payloads
+        assert not [name for name in os.listdir(os.path.dirname(storage._path("ipfs", "QmShared")))
+                    if name.endswith(".tmp")]
+    print("✅ Local blob storage test passed!")
+
+def test_s3_backend():
+    """Test the S3 backend against a local MinIO-style stand-in"""
+    print("\n🧪 Testing S3 blob storage...")
+    endpoint = os.environ.get("S3_TEST_ENDPOINT_URL")
+    if not endpoint:
+        print("ℹ️ S3_TEST_ENDPOINT_URL not set - skipping S3 backend test")
+        return
+
+    storage = S3BlobStorage(
+        bucket=os.environ.get("S3_TEST_BUCKET", "capsules"),
+        prefix="test/",
+        endpoint_url=endpoint,
+        region="us-east-1",
+        access_key=os.environ.get("S3_TEST_ACCESS_KEY", "minioadmin"),
+        secret_key=os.environ.get("S3_TEST_SECRET_KEY", "minioadmin"),
+        presigned_redirects=True
+    )
+    try:
+        storage.client.create_bucket(Bucket=storage.bucket)
+    except storage.client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    check_backend(storage)
+
+    # Presigned URLs must be fetchable without credentials
+    import requests
+    storage.put("ipfs", "QmPresigned", b"direct download")
+    response = requests.get(storage.presigned_url("ipfs", "QmPresigned"), timeout=10)
+    assert response.status_code == 200 and response.content == b"direct download"
+    storage.delete("ipfs", "QmPresigned")
+    print("✅ S3 blob storage test passed!")
+
+def main():
+    """Run all tests"""
+    print("🗄️  Testing Blob Storage Backends")
+    print("=" * 50)
+
+    try:
+        test_local_backend()
+        test_s3_backend()
+        print("\n🎉 All blob storage tests passed!")
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for block timestamp lookups:
+- Uncached blocks are fetched as JSON-RPC batches of batch_size
+- Cached blocks cost no requests; the cache evicts least recently used blocks
+- Missing headers raise BlockTimestampError
+- Providers that reject batches are queried one block at a time
+"""
+
+import sys
+import os
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+import requests
+from block_timestamps import BlockTimestampCache, BlockTimestampError
+
+def block_time(number):
+    return 1_700_000_000 + number * 5
+
+class FakeResponse:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise requests.HTTPError(f"{self.status} error")
+
+    def json(self):
+        return self.payload
+
+class FakeRPC:
+    """Answers eth_getBlockByNumber for blocks below head"""
+    def __init__(self, head=10_000, batches=True):
+        self.head = head
+        self.batches = batches
+        self.payloads = []
+
+    def post(self, url, json=None, timeout=None):
+        self.payloads.append(json)
+        if isinstance(json, list):
+            if not self.batches:
+                return FakeResponse({"jsonrpc": "2.0", "id": None,
+                                     "error": {"code": -32600, "message": "batch requests not supported"}})
+            # Providers may answer a batch in any order
+            return FakeResponse([self.reply(request) for request in reversed(json)])
+        return FakeResponse(self.reply(json))
+
+    def reply(self, request):
+        number = int(request["params"][0], 16)
+        block = {"number": hex(number), "timestamp": hex(block_time(number))} if number < self.head else None
+        return {"jsonrpc": "2.0", "id": request["id"], "result": block}
+
+def test_batched_fetch():
+    """Test that uncached blocks are fetched in batches and then served from the cache"""
+    print("🧪 Testing batched block timestamp fetch...")
+
+    rpc = FakeRPC()
+    cache = BlockTimestampCache("http://rpc.invalid", batch_size=100, session=rpc)
+
+    blocks = list(range(1000, 1250)) + [1000, 1001]
+    timestamps = cache.get_timestamps(blocks)
+    assert timestamps == {number: block_time(number) for number in range(1000, 1250)}
+    assert cache.requests_made == 3
+    assert [len(payload) for payload in rpc.payloads] == [100, 100, 50]
+    assert rpc.payloads[0][0]["params"] == ["0x3e8", False]
+
+    # Cached blocks cost nothing; only the new one is requested (on its own)
+    timestamps = cache.get_timestamps([1100, 1249, 1250])
+    assert timestamps == {1100: block_time(1100), 1249: block_time(1249), 1250: block_time(1250)}
+    assert cache.requests_made == 4
+    assert isinstance(rpc.payloads[-1], dict)
+
+    assert cache.get_timestamps([]) == {}
+    assert cache.requests_made == 4
+
+    print("✅ Batched fetch test passed!")
+
+def test_cache_eviction():
+    """Test that the least recently used blocks are evicted first"""
+    print("\n🧪 Testing block timestamp cache eviction...")
+
+    rpc = FakeRPC()
+    cache = BlockTimestampCache("http://rpc.invalid", max_entries=3, session=rpc)
+
+    cache.get_timestamps([1, 2, 3])
+    cache.get_timestamps([1])        # 2 is now the least recently used
+    cache.get_timestamps([4])
+    requests_made = cache.requests_made
+    cache.get_timestamps([1, 3, 4])
+    assert cache.requests_made == requests_made
+    cache.get_timestamps([2])
+    assert cache.requests_made == requests_made + 1
+
+    print("✅ Cache eviction test passed!")
+
+def test_fetch_errors():
+    """Test that missing headers and failed requests raise BlockTimestampError"""
+    print("\n🧪 Testing block timestamp errors...")
+
+    rpc = FakeRPC(head=100)
+    cache = BlockTimestampCache("http://rpc.invalid", session=rpc)
+    for blocks in ([99, 100], [150]):
+        try:
+            cache.get_timestamps(blocks)
+            assert False, "unknown block should raise"
+        except BlockTimestampError as e:
+            assert "unavailable" in str(e)
+
+    class FailingSession:
+        def post(self, url, json=None, timeout=None):
+            return FakeResponse(None, status=503)
+
+    cache = BlockTimestampCache("http://rpc.invalid", session=FailingSession())
+    try:
+        cache.get_timestamps([1, 2])
+        assert False, "HTTP error should raise"
+    except BlockTimestampError as e:
+        assert "503" in str(e)
+
+    print("✅ Fetch error test passed!")
+
+def test_single_request_fallback():
+    """Test that a provider rejecting batches is queried one block at a time"""
+    print("\n🧪 Testing single request fallback...")
+
+    rpc = FakeRPC(batches=False)
+    cache = BlockTimestampCache("http://rpc.invalid", session=rpc)
+
+    timestamps = cache.get_timestamps([5, 6, 7])
+    assert timestamps == {5: block_time(5), 6: block_time(6), 7: block_time(7)}
+    assert not cache.batch_supported
+    # One rejected batch, then one request per block
+    assert cache.requests_made == 4
+    assert all(isinstance(payload, dict) for payload in rpc.payloads[1:])
+
+    cache.get_timestamps([8, 9])
+    assert cache.requests_made == 6
+
+    print("✅ Single request fallback test passed!")
+
+def main():
+    """Run all tests"""
+    print("⏱️  Testing Block Timestamp Lookups")
+    print("=" * 50)
+
+    try:
+        test_batched_fetch()
+        test_cache_eviction()
+        test_fetch_errors()
+        test_single_request_fallback()
+
+        print("\n🎉 All block timestamp tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script for the capsule API routes served from stored summary JSON:
+- List and detail responses match format_capsule
+- A capsule without a stored summary still gets a complete response
+- Updating a capsule stores its missing summary again
+- Search clamps its page size to 1..100
+- has_more and next_cursor agree in offset and cursor mode, with filters
+"""
+
+import sys
+import os
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+import app as backend_app
+from database import CapsuleDatabase, SUMMARY_API_FIELDS
+from test_database import make_capsule
+
+def use_database(tmp_dir):
+    """Point the app's routes at a fresh database with three capsules"""
+    db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+    db.apply_batch([make_capsule(i, title=f"Capsule {i}", tags="Art") for i in range(3)], [], last_block=1)
+    backend_app.db = db
+    return db
+
+def drop_summary(db, capsule_id):
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM capsule_json WHERE capsule_id = ?", (capsule_id,))
+        conn.commit()
+
+def test_routes_match_format_capsule():
+    """Test that spliced summaries equal the formatted capsules"""
+    print("🧪 Testing capsule routes...")
+
+    original_db = backend_app.db
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = use_database(tmp_dir)
+        try:
+            client = backend_app.app.test_client()
+            expected = [backend_app.format_capsule(db.get_capsule(i), SUMMARY_API_FIELDS) for i in (2, 1, 0)]
+
+            body = client.get("/api/capsules?limit=10").get_json()
+            assert body["success"] and body["capsules"] == expected, body
+            assert client.get("/api/capsules?tag=art").get_json()["capsules"] == expected
+
+            detail = client.get("/api/capsules/1").get_json()
+            assert detail["capsule"] == backend_app.format_capsule(db.get_capsule(1)), detail
+            assert client.get("/api/capsules/99").status_code == 404
+        finally:
+            backend_app.db = original_db
+            db.close()
+
+    print("✅ Capsule route test passed!")
+
+def test_missing_summary():
+    """Test that a capsule without a stored summary falls back to format_capsule"""
+    print("\n🧪 Testing capsules without a stored summary...")
+
+    original_db = backend_app.db
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = use_database(tmp_dir)
+        try:
+            client = backend_app.app.test_client()
+            drop_summary(db, 1)
+
+            response = client.get("/api/capsules/1")
+            assert response.status_code == 200, response.get_data()
+            assert response.get_json()["capsule"] == backend_app.format_capsule(db.get_capsule(1))
+
+            listed = client.get("/api/capsules?limit=10").get_json()["capsules"]
+            assert [c["id"] for c in listed] == [2, 1, 0]
+            assert listed[1] == backend_app.format_capsule(db.get_capsule(1), SUMMARY_API_FIELDS)
+
+            # The next update of the capsule (here its reveal) stores the summary again
+            assert db.reveal_capsule(1, "story", revealed_at=1_700_000_000)
+            with db.get_connection(readonly=True) as conn:
+                stored = conn.execute("SELECT summary_json FROM capsule_json WHERE capsule_id = 1").fetchone()
+            assert stored is not None and '"isRevealed":true' in stored[0]
+            assert client.get("/api/capsules/1").get_json()["capsule"]["isRevealed"] is True
+        finally:
+            backend_app.db = original_db
+            db.close()
+
+    print("✅ Missing summary test passed!")
+
+def test_search_limit():
+    """Test that out-of-range search limits are clamped instead of failing"""
+    print("\n🧪 Testing search page sizes...")
+
+    original_db = backend_app.db
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = use_database(tmp_dir)
+        try:
+            client = backend_app.app.test_client()
+            for limit, count in (("0", 1), ("-5", 1), ("2", 2), ("500", 3)):
+                response = client.get(f"/api/capsules/search?q=capsule&limit={limit}")
+                assert response.status_code == 200, (limit, response.get_data())
+                body = response.get_json()
+                assert body["count"] == count, (limit, body)
+                assert (body["next_cursor"] is not None) == (count < 3), (limit, body)
+        finally:
+            backend_app.db = original_db
+            db.close()
+
+    print("✅ Search limit test passed!")
+
+def test_list_pagination():
+    """Test has_more and next_cursor for offset and cursor pages"""
+    print("\n🧪 Testing gallery pagination...")
+
+    original_db = backend_app.db
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = use_database(tmp_dir)
+        try:
+            client = backend_app.app.test_client()
+            for query, ids, has_more in (("limit=2", [2, 1], True),
+                                         ("limit=3", [2, 1, 0], False),
+                                         ("offset=2&limit=2", [0], False),
+                                         ("after_id=2&limit=2", [1, 0], False),
+                                         ("after_id=2&limit=1", [1], True),
+                                         ("tag=nomatch&limit=1", [], False),
+                                         ("tag=art&limit=2", [2, 1], True),
+                                         ("revealed_only=true&limit=1", [], False),
+                                         ("limit=0", [], False)):
+                body = client.get(f"/api/capsules?{query}").get_json()
+                assert [c["id"] for c in body["capsules"]] == ids, (query, body)
+                assert body["has_more"] is has_more, (query, body)
+                assert body["next_cursor"] == (ids[-1] if has_more else None), (query, body)
+                assert body["total_count"] == 3
+        finally:
+            backend_app.db = original_db
+            db.close()
+
+    print("✅ Gallery pagination test passed!")
+
+def main():
+    """Run all tests"""
+    print("🌐 Testing Capsule API")
+    print("=" * 50)
+
+    try:
+        test_routes_match_format_capsule()
+        test_missing_summary()
+        test_search_limit()
+        test_list_pagination()
+
+        print("\n🎉 All capsule API tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming CARv1 export:
+- CIDs of single-chunk blobs match IPFS raw-leaf CIDs
+- Every block in the archive hashes to its CID
+- Multi-chunk blobs can be reassembled from their UnixFS DAG
+- Incremental exports only include newer capsules
+- Limited exports continue from last_capsule_id until complete
+- Spooled gateway downloads are released when prepare fails
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from blob_storage import LocalBlobStorage
+from car_export import CarExporter, cid_to_str, make_cid, CODEC_RAW, CHUNK_SIZE
+from test_database import make_capsule
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+def parse_car(data):
+    """Return (header bytes, {cid bytes: block bytes}) for a CARv1 archive"""
+    header_len, pos = read_varint(data, 0)
+    header = data[pos:pos + header_len]
+    pos += header_len
+    blocks = {}
+    while pos < len(data):
+        length, pos = read_varint(data, pos)
+        section = data[pos:pos + length]
+        pos += length
+        # CIDv1 sha2-256: version, codec, hash code, digest length, 32-byte digest
+        cid = section[:36]
+        blocks[cid] = section[36:]
+    return header, blocks
+
+def parse_pb_links(node):
+    """Extract child CIDs from a dag-pb node"""
+    links, pos = [], 0
+    while pos < len(node):
+        key, pos = read_varint(node, pos)
+        length, pos = read_varint(node, pos)
+        field = node[pos:pos + length]
+        pos += length
+        if key >> 3 == 2:
+            _, inner = read_varint(field, 0)
+            hash_len, inner = read_varint(field, inner)
+            links.append(field[inner:inner + hash_len])
+    return links
+
+def reassemble(cid, blocks):
+    if cid[1] == CODEC_RAW:
+        return blocks[cid]
+    return b"".join(reassemble(child, blocks) for child in parse_pb_links(blocks[cid]))
+
+def test_car_export():
+    """Test a full and an incremental export"""
+    print("🧪 Testing CAR export...")
+
+    assert cid_to_str(make_cid(CODEC_RAW, b"hello world")) == \
+        "bafkreifzjut3te2nhyekklss27nh3k72ysco7y32koao5eei66wof36n5e"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        storage = LocalBlobStorage(tmp_dir)
+
+        small = os.urandom(1000)
+        large = os.urandom(3 * CHUNK_SIZE + 123)
+        small_cid = cid_to_str(make_cid(CODEC_RAW, small))
+        storage.put("ipfs", small_cid, small)
+        storage.put("ipfs", "QmLargeImage", large)
+
+        db.insert_capsule(make_capsule(0, image_cid="QmLargeImage", pixelated_image_cid=small_cid))
+        db.insert_capsule(make_capsule(1, image_cid=small_cid))
+        db.insert_capsule(make_capsule(2, image_cid="QmNotStored"))
+
+        exporter = CarExporter(db, storage)
+        plan = exporter.prepare()
+        archive = b"".join(exporter.stream(plan))
+        summary = plan["summary"]
+
+        assert summary["blobs"] == 2, summary
+        assert summary["last_capsule_id"] == 2
+        assert [m["cid"] for m in summary["missing"]] == ["QmNotStored"]
+        assert summary["roots"][small_cid] == small_cid
+        assert [m["cid"] for m in summary["cid_mismatch"]] == ["QmLargeImage"]
+
+        header, blocks = parse_car(archive)
+        for cid, block in blocks.items():
+            assert cid[4:] == hashlib.sha256(block).digest(), "Block does not match its CID"
+        assert len(blocks) == 4 + 1 + 1, "3 full chunks + 1 partial + 1 root node + small blob"
+
+        large_root = next(e["root"] for e in plan["entries"] if e["cid"] == "QmLargeImage")
+        assert large_root in header and large_root[1] == 0x70
+        assert reassemble(large_root, blocks) == large
+
+        incremental = exporter.prepare(since_id=0)
+        assert incremental["summary"]["blobs"] == 1
+        _, blocks = parse_car(b"".join(exporter.stream(incremental)))
+        assert list(blocks.values()) == [small]
+
+    print("✅ CAR export test passed!")
+
+def test_bounded_export():
+    """Test that limited exports continue from last_capsule_id until complete"""
+    print("\n🧪 Testing bounded CAR export...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        storage = LocalBlobStorage(tmp_dir)
+        cids = []
+        for capsule_id in range(5):
+            blob = os.urandom(500)
+            cid = cid_to_str(make_cid(CODEC_RAW, blob))
+            storage.put("ipfs", cid, blob)
+            db.insert_capsule(make_capsule(capsule_id, image_cid=cid))
+            cids.append(cid)
+
+        exporter = CarExporter(db, storage)
+        exported, since_id, parts = [], -1, 0
+        while True:
+            plan = exporter.prepare(since_id=since_id, limit=2)
+            _, blocks = parse_car(b"".join(exporter.stream(plan)))
+            assert len(blocks) == plan["summary"]["blobs"] <= 2
+            exported += list(plan["summary"]["roots"])
+            since_id = plan["summary"]["last_capsule_id"]
+            parts += 1
+            if plan["summary"]["complete"]:
+                break
+        assert exported == cids and parts == 3 and since_id == 4
+
+        # An exhausted time budget still exports one capsule
+        plan = exporter.prepare(time_budget=0)
+        assert plan["summary"]["capsules"] == 1 and not plan["summary"]["complete"]
+        exporter.close_plan(plan)
+
+    print("✅ Bounded CAR export test passed!")
+
+def test_spool_released_on_error():
+    """Test that spooled downloads are closed when prepare fails or the plan is never streamed"""
+    print("\n🧪 Testing spool cleanup...")
+
+    class FlakyExporter(CarExporter):
+        """Spools the first blob like a gateway download, then fails"""
+        def _open_blob(self, cid, spool):
+            if spool:
+                raise IOError("gateway unavailable")
+            spool[cid] = tempfile.SpooledTemporaryFile()
+            spool[cid].write(b"spooled")
+            return super()._open_blob(cid, spool)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        db.insert_capsule(make_capsule(0, image_cid="QmFirst", pixelated_image_cid="QmSecond"))
+        exporter = FlakyExporter(db, LocalBlobStorage(tmp_dir))
+        spooled = []
+        original = exporter.close_plan
+        exporter.close_plan = lambda plan: (spooled.extend(plan["spool"].values()), original(plan))
+        try:
+            exporter.prepare()
+            assert False, "prepare should fail"
+        except IOError:
+            pass
+        assert len(spooled) == 1 and all(tmp.closed for tmp in spooled)
+
+        db.insert_capsule(make_capsule(0, image_cid="QmFirst"))
+        plan = exporter.prepare()
+        tmp = plan["spool"]["QmFirst"]
+        exporter.close_plan(plan)
+        exporter.close_plan(plan)
+        assert tmp.closed
+
+    print("✅ Spool cleanup test passed!")
+
+def main():
+    """Run all tests"""
+    print("📦 Testing CAR Export")
+    print("=" * 50)
+
+    try:
+        test_car_export()
+        test_bounded_export()
+        test_spool_released_on_error()
+        print("\n🎉 All CAR export tests passed!")
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
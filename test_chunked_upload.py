@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Test script for resumable chunked uploads:
+- Out-of-order and re-sent chunks
+- Incremental sha256 matches the whole-file hash
+- Incomplete uploads cannot be finalized
+- Worker processes sharing a session: no lost chunks, stale hashes or double finalize
+- The frontend client sends each chunk's own bytes and falls back to /upload_ipfs
+"""
+
+import sys
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from chunked_upload import ChunkedUploadManager, ChunkedUploadError
+
+FRONTEND_SCRIPTS = ["frontend/app.js", "frontend/chinese/app.js", "frontend/spanish/app.js"]
+
+# Runs the client's upload helpers against a fake axios that serializes typed
+# arrays the way axios 1.x's default transformRequest does (data.buffer)
+CLIENT_HARNESS = """
+const window = {};
+const getApiBaseUrl = () => '';
+const requests = [];
+window.axios = {
+  async post(url, body) {
+    requests.push({ method: 'POST', url, body });
+    if (url === '/upload_ipfs/sessions') {
+      return { data: { session_id: 's1', chunk_size: CHUNK_SIZE, total_chunks: Math.ceil(body.size / CHUNK_SIZE) } };
+    }
+    return { data: { cid: url } };
+  },
+  async put(url, data) {
+    const sent = ArrayBuffer.isView(data) ? data.buffer : data;
+    requests.push({ method: 'PUT', url, body: Buffer.from(sent).toString('hex') });
+    if (REJECT_CHUNKS) {
+      throw Object.assign(new Error('Request failed with status code 400'), { response: { status: 400 } });
+    }
+  }
+};
+console.warn = () => {};
+SOURCE
+uploadToIPFS(HEX_DATA).then(result => console.log(JSON.stringify({ result, requests })));
+"""
+
+def run_client(script, payload, chunk_size, reject_chunks=False):
+    """Requests made by the script's uploadToIPFS for payload, and its result"""
+    with open(os.path.join(os.path.dirname(__file__), script), encoding="utf-8") as f:
+        source = f.read()
+    start = source.index("// Helper: upload to IPFS via backend")
+    end = source.index("// Helper function to get current wallet address")
+    program = (CLIENT_HARNESS.replace("SOURCE", source[start:end])
+               .replace("CHUNK_SIZE", str(chunk_size))
+               .replace("REJECT_CHUNKS", json.dumps(reject_chunks))
+               .replace("HEX_DATA", json.dumps("0x" + payload.hex())))
+    output = subprocess.run(["node", "-e", program], capture_output=True, text=True, check=True, timeout=60)
+    return json.loads(output.stdout)
+
+def make_manager(tmp_dir):
+    return ChunkedUploadManager(storage_dir=tmp_dir, chunk_size=1000, max_total_size=10_000)
+
+def test_in_order_upload():
+    """Test that an in-order upload finalizes with the correct hash"""
+    print("🧪 Testing in-order chunked upload...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = make_manager(tmp_dir)
+        payload = os.urandom(3500)
+        session = manager.create_session(len(payload))
+        assert session["total_chunks"] == 4
+
+        for i in range(session["total_chunks"]):
+            manager.write_chunk(session["session_id"], i, payload[i * 1000:(i + 1) * 1000])
+
+        result = manager.finalize(session["session_id"])
+        assert result["sha256"] == hashlib.sha256(payload).hexdigest()
+        with open(result["path"], "rb") as f:
+            assert f.read() == payload
+
+    print("✅ In-order upload test passed!")
+
+def test_out_of_order_and_retry():
+    """Test resuming after lost chunks, out-of-order delivery and re-sent chunks"""
+    print("\n🧪 Testing out-of-order upload with retries...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = make_manager(tmp_dir)
+        payload = os.urandom(4200)
+        session_id = manager.create_session(len(payload))["session_id"]
+        chunks = [payload[i:i + 1000] for i in range(0, len(payload), 1000)]
+
+        manager.write_chunk(session_id, 2, chunks[2])
+        manager.write_chunk(session_id, 0, chunks[0])
+        # Corrupted retry followed by the correct chunk
+        manager.write_chunk(session_id, 0, b"\0" * 1000)
+        manager.write_chunk(session_id, 0, chunks[0])
+
+        status = manager.get_status(session_id)
+        assert status["missing"] == [1, 3, 4], status["missing"]
+
+        try:
+            manager.finalize(session_id)
+            assert False, "Finalize should fail while chunks are missing"
+        except ChunkedUploadError as e:
+            assert e.status_code == 409
+
+        for i in status["missing"]:
+            manager.write_chunk(session_id, i, chunks[i])
+
+        # A fresh manager simulates a different worker process finishing the upload
+        result = make_manager(tmp_dir).finalize(session_id)
+        assert result["sha256"] == hashlib.sha256(payload).hexdigest()
+
+    print("✅ Out-of-order upload test passed!")
+
+def test_rejects_invalid_chunks():
+    """Test size, range and checksum validation"""
+    print("\n🧪 Testing chunk validation...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = make_manager(tmp_dir)
+        session_id = manager.create_session(1500)["session_id"]
+
+        for index, data, checksum in [(2, b"x" * 500, None),
+                                      (0, b"x" * 999, None),
+                                      (1, b"x" * 500, "00" * 32)]:
+            try:
+                manager.write_chunk(session_id, index, data, expected_sha256=checksum)
+                assert False, f"Chunk {index} should have been rejected"
+            except ChunkedUploadError:
+                pass
+
+        try:
+            manager.create_session(20_000)
+            assert False, "Oversized session should have been rejected"
+        except ChunkedUploadError as e:
+            assert e.status_code == 413
+
+    print("✅ Chunk validation test passed!")
+
+def test_shared_between_workers():
+    """Test managers sharing one storage_dir, as gunicorn workers do"""
+    print("\n🧪 Testing sessions shared between workers...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Concurrent chunks from two workers all get recorded
+        workers = [ChunkedUploadManager(storage_dir=tmp_dir, chunk_size=10, max_total_size=10_000)
+                   for _ in range(2)]
+        payload = os.urandom(4000)
+        session_id = workers[0].create_session(len(payload))["session_id"]
+
+        def upload(manager, indexes):
+            for i in indexes:
+                manager.write_chunk(session_id, i, payload[i * 10:(i + 1) * 10])
+
+        threads = [threading.Thread(target=upload, args=(workers[n], range(n, 400, 2))) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert workers[0].get_status(session_id)["missing"] == []
+        assert workers[1].finalize(session_id)["sha256"] == hashlib.sha256(payload).hexdigest()
+        assert not [name for name in os.listdir(tmp_dir) if name.endswith(".tmp")]
+
+        # A chunk re-sent through another worker invalidates the first worker's cached hash
+        first, second = make_manager(tmp_dir), make_manager(tmp_dir)
+        payload = os.urandom(3000)
+        session_id = first.create_session(len(payload))["session_id"]
+        first.write_chunk(session_id, 0, b"\0" * 1000)
+        first.write_chunk(session_id, 1, payload[1000:2000])
+        second.write_chunk(session_id, 0, payload[:1000])
+        second.write_chunk(session_id, 2, payload[2000:])
+        result = first.finalize(session_id)
+        assert result["sha256"] == hashlib.sha256(payload).hexdigest()
+
+        # Only one finalize wins until the upload is stored or released
+        for manager, index in ((second, None), (first, 2)):
+            try:
+                if index is None:
+                    manager.finalize(session_id)
+                else:
+                    manager.write_chunk(session_id, index, payload[2000:])
+                assert False, "Should be rejected while finalizing"
+            except ChunkedUploadError as e:
+                assert e.status_code == 409
+        first.release_finalize(session_id)
+        assert second.finalize(session_id)["sha256"] == result["sha256"]
+        second.discard(session_id)
+        first.release_finalize(session_id)
+
+    print("✅ Shared session test passed!")
+
+def test_frontend_sends_chunk_bytes():
+    """Test that the frontend PUTs exactly each chunk's bytes and falls back on failure"""
+    print("\n🧪 Testing frontend chunk uploads...")
+
+    if shutil.which("node") is None:
+        print("⚠️ node not installed, skipping frontend upload test")
+        return
+
+    payload = os.urandom(3500)
+    for script in FRONTEND_SCRIPTS:
+        run = run_client(script, payload, chunk_size=1000)
+        puts = [r for r in run["requests"] if r["method"] == "PUT"]
+        assert [r["url"] for r in puts] == [f"/upload_ipfs/sessions/s1/chunks/{i}" for i in range(4)], script
+        for i, r in enumerate(puts):
+            assert bytes.fromhex(r["body"]) == payload[i * 1000:(i + 1) * 1000], f"{script} chunk {i}"
+        assert run["result"] == {"cid": "/upload_ipfs/sessions/s1/finalize"}, script
+
+        # The chunks are accepted by the server side as sent
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manager = make_manager(tmp_dir)
+            session_id = manager.create_session(len(payload))["session_id"]
+            for i, r in enumerate(puts):
+                manager.write_chunk(session_id, i, bytes.fromhex(r["body"]))
+            assert manager.finalize(session_id)["sha256"] == hashlib.sha256(payload).hexdigest()
+
+        # A rejected chunk falls back to the single-request endpoint
+        run = run_client(script, payload, chunk_size=1000, reject_chunks=True)
+        last = run["requests"][-1]
+        assert last["method"] == "POST" and last["url"] == "/upload_ipfs", script
+        assert last["body"] == {"hex": "0x" + payload.hex()}
+        assert run["result"] == {"cid": "/upload_ipfs"}, script
+
+    print("✅ Frontend chunk upload test passed!")
+
+def main():
+    """Run all tests"""
+    print("📦 Testing Chunked Uploads")
+    print("=" * 50)
+
+    try:
+        test_in_order_upload()
+        test_out_of_order_and_retry()
+        test_rejects_invalid_chunks()
+        test_shared_between_workers()
+        test_frontend_sends_chunk_bytes()
+
+        print("\n🎉 All chunked upload tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
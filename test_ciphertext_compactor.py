@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Test script for ciphertext compaction of revealed capsules:
+- Archive mode moves the ciphertext to blob storage, drop mode deletes it
+- Unrevealed and recently revealed capsules keep their ciphertext
+- A batch that cannot be deleted is reported and retried on the next pass
+- Incremental vacuum shrinks the database file (converting older files once)
+- Bounded passes (capsule limit, time budget) resume from next_after_id
+- A resync of the capsule restores the ciphertext
+- Non-transactional writer jobs run alone, in queue order
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from blob_storage import LocalBlobStorage
+from ciphertext_compactor import (CiphertextCompactor, CompactionInProgress, load_archived_ciphertext,
+                                  ciphertext_key, CIPHERTEXT_NAMESPACE)
+from test_database import make_capsule, make_reveal
+
+STORY_BYTES = 8192
+
+def compactable_database(path, capsules=40, revealed=30, revealed_at=1_700_000_000):
+    db = CapsuleDatabase(path)
+    created = []
+    for capsule_id in range(capsules):
+        capsule = make_capsule(capsule_id)
+        capsule['encrypted_story'] = bytes([capsule_id % 256]) * STORY_BYTES
+        created.append(capsule)
+    reveals = [dict(make_reveal(capsule_id, f"story {capsule_id}"), revealed_at=revealed_at)
+               for capsule_id in range(revealed)]
+    db.apply_batch(created, reveals, last_block=100)
+    return db
+
+def test_archive_mode():
+    """Test that archived ciphertext leaves the database and can be loaded back"""
+    print("🧪 Testing archive mode...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        db = compactable_database(os.path.join(tmp_dir, "capsules.db"))
+
+        dry_run = CiphertextCompactor(db, storage, batch_size=7).compact(dry_run=True)
+        assert dry_run["capsules"] == 30 and dry_run["ciphertext_bytes"] == 30 * STORY_BYTES
+        assert db.get_capsule(0)["encrypted_story"] is not None
+
+        report = CiphertextCompactor(db, storage, batch_size=7).compact()
+        assert report["mode"] == "archive" and report["capsules"] == 30 and not report["errors"]
+        assert report["vacuum"]["freed_pages"] > 0
+
+        # Revealed capsules lost their ciphertext, unrevealed ones kept it
+        assert db.get_capsule(3)["encrypted_story"] is None
+        assert db.get_capsule(3)["decrypted_story"] == "story 3"
+        assert db.get_capsule(35)["encrypted_story"] == bytes([35]) * STORY_BYTES
+        assert load_archived_ciphertext(storage, 3) == bytes([3]) * STORY_BYTES
+        assert load_archived_ciphertext(storage, 35) is None
+        assert storage.exists(CIPHERTEXT_NAMESPACE, ciphertext_key(29))
+
+        # Nothing left to do on the next pass
+        assert CiphertextCompactor(db, storage).compact()["capsules"] == 0
+
+        # A resync of the capsule stores its ciphertext again
+        resynced = make_capsule(3)
+        resynced['encrypted_story'] = b"restored"
+        db.apply_batch([resynced], [], last_block=101)
+        assert db.get_capsule(3)["encrypted_story"] == b"restored"
+        db.close()
+
+    print("✅ Archive mode test passed!")
+
+def test_drop_mode_and_age():
+    """Test drop mode and that recently revealed capsules are left alone"""
+    print("\n🧪 Testing drop mode...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = compactable_database(os.path.join(tmp_dir, "capsules.db"), revealed=10)
+        db.reveal_capsule(20, "fresh story", revealed_at=None)
+
+        report = CiphertextCompactor(db, min_age_seconds=3600).compact(vacuum=False)
+        assert report["mode"] == "drop" and report["capsules"] == 10 and report["vacuum"] is None
+        assert db.get_capsule(5)["encrypted_story"] is None
+        # Revealed just now (updated_at stands in for the missing revealed_at)
+        assert db.get_capsule(20)["encrypted_story"] is not None
+
+        assert CiphertextCompactor(db).compact()["capsules"] == 1
+        assert db.get_capsule(20)["encrypted_story"] is None
+
+        # Unrevealed capsules are never deleted, even when asked for directly
+        assert db.delete_payloads([30, 31]) == 0
+        assert db.get_capsule(30)["encrypted_story"] is not None
+        db.close()
+
+    print("✅ Drop mode test passed!")
+
+def test_failed_delete_batch():
+    """Test that a batch whose delete fails is reported and the pass continues"""
+    print("\n🧪 Testing failed delete batch...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        db = compactable_database(os.path.join(tmp_dir, "capsules.db"))
+        write = db._write
+        calls = []
+
+        def flaky_write(job):
+            calls.append(job)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("disk I/O error")
+            return write(job)
+
+        db._write = flaky_write
+        assert db.delete_payloads([0]) == 0
+        calls.clear()
+
+        report = CiphertextCompactor(db, storage, batch_size=10).compact(vacuum=False)
+        assert report["capsules"] == 20 and report["ciphertext_bytes"] == 20 * STORY_BYTES
+        assert [error["capsule_id"] for error in report["errors"]] == list(range(10))
+        # The failed batch keeps its ciphertext; the next pass archives it again and removes it
+        assert db.get_capsule(0)["encrypted_story"] is not None
+        assert db.get_capsule(10)["encrypted_story"] is None
+
+        db._write = write
+        report = CiphertextCompactor(db, storage).compact(vacuum=False)
+        assert report["capsules"] == 10 and not report["errors"]
+        assert load_archived_ciphertext(storage, 0) == bytes([0]) * STORY_BYTES
+        db.close()
+
+    print("✅ Failed delete batch test passed!")
+
+def test_vacuum_shrinks_file():
+    """Test that the file shrinks, including a database created without auto_vacuum"""
+    print("\n🧪 Testing incremental vacuum...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "capsules.db")
+        db = compactable_database(path, capsules=200, revealed=180)
+        with db.get_connection(readonly=True) as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        size_before = db.reclaim_space()["database_bytes"]
+
+        report = CiphertextCompactor(db).compact()
+        assert not report["vacuum"]["full_vacuum"]
+        assert report["vacuum"]["free_pages"] == 0
+        assert report["vacuum"]["database_bytes"] < size_before - 150 * STORY_BYTES
+        db.close()
+
+        # Files created before auto_vacuum was enabled get one full VACUUM
+        old_path = os.path.join(tmp_dir, "old.db")
+        conn = sqlite3.connect(old_path)
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("CREATE TABLE filler (data BLOB)")
+        conn.commit()
+        conn.close()
+        db = CapsuleDatabase(old_path)
+        db.apply_batch([dict(make_capsule(0), encrypted_story=b"x" * STORY_BYTES)],
+                       [make_reveal(0, "story")], last_block=1)
+        with db.get_connection(readonly=True) as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        assert CiphertextCompactor(db).compact()["vacuum"]["full_vacuum"]
+        conn = sqlite3.connect(old_path)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        conn.close()
+        assert not db.reclaim_space()["full_vacuum"]
+        assert db.get_capsule(0)["decrypted_story"] == "story"
+        db.close()
+
+    print("✅ Incremental vacuum test passed!")
+
+def test_bounded_passes():
+    """Test capsule limits, time budgets, per-pass overrides and the shared lock"""
+    print("\n🧪 Testing bounded compaction passes...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        db = compactable_database(os.path.join(tmp_dir, "capsules.db"))
+        compactor = CiphertextCompactor(db, storage, batch_size=5)
+
+        # 30 compactable capsules in passes of at most 12
+        after_id, passes, compacted = -1, 0, 0
+        while True:
+            report = compactor.compact(after_id=after_id, max_capsules=12, max_vacuum_pages=10)
+            passes += 1
+            compacted += report["capsules"]
+            assert report["capsules"] <= 12 and report["vacuum"]["freed_pages"] <= 10
+            if report["complete"]:
+                assert report["next_after_id"] is None
+                break
+            after_id = report["next_after_id"]
+        assert compacted == 30 and passes == 3
+        assert load_archived_ciphertext(storage, 29) == bytes([29]) * STORY_BYTES
+        db.close()
+
+        # An exhausted time budget still processes one batch
+        db = compactable_database(os.path.join(tmp_dir, "budget.db"))
+        compactor = CiphertextCompactor(db, storage, batch_size=5)
+        report = compactor.compact(time_budget=0, mode="drop", vacuum=False)
+        assert report["capsules"] == 5 and not report["complete"] and report["next_after_id"] == 4
+        assert report["mode"] == "drop"
+        assert db.get_capsule(4)["encrypted_story"] is None
+        assert db.get_capsule(5)["encrypted_story"] == bytes([5]) * STORY_BYTES
+
+        # A second pass does not wait for a running one
+        compactor._lock.acquire()
+        try:
+            compactor.compact(blocking=False)
+            assert False, "Should not run while another pass holds the lock"
+        except CompactionInProgress:
+            pass
+        finally:
+            compactor._lock.release()
+
+        try:
+            CiphertextCompactor(db).compact(mode="archive")
+            assert False, "Archive mode needs a storage"
+        except ValueError:
+            pass
+        db.close()
+
+        # Older files are left for the full VACUUM when it is not allowed
+        old_path = os.path.join(tmp_dir, "old.db")
+        conn = sqlite3.connect(old_path)
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("CREATE TABLE filler (data BLOB)")
+        conn.commit()
+        conn.close()
+        db = CapsuleDatabase(old_path)
+        db.apply_batch([dict(make_capsule(0), encrypted_story=b"x" * STORY_BYTES)],
+                       [make_reveal(0, "story")], last_block=1)
+        vacuum = CiphertextCompactor(db).compact(full_vacuum=False)["vacuum"]
+        assert vacuum["needs_full_vacuum"] and not vacuum["full_vacuum"]
+        with db.get_connection(readonly=True) as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        db.close()
+
+    print("✅ Bounded compaction test passed!")
+
+def test_non_transactional_writes():
+    """Test that writer jobs submitted with transaction=False run alone and in order"""
+    print("\n🧪 Testing non-transactional writer jobs...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"), group_commit_ms=50)
+        order = []
+
+        def write(capsule_id):
+            def run(conn):
+                db._write_capsules(conn, [make_capsule(capsule_id)])
+                order.append(capsule_id)
+            return run
+
+        def vacuum(conn):
+            assert not conn.in_transaction
+            conn.execute("VACUUM")
+            order.append("vacuum")
+
+        futures = [db.writer.submit(write(0)), db.writer.submit(write(1)),
+                   db.writer.submit(vacuum, transaction=False), db.writer.submit(write(2))]
+        for future in futures:
+            future.result(timeout=10)
+        assert order == [0, 1, "vacuum", 2]
+        assert db.get_capsule_count() == 3
+
+        # Errors surface on the job's future without stopping the writer
+        try:
+            db.writer.execute(lambda conn: conn.execute("VACUUM nonexistent"), transaction=False)
+            assert False, "invalid VACUUM should fail"
+        except sqlite3.OperationalError:
+            pass
+        assert db.insert_capsule(make_capsule(3))
+        db.close()
+
+    print("✅ Non-transactional writer job test passed!")
+
+def main():
+    """Run all tests"""
+    print("🗜️  Testing Ciphertext Compaction")
+    print("=" * 50)
+
+    try:
+        test_archive_mode()
+        test_drop_mode_and_age()
+        test_failed_delete_batch()
+        test_vacuum_shrinks_file()
+        test_bounded_passes()
+        test_non_transactional_writes()
+
+        print("\n🎉 All ciphertext compaction tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
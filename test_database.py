@@ -0,0 +1,711 @@
+#!/usr/bin/env python3
+"""
+Test script for the capsule database:
+- Pooled connections with WAL and read-only readers
+- Normalized tag index
+- Full-text search with prefix matching and cursor pagination
+- Search pagination continues past the newest search_candidates matches
+- Keyset pagination of the gallery listing
+- Case-insensitive, paginated creator listing
+- Upcoming and overdue reveal windows
+- In-place reveal updates
+- Transactional batch apply of synced block ranges
+- Block timestamps as creation and reveal times
+- Incrementally maintained stats counters
+- Summary projection for list queries
+- Stored summary JSON, refreshed on insert and reveal
+- Ciphertext in a side table (SQLite) and its migration
+
+Backend-agnostic tests run against PostgreSQL instead of SQLite when
+TEST_DATABASE_URL is set (the database is emptied first):
+    TEST_DATABASE_URL=postgres://localhost/capsules_test python test_database.py
+"""
+
+import sys
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from types import SimpleNamespace
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase, CAPSULE_API_FIELDS, SUMMARY_API_FIELDS, SUMMARY_JSON_COLUMN
+from blockchain_sync_events import EventBasedBlockchainSyncService
+from block_timestamps import BlockTimestampError
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+def open_database(tmp_dir):
+    """Database under test: SQLite in tmp_dir, or an emptied PostgreSQL database"""
+    if not TEST_DATABASE_URL:
+        return CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+
+    import psycopg2
+    from database_postgres import PostgresCapsuleDatabase
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    with conn, conn.cursor() as cur:
+        cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+    conn.close()
+    return PostgresCapsuleDatabase(TEST_DATABASE_URL)
+
+def execute_sql(db, sql):
+    """Run and commit a statement that is valid in both SQLite and PostgreSQL"""
+    with db.get_connection() as conn:
+        conn.cursor().execute(sql)
+        conn.commit()
+
+def make_capsule(capsule_id, **overrides):
+    capsule = {
+        'id': capsule_id,
+        'creator': f"0x{capsule_id:040x}",
+        'title': f"Capsule {capsule_id}",
+        'tags': "ethereum, art",
+        'encrypted_story': b"ciphertext",
+        'decrypted_story': '',
+        'is_revealed': False,
+        'reveal_time': int(time.time()) + 3600,
+        'shutter_identity': f"0x{capsule_id:064x}",
+        'image_cid': f"bafy{capsule_id}",
+        'pixelated_image_cid': '',
+        'block_number': 22806303 + capsule_id,
+        'transaction_hash': f"0x{capsule_id:064x}"
+    }
+    capsule.update(overrides)
+    return capsule
+
+def test_connection_pool():
+    """Test WAL mode, read-only readers and connection reuse"""
+    print("🧪 Testing pooled connections...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+
+        with db.get_connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            first = conn
+
+        with db.get_connection() as conn:
+            assert conn is first, "Connections should be reused"
+
+        with db.get_connection(readonly=True) as conn:
+            try:
+                conn.execute("DELETE FROM capsules")
+                assert False, "Read-only connection accepted a write"
+            except sqlite3.OperationalError:
+                pass
+
+        # An uncommitted write must not leak its transaction to the next user
+        with db.get_connection() as conn:
+            conn.execute("UPDATE sync_status SET total_capsules = 99 WHERE id = 1")
+        assert db.get_sync_status()['total_capsules'] == 0
+
+        db.close()
+
+    print("✅ Connection pool test passed!")
+
+def test_reads_during_writes():
+    """Test that readers keep working while a writer thread inserts"""
+    print("\n🧪 Testing concurrent reads and writes...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.insert_capsule(make_capsule(0))
+        failures = []
+
+        def writer():
+            for capsule_id in range(1, 200):
+                if not db.insert_capsule(make_capsule(capsule_id)):
+                    failures.append(f"write {capsule_id}")
+
+        def reader():
+            for _ in range(200):
+                if not db.get_capsules(limit=5):
+                    failures.append("empty read")
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not failures, failures[:5]
+        assert db.get_capsule_count() == 200
+        db.close()
+
+    print("✅ Concurrent read/write test passed!")
+
+def test_tag_index():
+    """Test exact, case-insensitive tag filtering and the backfill migration"""
+    print("\n🧪 Testing tag index...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.insert_capsule(make_capsule(1, tags="Art, Devcon"))
+        db.insert_capsule(make_capsule(2, tags="Arbitrum, party"))
+        db.insert_capsule(make_capsule(3, tags=" art ,The Merge"))
+
+        assert [c['id'] for c in db.get_capsules(tag="ART")] == [3, 1]
+        assert [c['id'] for c in db.get_capsules(tag="the merge")] == [3]
+        assert [c['id'] for c in db.get_capsules(tag="art", limit=1, offset=1)] == [1]
+
+        # Re-inserting a capsule replaces its tags
+        db.insert_capsule(make_capsule(1, tags="Devcon"))
+        assert [c['id'] for c in db.get_capsules(tag="art")] == [3]
+        db.close()
+
+        if isinstance(db, CapsuleDatabase):
+            with db.get_connection(readonly=True) as conn:
+                plan = " ".join(row['detail'] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT c.* FROM capsule_tags t JOIN capsules c ON c.id = t.capsule_id "
+                    "WHERE t.tag = ? ORDER BY t.capsule_id DESC", ("art",)))
+            assert "USING PRIMARY KEY (tag=?)" in plan and "TEMP B-TREE" not in plan, plan
+
+            # Simulate a database written before the tag index existed
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute("DELETE FROM capsule_tags")
+                conn.execute("PRAGMA user_version = 0")
+            db = CapsuleDatabase(db.db_path)
+            assert [c['id'] for c in db.get_capsules(tag="devcon")] == [1]
+            db.close()
+
+    print("✅ Tag index test passed!")
+
+def test_full_text_search():
+    """Test ranking, prefix matching, reveal updates and cursor pagination"""
+    print("\n🧪 Testing full-text search...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        assert db.fts_enabled, "This SQLite build has no FTS5"
+
+        db.insert_capsule(make_capsule(1, title="Devcon memories", tags="Devcon"))
+        db.insert_capsule(make_capsule(2, title="Hello", tags="Devcon, The Merge"))
+        db.insert_capsule(make_capsule(3, title="Café letter", tags="Art"))
+        db.insert_capsule(make_capsule(4, title="Unrelated", tags="Art"))
+
+        # Title matches outrank tag matches; the last word matches as a prefix
+        assert [c['id'] for c in db.search_capsules("devc")] == [1, 2]
+        assert [c['id'] for c in db.search_capsules("the mer")] == [2]
+        assert [c['id'] for c in db.search_capsules("cafe")] == [3]
+        assert [c['id'] for c in db.search_capsules(make_capsule(4)['creator'])] == [4]
+        assert db.search_capsules('" OR * NEAR(') == []
+
+        # Revealed stories become searchable
+        db.insert_capsule(make_capsule(4, title="Unrelated", tags="Art", decrypted_story="See you at Devconnect",
+                                       is_revealed=True))
+        assert [c['id'] for c in db.search_capsules("devc")] == [1, 2, 4]
+
+        # Cursor pagination walks the same order without gaps or repeats
+        seen, after = [], None
+        while True:
+            page = db.search_capsules("devc", limit=1, after=after)
+            if not page:
+                break
+            seen.append(page[0]['id'])
+            after = [page[0]['search_rank'], page[0]['id']]
+        assert seen == [1, 2, 4], seen
+        db.close()
+
+    print("✅ Full-text search test passed!")
+
+def test_search_windows():
+    """Test that cursor pagination reaches matches older than the newest search_candidates"""
+    print("\n🧪 Testing search pagination past the candidate window...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.search_candidates = 20
+        db.apply_batch([make_capsule(i, title="Devcon" if i % 3 else "Notes", tags="Devcon")
+                        for i in range(50)], [], last_block=1)
+
+        for limit in (10, 7):
+            seen, after = [], None
+            while True:
+                page = db.search_capsules("devcon", limit=limit, after=after)
+                seen.extend(c['id'] for c in page)
+                if len(page) < limit:
+                    break
+                after = [page[-1]['search_rank'], page[-1]['id'], page[-1]['search_window']]
+            assert sorted(seen) == list(range(50)), (limit, seen)
+            # Within each window title matches come first, newest first
+            assert seen[:20] == [i for i in range(49, 29, -1) if i % 3] + [i for i in range(49, 29, -1) if not i % 3]
+        db.close()
+
+    print("✅ Search window test passed!")
+
+def test_keyset_pagination():
+    """Test that after_id pages are stable while new capsules arrive"""
+    print("\n🧪 Testing keyset pagination...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        for capsule_id in range(10):
+            db.insert_capsule(make_capsule(capsule_id, tags="Art" if capsule_id % 2 else "Devcon"))
+
+        first = db.get_capsules(limit=4)
+        assert [c['id'] for c in first] == [9, 8, 7, 6]
+
+        # A new capsule would shift offset-based pages by one
+        db.insert_capsule(make_capsule(10))
+        assert [c['id'] for c in db.get_capsules(offset=4, limit=4)] == [6, 5, 4, 3]
+        assert [c['id'] for c in db.get_capsules(limit=4, after_id=first[-1]['id'])] == [5, 4, 3, 2]
+
+        assert [c['id'] for c in db.get_capsules(limit=2, tag="art", after_id=7)] == [5, 3]
+        assert db.get_capsules(limit=4, after_id=0) == []
+        db.close()
+
+    print("✅ Keyset pagination test passed!")
+
+def test_creator_listing():
+    """Test case-insensitive creator lookups, cursor pages and per-creator counts"""
+    print("\n🧪 Testing creator listing...")
+
+    creator = "0xAbCdEf0123456789aBcDeF0123456789AbCdEf01"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        for capsule_id in range(12):
+            db.insert_capsule(make_capsule(capsule_id, creator=creator if capsule_id % 3 else f"0x{capsule_id:040x}"))
+
+        # Checksummed, lower-case and upper-case addresses find the same capsules
+        for address in (creator, creator.lower(), "0X" + creator[2:].upper()):
+            assert [c['id'] for c in db.get_capsules_by_creator(address, limit=3)] == [11, 10, 8]
+            assert db.get_creator_count(address) == 8
+
+        page = db.get_capsules_by_creator(creator, limit=3, after_id=8)
+        assert [c['id'] for c in page] == [7, 5, 4] and page[0]['creator'] == creator
+        assert [c['id'] for c in db.get_capsules_by_creator(creator, limit=3, after_id=2)] == [1]
+        assert db.get_capsules_by_creator("0xnobody") == [] and db.get_creator_count("0xnobody") == 0
+        db.close()
+
+        # The lower-case column is added to databases created before it existed
+        if isinstance(db, CapsuleDatabase):
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute("DROP INDEX idx_capsules_creator_lc")
+                conn.execute("ALTER TABLE capsules DROP COLUMN creator_lc")
+                conn.execute("CREATE INDEX idx_capsules_creator ON capsules (creator, id)")
+                conn.execute("PRAGMA user_version = 2")
+            db = CapsuleDatabase(db.db_path)
+            assert db.get_creator_count(creator.lower()) == 8
+            assert 'creator_lc' not in db.get_capsule(1)
+            with db.get_connection(readonly=True) as conn:
+                indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            assert "idx_capsules_creator_lc" in indexes and "idx_capsules_creator" not in indexes
+            db.close()
+
+    print("✅ Creator listing test passed!")
+
+def test_reveal_windows():
+    """Test upcoming and overdue reveal queries with (reveal_time, id) cursors"""
+    print("\n🧪 Testing reveal windows...")
+
+    now = 1_750_000_000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        # Two capsules per reveal time, from 3 hours ago to 4 hours ahead
+        for capsule_id in range(16):
+            db.insert_capsule(make_capsule(capsule_id, reveal_time=now + (capsule_id // 2 - 3) * 3600))
+        db.apply_batch([], [make_reveal(0, "early"), make_reveal(9, "early")], last_block=1)
+
+        overdue = db.get_overdue_reveals(limit=10, now=now)
+        assert [c['id'] for c in overdue] == [1, 2, 3, 4, 5, 6, 7]
+        upcoming = db.get_upcoming_reveals(hours=2, limit=10, now=now)
+        assert [c['id'] for c in upcoming] == [8, 10, 11]
+        assert all(not c['is_revealed'] for c in overdue + upcoming)
+
+        # Cursor pages, including a page boundary between two capsules with the same reveal time
+        page = db.get_overdue_reveals(limit=2, now=now)
+        assert [c['id'] for c in page] == [1, 2]
+        cursor = [page[-1]['reveal_time'], page[-1]['id']]
+        assert [c['id'] for c in db.get_overdue_reveals(limit=2, after=cursor, now=now)] == [3, 4]
+        page = db.get_upcoming_reveals(hours=24, limit=3, after=[now + 2 * 3600, 10], now=now)
+        assert [c['id'] for c in page] == [11, 12, 13]
+
+        # The cursor needs reveal_time, so it is returned even when not requested
+        rows = db.get_upcoming_reveals(limit=1, columns=["title"], now=now)
+        assert set(rows[0]) == {"id", "title", "reveal_time"}
+        assert db.get_upcoming_reveals(hours=0, now=now) == []
+        db.close()
+
+    print("✅ Reveal window test passed!")
+
+def make_event(capsule_id, block, **args):
+    return {'args': {'id': capsule_id, **args}, 'blockNumber': block, 'transactionIndex': 0,
+            'transactionHash': bytes([capsule_id % 256]) * 32}
+
+def created_event(capsule_id, block):
+    capsule = make_capsule(capsule_id)
+    return make_event(capsule_id, block, creator=capsule['creator'], title=capsule['title'], tags=capsule['tags'],
+                      encryptedStory=capsule['encrypted_story'], revealTime=capsule['reveal_time'],
+                      shutterIdentity=capsule['shutter_identity'], imageCID=capsule['image_cid'],
+                      pixelatedImageCID='')
+
+# Synced events are dated one second per block in tests
+BLOCK_TIME_ORIGIN = 1_700_000_000
+
+def fake_block_times():
+    return SimpleNamespace(get_timestamps=lambda blocks: {block: BLOCK_TIME_ORIGIN + block for block in blocks})
+
+def make_reveal(capsule_id, story):
+    return {'id': capsule_id, 'decrypted_story': story,
+            'block_number': 23000000 + capsule_id, 'transaction_hash': f"0x{capsule_id + 1:064x}"}
+
+def test_reveal_capsule():
+    """Test that a reveal updates the stored row in place"""
+    print("\n🧪 Testing in-place reveal...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.insert_capsule(make_capsule(1, title="Letter to the future"))
+
+        assert db.reveal_capsule(1, "Greetings from the merge", 23000001, "0xabc") is True
+        capsule = db.get_capsule(1)
+        assert capsule['is_revealed'] and capsule['decrypted_story'] == "Greetings from the merge"
+        assert (capsule['block_number'], capsule['transaction_hash']) == (23000001, "0xabc")
+        assert capsule['encrypted_story'] == b"ciphertext" and capsule['title'] == "Letter to the future"
+        assert db.get_stats()['revealed'] == 1
+
+        # The story becomes searchable, the other columns stay indexed
+        assert [c['id'] for c in db.search_capsules("greetings")] == [1]
+        assert [c['id'] for c in db.search_capsules("letter future")] == [1]
+        assert [c['id'] for c in db.search_capsules("mer")] == [1]
+
+        assert db.reveal_capsule(2, "unknown capsule") is False
+        assert db.get_capsule(2) is None and db.get_stats()['revealed'] == 1
+        db.close()
+
+    print("✅ In-place reveal test passed!")
+
+def test_apply_batch():
+    """Test that rows and the block cursor are committed together or not at all"""
+    print("\n🧪 Testing transactional batch apply...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+
+        created = [make_capsule(i) for i in range(100)]
+        revealed = [make_reveal(5, "hello devcon"), make_reveal(500, "never created")]
+        assert db.apply_batch(created, revealed, last_block=1000) == [500]
+        status = db.get_sync_status()
+        assert status['last_synced_block'] == 1000 and status['total_capsules'] == 100
+        assert db.get_capsule(5)['is_revealed'] and [c['id'] for c in db.search_capsules("devcon")] == [5]
+
+        # A bad row aborts the whole batch, including the cursor
+        broken = [make_capsule(100), {'id': 101}]
+        assert db.apply_batch(broken, [], last_block=2000) is None
+        assert db.get_sync_status()['last_synced_block'] == 1000
+        assert db.get_capsule(100) is None
+
+        # The sync service stores a range (with a same-range reveal) in one batch
+        service = object.__new__(EventBasedBlockchainSyncService)
+        events = {
+            "created": [created_event(200, 1501), created_event(201, 1502)],
+            "revealed": [make_event(200, 1503, plaintextStory="revealed in the same range")]
+        }
+        service.db = db
+        service.read_model = None
+        service.start_block = 0
+        service._batch_size = 1000
+        service.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=1600))
+        service.block_times = fake_block_times()
+        service.capsule_created_event = SimpleNamespace(get_logs=lambda **kw: events["created"])
+        service.capsule_revealed_event = SimpleNamespace(get_logs=lambda **kw: events["revealed"])
+
+        result = service.sync_events()
+        assert result["success"] and result["capsules_created"] == 2 and result["capsules_revealed"] == 1, result
+        assert db.get_sync_status()['last_synced_block'] == 1600
+        capsule = db.get_capsule(200)
+        assert capsule['decrypted_story'] == "revealed in the same range"
+        assert (capsule['created_at'], capsule['revealed_at']) == (BLOCK_TIME_ORIGIN + 1501, BLOCK_TIME_ORIGIN + 1503)
+        assert db.get_capsule(201)['created_at'] == BLOCK_TIME_ORIGIN + 1502
+
+        # A reveal for an unknown capsule is reported, the rest of the range is stored
+        service.w3.eth.block_number = 1650
+        events["created"] = []
+        events["revealed"] = [make_event(300, 1620, plaintextStory="orphan")]
+        result = service.sync_events()
+        assert result["success"] and result["capsules_revealed"] == 0 and len(result["errors"]) == 1, result
+        assert db.get_sync_status()['last_synced_block'] == 1650
+
+        # If the logs or block headers cannot be fetched, the cursor must not move past the range
+        def failing_logs(**kw):
+            raise IOError("RPC unavailable")
+        def failing_headers(blocks):
+            raise BlockTimestampError("headers unavailable")
+        service.w3.eth.block_number = 1700
+        events["revealed"] = [make_event(201, 1690, plaintextStory="later")]
+        service.block_times = SimpleNamespace(get_timestamps=failing_headers)
+        assert not service.sync_events()["success"]
+        assert db.get_sync_status()['last_synced_block'] == 1650 and not db.get_capsule(201)['is_revealed']
+        service.capsule_created_event = SimpleNamespace(get_logs=failing_logs)
+        assert not service.sync_events()["success"]
+        assert db.get_sync_status()['last_synced_block'] == 1650
+        db.close()
+
+    print("✅ Batch apply test passed!")
+
+def test_block_timestamps():
+    """Test that block timestamps replace insert times and date reveals"""
+    print("\n🧪 Testing block timestamps...")
+
+    day_ago = int(time.time()) - 2 * 86400
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.insert_capsule(make_capsule(1))
+        db.insert_capsule(make_capsule(2, created_at=day_ago))
+        assert db.get_capsule(1)['created_at'] >= int(time.time()) - 5
+        assert db.get_capsule(2)['created_at'] == day_ago and db.get_stats()['recent_24h'] == 1
+
+        # A re-sync dates a capsule stored at insert time by its block; a write without a timestamp keeps it
+        db.apply_batch([make_capsule(1, created_at=day_ago - 60)], [], last_block=1)
+        db.insert_capsule(make_capsule(1))
+        assert db.get_capsule(1)['created_at'] == day_ago - 60
+        stats = db.get_stats()
+        assert stats['recent_24h'] == 0 and sum(bucket['created'] for bucket in stats['daily_created']) == 2, stats
+
+        db.apply_batch([], [dict(make_reveal(1, "old news"), revealed_at=day_ago), make_reveal(2, "fresh")],
+                       last_block=2)
+        assert db.get_capsule(1)['revealed_at'] == day_ago
+        assert db.get_capsule(2)['revealed_at'] >= int(time.time()) - 5
+        assert db.get_stats()['revealed_24h'] == 1
+        assert db.get_capsules()[0]['revealed_at'] is not None
+        db.close()
+
+        # Reveals stored before revealed_at existed are dated by their last update
+        if isinstance(db, CapsuleDatabase):
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute("DROP INDEX idx_capsules_revealed_at")
+                # Version 3 had no summary JSON triggers (they read revealed_at)
+                conn.execute("DROP TRIGGER capsules_json_insert")
+                conn.execute("DROP TRIGGER capsules_json_update")
+                conn.execute("ALTER TABLE capsules DROP COLUMN revealed_at")
+                conn.execute("UPDATE capsules SET updated_at = 1234")
+                conn.execute("PRAGMA user_version = 3")
+            db = CapsuleDatabase(db.db_path)
+            assert db.get_capsule(1)['revealed_at'] == db.get_capsule(2)['revealed_at'] == 1234
+            db.close()
+
+    print("✅ Block timestamp test passed!")
+
+def test_stats_counters():
+    """Test that counters follow inserts, re-inserts, reveals and deletes"""
+    print("\n🧪 Testing stats counters...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        for capsule_id in range(5):
+            db.insert_capsule(make_capsule(capsule_id))
+        db.insert_capsule(make_capsule(1))  # re-sync of an existing capsule
+        db.apply_batch([make_capsule(5)], [make_reveal(2, "hi")], last_block=10)
+
+        stats = db.get_stats()
+        assert (stats['total'], stats['revealed'], stats['unrevealed'], stats['recent_24h']) == (6, 1, 5, 6), stats
+        assert sum(bucket['created'] for bucket in stats['daily_created']) == 6
+        assert db.get_capsule_count() == 6 and db.get_sync_status()['total_capsules'] == 6
+
+        execute_sql(db, "DELETE FROM capsules WHERE id = 2")
+        execute_sql(db, "UPDATE capsules SET created_at = created_at - 10 * 86400 WHERE id = 3")
+        stats = db.get_stats()
+        assert (stats['total'], stats['revealed'], stats['recent_24h']) == (5, 0, 4), stats
+        assert sum(bucket['created'] for bucket in stats['daily_created']) == 4
+        db.close()
+
+        # Counters are rebuilt for databases created before they existed
+        if isinstance(db, CapsuleDatabase):
+            with sqlite3.connect(db.db_path) as conn:
+                conn.execute("UPDATE capsule_stats SET total = 0, revealed = 0")
+                conn.execute("PRAGMA user_version = 1")
+            db = CapsuleDatabase(db.db_path)
+            assert db.get_stats()['total'] == 5
+            db.close()
+
+    print("✅ Stats counters test passed!")
+
+def test_summary_projection():
+    """Test that list queries skip the ciphertext unless asked for"""
+    print("\n🧪 Testing summary projection...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.insert_capsule(make_capsule(1, title="Devcon memories"))
+
+        for rows in (db.get_capsules(), db.get_capsules(tag="art"), db.search_capsules("devcon"),
+                     db.get_capsules_by_creator(make_capsule(1)['creator']), db.get_recent_capsules()):
+            assert len(rows) == 1 and 'encrypted_story' not in rows[0] and rows[0]['title'] == "Devcon memories"
+
+        rows = db.get_capsules(columns=["title", "encrypted_story"])
+        assert set(rows[0]) == {"id", "title", "encrypted_story"} and rows[0]['encrypted_story'] == b"ciphertext"
+        assert db.get_capsule(1)['encrypted_story'] == b"ciphertext"
+        assert db.get_capsules(columns=["title; DROP TABLE capsules"]) == []
+        db.close()
+
+    print("✅ Summary projection test passed!")
+
+def expected_summary(row):
+    """API summary of a full capsule row, as app.format_capsule builds it"""
+    summary = {}
+    for field in SUMMARY_API_FIELDS:
+        value = row[CAPSULE_API_FIELDS[field]]
+        if field == "isRevealed":
+            value = bool(value)
+        elif field == "pixelatedImageCID":
+            value = value or ""
+        summary[field] = value
+    return summary
+
+def test_summary_json():
+    """Test that the summary JSON matches the row and follows inserts and reveals"""
+    print("\n🧪 Testing stored summary JSON...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = open_database(tmp_dir)
+        db.insert_capsule(make_capsule(1, title='Zürich "2025" \\ 🚀', tags="ethereum, art", pixelated_image_cid=None))
+        db.insert_capsule(make_capsule(2, pixelated_image_cid="bafypixel"))
+        db.apply_batch([make_capsule(3, reveal_time=int(time.time()) - 60)],
+                       [dict(make_reveal(2, "line one\nline \u00e9"), revealed_at=1_700_000_000)], last_block=1)
+
+        def stored(capsule_id):
+            return json.loads(db.get_capsule(capsule_id, columns=[SUMMARY_JSON_COLUMN])[SUMMARY_JSON_COLUMN])
+
+        for capsule_id in (1, 2, 3):
+            assert stored(capsule_id) == expected_summary(db.get_capsule(capsule_id)), capsule_id
+            assert list(stored(capsule_id)) == SUMMARY_API_FIELDS
+        assert stored(2)["isRevealed"] is True and stored(2)["decryptedStory"] == "line one\nline \u00e9"
+        assert stored(1)["isRevealed"] is False and stored(1)["pixelatedImageCID"] == ""
+
+        # Refreshed by reveals and re-syncs
+        assert db.reveal_capsule(1, "revealed", revealed_at=1_700_000_100) is True
+        db.apply_batch([make_capsule(3, title="Renamed", reveal_time=int(time.time()) - 60)], [], last_block=2)
+        assert stored(1)["decryptedStory"] == "revealed" and stored(1)["revealedAt"] == 1_700_000_100
+        assert stored(3)["title"] == "Renamed"
+
+        # Every list query can return it in place of the columns
+        columns = [SUMMARY_JSON_COLUMN]
+        for rows in (db.get_capsules(columns=columns), db.get_capsules(tag="art", columns=columns),
+                     db.search_capsules("capsule", columns=columns),
+                     db.get_capsules_by_creator(make_capsule(2)['creator'], columns=columns),
+                     db.get_recent_capsules(columns=columns), db.get_overdue_reveals(columns=columns)):
+            assert rows and all(json.loads(row[SUMMARY_JSON_COLUMN])["id"] == row["id"] for row in rows)
+        assert db.get_overdue_reveals(columns=columns)[0]["reveal_time"] is not None
+        db.close()
+
+        if not TEST_DATABASE_URL:
+            # Migration 7: databases whose update trigger could not restore a missing row
+            path = os.path.join(tmp_dir, "capsules.db")
+            with sqlite3.connect(path) as conn:
+                conn.execute("DROP TRIGGER capsules_json_update")
+                conn.execute("""
+                    CREATE TRIGGER capsules_json_update AFTER UPDATE ON capsules BEGIN
+                        UPDATE capsule_json SET summary_json = '{}' WHERE capsule_id = NEW.id;
+                    END
+                """)
+                conn.execute("DELETE FROM capsule_json WHERE capsule_id IN (1, 3)")
+                conn.execute("PRAGMA user_version = 6")
+            db = CapsuleDatabase(path)
+            assert stored(1) == expected_summary(db.get_capsule(1)) and stored(3)["title"] == "Renamed"
+            with db.get_connection() as conn:
+                conn.execute("DELETE FROM capsule_json WHERE capsule_id = 2")
+                conn.commit()
+            assert db.reveal_capsule(2, "again", revealed_at=1_700_000_200) is True
+            assert stored(2)["decryptedStory"] == "again"
+            db.close()
+
+    print("✅ Stored summary JSON test passed!")
+
+def test_payload_table():
+    """Test that SQLite keeps the ciphertext out of capsules rows, and the migration moving it"""
+    print("\n🧪 Testing capsule payload table...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        for capsule_id in range(1, 6):
+            db.insert_capsule(make_capsule(capsule_id, encrypted_story=bytes([capsule_id]) * 2000))
+        db.insert_capsule(make_capsule(3, encrypted_story=b"re-synced"))
+
+        with db.get_connection(readonly=True) as conn:
+            columns = [row['name'] for row in conn.execute("PRAGMA table_xinfo(capsules)")]
+            assert "encrypted_story" not in columns
+            assert conn.execute("SELECT COUNT(*) FROM capsule_payloads").fetchone()[0] == 5
+        assert db.get_capsule(2)['encrypted_story'] == b"\x02" * 2000
+        assert db.get_capsule(3)['encrypted_story'] == b"re-synced"
+        rows = db.get_capsules(tag="art", columns=["encrypted_story"], after_id=3)
+        assert [row['encrypted_story'] for row in rows] == [b"\x02" * 2000, b"\x01" * 2000]
+
+        execute_sql(db, "DELETE FROM capsules WHERE id = 5")
+        with db.get_connection(readonly=True) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM capsule_payloads WHERE capsule_id = 5").fetchone()[0] == 0
+        db.close()
+
+        # Databases with the ciphertext inline are rebuilt, keeping indexes, triggers and counters
+        with sqlite3.connect(db.db_path) as conn:
+            conn.execute("ALTER TABLE capsules ADD COLUMN encrypted_story BLOB NOT NULL DEFAULT x''")
+            conn.execute("""
+                UPDATE capsules SET encrypted_story =
+                    (SELECT encrypted_story FROM capsule_payloads WHERE capsule_id = capsules.id)
+            """)
+            conn.execute("DROP TABLE capsule_payloads")
+            conn.execute("PRAGMA user_version = 4")
+            schema = sorted(conn.execute(
+                "SELECT type, name FROM sqlite_master WHERE tbl_name = 'capsules' AND sql IS NOT NULL"
+            ).fetchall())
+
+        db = CapsuleDatabase(db.db_path)
+        with db.get_connection(readonly=True) as conn:
+            columns = [row['name'] for row in conn.execute("PRAGMA table_xinfo(capsules)")]
+            assert "encrypted_story" not in columns and "creator_lc" in columns
+            assert sorted(tuple(row) for row in conn.execute(
+                "SELECT type, name FROM sqlite_master WHERE tbl_name = 'capsules' AND sql IS NOT NULL"
+            )) == schema
+        assert db.get_capsule(2)['encrypted_story'] == b"\x02" * 2000
+        assert db.get_capsule(3)['encrypted_story'] == b"re-synced"
+        assert db.get_stats()['total'] == 4 and db.get_capsule_count() == 4
+        assert [row['id'] for row in db.get_capsules_by_creator(make_capsule(2)['creator'].upper())] == [2]
+        assert len(db.search_capsules("capsule")) == 4
+
+        # Triggers keep working on the rebuilt table
+        db.insert_capsule(make_capsule(9))
+        execute_sql(db, "DELETE FROM capsules WHERE id = 1")
+        assert db.get_stats()['total'] == 4
+        with db.get_connection(readonly=True) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM capsule_payloads").fetchone()[0] == 4
+        db.close()
+
+    print("✅ Capsule payload table test passed!")
+
+def main():
+    """Run all tests"""
+    print("🗄️ Testing Capsule Database")
+    print("=" * 50)
+
+    try:
+        test_connection_pool()
+        test_reads_during_writes()
+        test_tag_index()
+        test_full_text_search()
+        test_search_windows()
+        test_keyset_pagination()
+        test_creator_listing()
+        test_reveal_windows()
+        test_reveal_capsule()
+        test_apply_batch()
+        test_block_timestamps()
+        test_stats_counters()
+        test_summary_projection()
+        test_summary_json()
+        test_payload_table()
+
+        print("\n🎉 All database tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
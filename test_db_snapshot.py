@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Test script for database snapshots:
+- Snapshot and restore round trip through blob storage
+- Restore only replaces a database that is further behind
+- Checksum, integrity and schema version verification
+- Retention of the newest snapshots
+"""
+
+import sys
+import os
+import json
+import hashlib
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase, SCHEMA_VERSION
+from blob_storage import LocalBlobStorage
+from db_snapshot import (DatabaseSnapshotter, SnapshotError, restore_snapshot, read_manifest,
+                         SNAPSHOT_NAMESPACE, MANIFEST_KEY)
+from test_database import make_capsule, make_reveal
+
+def synced_database(path, capsules=20, last_block=500):
+    db = CapsuleDatabase(path)
+    db.apply_batch([make_capsule(capsule_id) for capsule_id in range(capsules)],
+                   [make_reveal(0, "revealed story")], last_block=last_block)
+    return db
+
+def test_snapshot_round_trip():
+    """Test that a restored snapshot holds the capsules and sync position"""
+    print("🧪 Testing snapshot round trip...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        db = synced_database(os.path.join(tmp_dir, "source.db"))
+
+        manifest = DatabaseSnapshotter(db, storage).create_snapshot()
+        assert manifest["last_synced_block"] == 500 and manifest["total_capsules"] == 20
+        assert manifest["schema_version"] == SCHEMA_VERSION
+        assert manifest["compressed_size"] < manifest["size"]
+        assert storage.exists(SNAPSHOT_NAMESPACE, manifest["key"])
+        assert read_manifest(storage) == manifest
+        db.close()
+
+        restored_path = os.path.join(tmp_dir, "restored.db")
+        assert restore_snapshot(restored_path, storage) == manifest
+
+        restored = CapsuleDatabase(restored_path)
+        assert restored.get_sync_status()["last_synced_block"] == 500
+        assert restored.get_capsule_count() == 20
+        assert restored.get_capsule(0)["decrypted_story"] == "revealed story"
+        assert len(restored.search_capsules("capsule")) == 10
+        assert restored.get_stats()["revealed"] == 1
+        restored.close()
+
+    print("✅ Snapshot round trip test passed!")
+
+def test_restore_only_when_behind():
+    """Test that a local database at or past the snapshot's block is kept"""
+    print("\n🧪 Testing restore decision...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        assert restore_snapshot(os.path.join(tmp_dir, "none.db"), storage) is None
+
+        db = synced_database(os.path.join(tmp_dir, "source.db"))
+        DatabaseSnapshotter(db, storage).create_snapshot()
+        db.close()
+
+        ahead_path = os.path.join(tmp_dir, "ahead.db")
+        synced_database(ahead_path, capsules=25, last_block=900).close()
+        assert restore_snapshot(ahead_path, storage) is None
+        ahead = CapsuleDatabase(ahead_path)
+        assert ahead.get_capsule_count() == 25
+        ahead.close()
+
+        behind_path = os.path.join(tmp_dir, "behind.db")
+        behind = synced_database(behind_path, capsules=5, last_block=100)
+        behind.close()
+        assert restore_snapshot(behind_path, storage)["last_synced_block"] == 500
+        assert not os.path.exists(behind_path + "-wal")
+        behind = CapsuleDatabase(behind_path)
+        assert behind.get_capsule_count() == 20
+        behind.close()
+
+    print("✅ Restore decision test passed!")
+
+def test_snapshot_verification():
+    """Test that corrupt, mismatched and newer-schema snapshots are rejected"""
+    print("\n🧪 Testing snapshot verification...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        db = synced_database(os.path.join(tmp_dir, "source.db"))
+        manifest = DatabaseSnapshotter(db, storage).create_snapshot()
+        db.close()
+
+        local_path = os.path.join(tmp_dir, "local.db")
+        synced_database(local_path, capsules=3, last_block=10).close()
+
+        def expect_rejected(fragment):
+            try:
+                restore_snapshot(local_path, storage)
+                assert False, "snapshot should be rejected"
+            except SnapshotError as e:
+                assert fragment in str(e), e
+            # The local database is left as it was
+            local = CapsuleDatabase(local_path)
+            assert local.get_capsule_count() == 3
+            local.close()
+
+        original = storage.get(SNAPSHOT_NAMESPACE, manifest["key"])
+        storage.put(SNAPSHOT_NAMESPACE, manifest["key"], original[:-10] + b"0" * 10)
+        expect_rejected("sha256")
+
+        # A checksum that matches garbage still fails decompression / the integrity check
+        storage.put(SNAPSHOT_NAMESPACE, manifest["key"], b"not a gzip file")
+        forged = dict(manifest, sha256=hashlib.sha256(b"not a gzip file").hexdigest())
+        storage.put(SNAPSHOT_NAMESPACE, MANIFEST_KEY, json.dumps(forged).encode())
+        expect_rejected("unreadable")
+
+        storage.put(SNAPSHOT_NAMESPACE, manifest["key"], original)
+        storage.put(SNAPSHOT_NAMESPACE, MANIFEST_KEY,
+                    json.dumps(dict(manifest, schema_version=SCHEMA_VERSION + 1)).encode())
+        expect_rejected("newer")
+
+        storage.delete(SNAPSHOT_NAMESPACE, manifest["key"])
+        storage.put(SNAPSHOT_NAMESPACE, MANIFEST_KEY, json.dumps(manifest).encode())
+        expect_rejected("missing")
+
+    print("✅ Snapshot verification test passed!")
+
+def test_snapshot_retention():
+    """Test periodic snapshots: skipped while the sync has not advanced, oldest pruned"""
+    print("\n🧪 Testing snapshot retention...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = LocalBlobStorage(os.path.join(tmp_dir, "blobs"))
+        db = synced_database(os.path.join(tmp_dir, "source.db"))
+        snapshotter = DatabaseSnapshotter(db, storage, keep=2)
+
+        keys = [snapshotter.snapshot_if_changed()["key"]]
+        assert snapshotter.snapshot_if_changed() is None
+        for capsule_id, block in ((20, 600), (21, 700)):
+            db.apply_batch([make_capsule(capsule_id)], [], last_block=block)
+            keys.append(snapshotter.snapshot_if_changed()["key"])
+
+        manifest = read_manifest(storage)
+        assert manifest["last_synced_block"] == 700 and manifest["total_capsules"] == 22
+        assert manifest["snapshots"] == [keys[2], keys[1]]
+        assert not storage.exists(SNAPSHOT_NAMESPACE, keys[0])
+        assert all(storage.exists(SNAPSHOT_NAMESPACE, key) for key in keys[1:])
+        db.close()
+
+    print("✅ Snapshot retention test passed!")
+
+def main():
+    """Run all tests"""
+    print("📸 Testing Database Snapshots")
+    print("=" * 50)
+
+    try:
+        test_snapshot_round_trip()
+        test_restore_only_when_behind()
+        test_snapshot_verification()
+        test_snapshot_retention()
+
+        print("\n🎉 All database snapshot tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Test script for the single database writer thread:
+- Concurrent writes are grouped into shared transactions
+- A failing write is rolled back alone (savepoints)
+- Futures resolve after the commit; a failed commit fails the whole group
+- Closing drains the queue
+- A writer thread that dies fails every pending write and rejects new ones
+- Sync and request threads writing through CapsuleDatabase never see lock errors
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from db_writer import DatabaseWriter
+from test_database import make_capsule, make_reveal
+
+def counter_database(tmp_dir, busy_timeout=5.0):
+    path = os.path.join(tmp_dir, "writer.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    return path, lambda: sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+
+def insert_item(item_id, value="x"):
+    def write(conn):
+        conn.execute("INSERT INTO items (id, value) VALUES (?, ?)", (item_id, value))
+        return item_id
+    return write
+
+def count_items(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_group_commit():
+    """Test that concurrent writes share transactions and resolve to their results"""
+    print("🧪 Testing group commit...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path, connect = counter_database(tmp_dir)
+        writer = DatabaseWriter(connect, group_commit_ms=20)
+
+        futures = [writer.submit(insert_item(item_id)) for item_id in range(200)]
+        assert [future.result(timeout=10) for future in futures] == list(range(200))
+        assert count_items(path) == 200
+
+        stats = writer.stats()
+        assert stats["writes"] == 200
+        assert stats["commits"] < 20, stats
+        assert stats["largest_group"] > 1
+
+        # Blocking writes from many threads
+        results = []
+        def worker(start):
+            for item_id in range(start, start + 25):
+                results.append(writer.execute(insert_item(item_id)))
+        threads = [threading.Thread(target=worker, args=(1000 + n * 25,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(results) == list(range(1000, 1200))
+        assert count_items(path) == 400
+
+        writer.close()
+
+    print("✅ Group commit test passed!")
+
+def test_failing_write_isolated():
+    """Test that a failing write is rolled back alone and its future raises"""
+    print("\n🧪 Testing savepoint isolation...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path, connect = counter_database(tmp_dir)
+        writer = DatabaseWriter(connect, group_commit_ms=50)
+
+        def half_written_then_fail(conn):
+            conn.execute("INSERT INTO items (id, value) VALUES (100, 'partial')")
+            conn.execute("INSERT INTO items (id, value) VALUES (1, 'duplicate')")
+
+        futures = [writer.submit(insert_item(1)), writer.submit(half_written_then_fail),
+                   writer.submit(insert_item(2))]
+        assert futures[0].result(timeout=10) == 1
+        try:
+            futures[1].result(timeout=10)
+            assert False, "duplicate key should fail"
+        except sqlite3.IntegrityError:
+            pass
+        assert futures[2].result(timeout=10) == 2
+        assert writer.stats()["commits"] == 1
+
+        conn = sqlite3.connect(path)
+        assert [row[0] for row in conn.execute("SELECT id FROM items ORDER BY id")] == [1, 2]
+        conn.close()
+
+        # Write functions cannot wait on the writer from inside it
+        try:
+            writer.execute(lambda conn: writer.execute(insert_item(3)))
+            assert False, "nested write should fail"
+        except RuntimeError:
+            pass
+
+        writer.close()
+
+    print("✅ Savepoint isolation test passed!")
+
+def test_failed_commit():
+    """Test that a group that cannot take the write lock fails every future"""
+    print("\n🧪 Testing failed group commit...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path, connect = counter_database(tmp_dir, busy_timeout=0.05)
+        writer = DatabaseWriter(connect, group_commit_ms=50)
+
+        blocker = sqlite3.connect(path)
+        blocker.execute("BEGIN IMMEDIATE")
+        futures = [writer.submit(insert_item(item_id)) for item_id in range(3)]
+        for future in futures:
+            try:
+                future.result(timeout=10)
+                assert False, "write should fail while the lock is held"
+            except sqlite3.OperationalError as e:
+                assert "locked" in str(e)
+        blocker.rollback()
+        blocker.close()
+
+        # The writer recovers once the lock is free
+        assert writer.execute(insert_item(7)) == 7
+        assert count_items(path) == 1
+        writer.close()
+
+    print("✅ Failed group commit test passed!")
+
+def test_close_drains_queue():
+    """Test that close() writes everything queued before it and rejects later writes"""
+    print("\n🧪 Testing writer shutdown...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path, connect = counter_database(tmp_dir)
+        writer = DatabaseWriter(connect, group_commit_ms=5, max_batch=10)
+
+        futures = [writer.submit(insert_item(item_id)) for item_id in range(95)]
+        writer.close()
+        assert all(future.done() and not future.exception() for future in futures)
+        assert count_items(path) == 95
+
+        try:
+            writer.submit(insert_item(200))
+            assert False, "closed writer accepted a write"
+        except RuntimeError:
+            pass
+        writer.close()
+
+    print("✅ Writer shutdown test passed!")
+
+class BrokenConnection(sqlite3.Connection):
+    """Connection whose commit and rollback fail, as on a failing disk"""
+    def commit(self):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    def rollback(self):
+        raise sqlite3.OperationalError("disk I/O error")
+
+def test_writer_thread_failure():
+    """Test that a writer thread that dies fails queued writes instead of leaving them waiting"""
+    print("\n🧪 Testing writer thread failure...")
+
+    def failing_connect():
+        raise sqlite3.OperationalError("database is locked")
+
+    writer = DatabaseWriter(failing_connect)
+    try:
+        writer.execute(insert_item(1), timeout=10)
+        assert False, "write should fail when the writer cannot connect"
+    except sqlite3.OperationalError as e:
+        assert "locked" in str(e)
+    except RuntimeError as e:
+        # Submitted after the thread had already stopped
+        assert "locked" in str(e)
+    try:
+        writer.submit(insert_item(2))
+        assert False, "stopped writer accepted a write"
+    except RuntimeError as e:
+        assert "stopped" in str(e)
+    writer.close()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The rollback after a failed commit raises: the in-flight and the queued writes fail
+        path, _ = counter_database(tmp_dir)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_write(conn):
+            started.set()
+            release.wait(10)
+
+        writer = DatabaseWriter(lambda: sqlite3.connect(path, factory=BrokenConnection, check_same_thread=False),
+                                max_batch=1)
+        futures = [writer.submit(blocking_write)]
+        started.wait(10)
+        futures += [writer.submit(insert_item(item_id)) for item_id in range(5)]
+        release.set()
+        for future in futures:
+            assert isinstance(future.exception(timeout=10), sqlite3.OperationalError)
+        writer.close()
+
+        # CapsuleDatabase reports the failure instead of blocking
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        db.writer.close()
+        db.writer = DatabaseWriter(failing_connect)
+        assert db.insert_capsule(make_capsule(1)) is False
+        assert db.apply_batch([make_capsule(2)], [], last_block=1) is None
+        db.close()
+
+    print("✅ Writer thread failure test passed!")
+
+def test_concurrent_database_writers():
+    """Test that a sync thread and request threads write through CapsuleDatabase without lock errors"""
+    print("\n🧪 Testing concurrent CapsuleDatabase writers...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"), busy_timeout_ms=100)
+        failures = []
+
+        def sync_thread():
+            for block in range(50):
+                created = [make_capsule(block * 4 + n) for n in range(4)]
+                if db.apply_batch(created, [make_reveal(block * 4, "story")], last_block=block) is None:
+                    failures.append(f"batch {block}")
+
+        def request_thread(offset):
+            for capsule_id in range(offset, offset + 50):
+                if not db.insert_capsule(make_capsule(capsule_id)):
+                    failures.append(f"insert {capsule_id}")
+                if db.update_sync_status(0, 0) is not True:
+                    failures.append("sync status")
+
+        threads = [threading.Thread(target=sync_thread)] + \
+                  [threading.Thread(target=request_thread, args=(1000 + n * 50,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not failures, failures[:5]
+        assert db.get_capsule_count() == 400
+        assert db.get_stats()["revealed"] == 50
+        assert db.writer.stats()["commits"] < db.writer.stats()["writes"]
+        db.close()
+
+    print("✅ Concurrent writer test passed!")
+
+def main():
+    """Run all tests"""
+    print("✍️  Testing Database Writer")
+    print("=" * 50)
+
+    try:
+        test_group_commit()
+        test_failing_write_isolated()
+        test_failed_commit()
+        test_close_drains_queue()
+        test_writer_thread_failure()
+        test_concurrent_database_writers()
+
+        print("\n🎉 All database writer tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
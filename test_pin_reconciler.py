@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Test script for the Pinata pin reconciler against a local stand-in Pinata API:
+- Paged pin listing
+- Re-pinning missing content from blob storage
+- Reporting content missing locally and local-only CIDs
+- Background passes with their status in blob storage, one at a time
+"""
+
+import sys
+import os
+import json
+import hashlib
+import time
+import tempfile
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from blob_storage import LocalBlobStorage
+from pin_reconciler import PinataClient, PinReconciler, STATUS_NAMESPACE, STATUS_KEY
+from test_database import make_capsule
+
+def fake_cid(data):
+    """Deterministic CID used by the stand-in Pinata API"""
+    return "bafkrei" + hashlib.sha256(data).hexdigest()[:52]
+
+class StandInPinata(BaseHTTPRequestHandler):
+    """Implements the V2 pinList and pinFileToIPFS endpoints in memory"""
+    pinned = []
+    list_requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/data/pinList":
+            self.send_error(404)
+            return
+        StandInPinata.list_requests += 1
+        query = parse_qs(url.query)
+        limit = int(query["pageLimit"][0])
+        offset = int(query["pageOffset"][0])
+        rows = [{"ipfs_pin_hash": cid} for cid in self.pinned[offset:offset + limit]]
+        self._send_json({"count": len(self.pinned), "rows": rows})
+
+    def do_POST(self):
+        if self.path != "/pinning/pinFileToIPFS":
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        message = BytesParser().parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+        file_bytes = next(part.get_payload(decode=True) for part in message.get_payload()
+                          if part.get_param("name", header="content-disposition") == "file")
+        cid = fake_cid(file_bytes)
+        self.pinned.append(cid)
+        self._send_json({"IpfsHash": cid})
+
+def test_reconcile_against_stand_in():
+    """Test a full reconciliation pass"""
+    print("🧪 Testing pin reconciliation against stand-in Pinata...")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInPinata)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+            storage = LocalBlobStorage(tmp_dir)
+
+            blobs = {name: os.urandom(2048) for name in ("pinned", "unpinned", "lost")}
+            cids = {name: fake_cid(data) for name, data in blobs.items()}
+            local_cid = "Qm" + hashlib.sha256(b"local").hexdigest()[:44]
+
+            # Already pinned, plus enough filler pins to need several pages
+            StandInPinata.pinned = [cids["pinned"]] + [f"bafkreifiller{i}" for i in range(25)]
+            storage.put("ipfs", cids["unpinned"], blobs["unpinned"])
+
+            db.insert_capsule(make_capsule(1, image_cid=cids["pinned"], pixelated_image_cid=cids["unpinned"]))
+            db.insert_capsule(make_capsule(2, image_cid=cids["lost"]))
+            db.insert_capsule(make_capsule(3, image_cid=local_cid))
+
+            pinata = PinataClient("v2", api_key="key", secret_api_key="secret",
+                                  api_base=f"http://127.0.0.1:{server.server_port}", page_size=10)
+            reconciler = PinReconciler(db, storage, pinata, max_workers=2)
+
+            dry_report = reconciler.reconcile(dry_run=True)
+            assert dry_report["missing"] == 3, dry_report
+            assert dry_report["repinned"] == []
+            assert StandInPinata.list_requests == 3, "26 pins with page size 10 should take 3 list requests"
+
+            report = reconciler.reconcile()
+            print(json.dumps(report, indent=2))
+            assert report["repinned"] == [cids["unpinned"]]
+            assert [entry["cid"] for entry in report["missing_locally"]] == [cids["lost"]]
+            assert report["missing_locally"][0]["capsule_ids"] == [2]
+            assert [entry["cid"] for entry in report["local_only"]] == [local_cid]
+            assert report["errors"] == []
+
+            # Second pass: only the unrecoverable CIDs remain missing
+            assert reconciler.reconcile(dry_run=True)["missing"] == 2
+    finally:
+        server.shutdown()
+
+    print("✅ Pin reconciliation test passed!")
+
+def test_background_pass():
+    """Test start()/status() and that only one pass runs at a time"""
+    print("\n🧪 Testing background reconciliation...")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInPinata)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+            storage = LocalBlobStorage(tmp_dir)
+            data = os.urandom(2048)
+            StandInPinata.pinned = []
+            storage.put("ipfs", fake_cid(data), data)
+            db.insert_capsule(make_capsule(1, image_cid=fake_cid(data)))
+
+            pinata = PinataClient("v2", api_key="key", secret_api_key="secret",
+                                  api_base=f"http://127.0.0.1:{server.server_port}")
+            reconciler = PinReconciler(db, storage, pinata)
+            assert reconciler.status() is None
+
+            # Held lock: a pass is running in this process
+            reconciler._lock.acquire()
+            assert reconciler.start() is None
+            reconciler._lock.release()
+
+            # Another worker's pass, marked running in blob storage
+            storage.put(STATUS_NAMESPACE, STATUS_KEY,
+                        json.dumps({"running": True, "started_at": int(time.time())}).encode())
+            assert reconciler.start() is None
+            # ... unless it is stale
+            storage.put(STATUS_NAMESPACE, STATUS_KEY,
+                        json.dumps({"running": True, "started_at": 0}).encode())
+
+            status = reconciler.start(max_workers=2)
+            assert status["running"] and status["report"] is None
+            deadline = time.time() + 10
+            while reconciler.status()["running"]:
+                assert time.time() < deadline, "Background pass did not finish"
+                time.sleep(0.05)
+
+            # A second instance (another worker) reads the same status
+            status = PinReconciler(db, storage, pinata).status()
+            assert status["error"] is None and status["finished_at"] is not None
+            assert status["report"]["repinned"] == [fake_cid(data)], status
+            assert StandInPinata.pinned == [fake_cid(data)]
+            db.close()
+    finally:
+        server.shutdown()
+
+    print("✅ Background reconciliation test passed!")
+
+def main():
+    """Run all tests"""
+    print("📌 Testing Pin Reconciliation")
+    print("=" * 50)
+
+    try:
+        test_reconcile_against_stand_in()
+        test_background_pass()
+        print("\n🎉 All pin reconciliation tests passed!")
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
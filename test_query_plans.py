@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for query instrumentation and query plans:
+- Hot queries (listing, tag filter, creator, reveal windows, reveal lookup) keep using their indexes
+- Per-statement latency histograms and error counts
+- Slow-query log with EXPLAIN QUERY PLAN
+"""
+
+import sys
+import os
+import logging
+import sqlite3
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from query_stats import QueryStats, LATENCY_BUCKETS_MS
+from test_database import make_capsule, make_reveal
+
+CREATOR = f"0x{1:040x}"
+
+# (name, call, plan line every statement of the call must contain somewhere)
+# Besides the required line, no statement may full-scan a table or sort in
+# a temp B-tree; the plain listing is allowed its SCAN because it walks the
+# rowid in ORDER BY order and stops at LIMIT.
+HOT_QUERIES = [
+    ("listing", lambda db: db.get_capsules(limit=12), None),
+    ("listing after cursor", lambda db: db.get_capsules(limit=12, after_id=30), "USING INTEGER PRIMARY KEY (rowid<?)"),
+    ("tag filter", lambda db: db.get_capsules(tag="art"), "USING PRIMARY KEY (tag=?)"),
+    ("tag filter after cursor", lambda db: db.get_capsules(tag="art", after_id=20),
+     "USING PRIMARY KEY (tag=? AND capsule_id<?)"),
+    ("creator", lambda db: db.get_capsules_by_creator(CREATOR.upper()), "USING INDEX idx_capsules_creator_lc (creator_lc=?"),
+    ("creator after cursor", lambda db: db.get_capsules_by_creator(CREATOR, after_id=20),
+     "USING INDEX idx_capsules_creator_lc (creator_lc=? AND id<?)"),
+    ("creator count", lambda db: db.get_creator_count(CREATOR), "INDEX idx_capsules_creator_lc (creator_lc=?)"),
+    ("upcoming reveals", lambda db: db.get_upcoming_reveals(hours=48),
+     "USING INDEX idx_capsules_reveal (is_revealed=? AND reveal_time>? AND reveal_time<?)"),
+    ("overdue reveals", lambda db: db.get_overdue_reveals(after=[0, 5]),
+     "USING INDEX idx_capsules_reveal (is_revealed=? AND reveal_time>? AND reveal_time<?)"),
+    ("capsule lookup", lambda db: db.get_capsule(3), "USING INTEGER PRIMARY KEY (rowid=?)"),
+    ("reveal", lambda db: db.reveal_capsule(3, "story"), "USING INTEGER PRIMARY KEY (rowid=?)"),
+    ("batch reveal", lambda db: db.apply_batch([], [make_reveal(4, "story")], last_block=1),
+     "USING INTEGER PRIMARY KEY (rowid=?)"),
+    ("recent", lambda db: db.get_recent_capsules(), "USING INDEX idx_capsules_created_at"),
+    ("stats", lambda db: db.get_stats(), "USING INTEGER PRIMARY KEY"),
+]
+
+FULL_SCAN_ALLOWED = {"listing"}
+
+def seeded_database(tmp_dir, **kwargs):
+    db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"), **kwargs)
+    for capsule_id in range(50):
+        db.insert_capsule(make_capsule(capsule_id, creator=f"0x{capsule_id % 3:040x}"))
+    return db
+
+def query_plans(db, call):
+    """EXPLAIN QUERY PLAN lines of every data statement the call runs"""
+    with db.query_stats.capture() as statements:
+        call(db)
+    plans = []
+    with db.get_connection(readonly=True) as conn:
+        for sql, parameters in statements:
+            if sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+                plans.append((" ".join(sql.split()), conn.explain(sql, parameters)))
+    return plans
+
+def test_hot_query_plans():
+    """Test that hot queries are answered from indexes"""
+    print("🧪 Testing hot query plans...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = seeded_database(tmp_dir)
+
+        for name, call, required in HOT_QUERIES:
+            plans = query_plans(db, call)
+            assert plans, f"{name}: no statements captured"
+            for sql, plan in plans:
+                report = f"{name}: {sql}\n  " + "\n  ".join(plan)
+                assert not any("TEMP B-TREE" in line for line in plan), report
+                if name not in FULL_SCAN_ALLOWED:
+                    assert not any(line.startswith("SCAN") for line in plan), report
+            if required:
+                assert any(required in line for _, plan in plans for line in plan), \
+                    f"{name}: expected '{required}' in\n" + "\n".join(str(plan) for _, plan in plans)
+            print(f"   ✓ {name}")
+        db.close()
+
+    print("✅ Hot query plan test passed!")
+
+def test_latency_histograms():
+    """Test per-statement counts, histograms and error counts"""
+    print("\n🧪 Testing latency histograms...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = seeded_database(tmp_dir)
+        db.query_stats.reset()
+
+        for _ in range(5):
+            db.get_capsules(limit=5)
+        with db.get_connection(readonly=True) as conn:
+            try:
+                conn.execute("SELECT * FROM no_such_table")
+                assert False, "query should fail"
+            except sqlite3.OperationalError:
+                pass
+
+        stats = {row["statement"]: row for row in db.query_stats.snapshot()}
+        listing = next(row for statement, row in stats.items() if "ORDER BY c.id DESC" in statement)
+        assert listing["count"] == 5 and listing["errors"] == 0
+        assert sum(listing["histogram"].values()) == 5
+        assert len(listing["histogram"]) == len(LATENCY_BUCKETS_MS) + 1
+        assert listing["max_ms"] >= listing["mean_ms"] > 0
+        assert stats["SELECT * FROM no_such_table"]["errors"] == 1
+
+        # Most expensive statements first
+        totals = [row["total_ms"] for row in db.query_stats.snapshot()]
+        assert totals == sorted(totals, reverse=True)
+        assert len(db.query_stats.snapshot(limit=1)) == 1
+
+        db.query_stats.reset()
+        assert db.query_stats.snapshot() == []
+        db.close()
+
+    stats = QueryStats(slow_query_ms=10)
+    for elapsed_ms in (0.05, 0.3, 7, 2000):
+        stats.record("SELECT 1", elapsed_ms)
+    row = stats.snapshot()[0]
+    assert row["histogram"]["<=0.1ms"] == 1 and row["histogram"]["<=0.5ms"] == 1
+    assert row["histogram"]["<=10ms"] == 1 and row["histogram"][">1000ms"] == 1
+    assert row["slow"] == 1
+
+    print("✅ Latency histogram test passed!")
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def test_slow_query_log():
+    """Test that slow statements are logged once per interval with their query plan"""
+    print("\n🧪 Testing slow query log...")
+
+    handler = ListHandler()
+    logging.getLogger("query_stats").addHandler(handler)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = seeded_database(tmp_dir, slow_query_ms=0)
+            handler.messages.clear()
+
+            db.get_capsules_by_creator(CREATOR)
+            db.get_capsules_by_creator(CREATOR)
+            slow = [message for message in handler.messages if "FROM capsules c WHERE creator" in message]
+            assert len(slow) == 1, slow
+            assert slow[0].startswith("Slow query (")
+            assert "idx_capsules_creator" in slow[0]
+            db.close()
+
+            # Below the threshold nothing is logged
+            db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"), slow_query_ms=10_000)
+            handler.messages.clear()
+            db.get_capsules_by_creator(CREATOR)
+            assert handler.messages == []
+            db.close()
+    finally:
+        logging.getLogger("query_stats").removeHandler(handler)
+
+    print("✅ Slow query log test passed!")
+
+def main():
+    """Run all tests"""
+    print("📈 Testing Query Instrumentation and Plans")
+    print("=" * 50)
+
+    try:
+        test_hot_query_plans()
+        test_latency_histograms()
+        test_slow_query_log()
+
+        print("\n🎉 All query plan tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory capsule read model:
+- Same list, tag, cursor and creator results (and counts) as the database
+- Incremental updates from sync batches (new capsules, re-syncs, reveals)
+- Sync service integration
+"""
+
+import sys
+import os
+import tempfile
+from types import SimpleNamespace
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from database import CapsuleDatabase
+from read_model import CapsuleReadModel
+from blockchain_sync_events import EventBasedBlockchainSyncService
+from test_database import make_capsule, make_reveal, make_event, created_event, fake_block_times
+
+QUERIES = [
+    {},
+    {"limit": 4},
+    {"limit": 4, "offset": 3},
+    {"limit": 4, "after_id": 17},
+    {"limit": 3, "revealed_only": True},
+    {"limit": 3, "revealed_only": True, "offset": 2},
+    {"limit": 3, "revealed_only": True, "after_id": 10},
+    {"limit": 5, "tag": " ART "},
+    {"limit": 2, "tag": "devcon", "after_id": 12},
+    {"limit": 5, "tag": "unknown"},
+    {"limit": 5, "columns": ["title", "is_revealed"]},
+    {"limit": 4, "offset": 100},
+    {"limit": 0},
+    {"limit": 0, "revealed_only": True}
+]
+
+def seeded_database(tmp_dir):
+    db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+    for capsule_id in range(20):
+        db.insert_capsule(make_capsule(capsule_id, creator=f"0x{capsule_id % 3 + 9:040X}",
+                                       tags="Art, Devcon" if capsule_id % 4 == 0 else "Art" if capsule_id % 2 else "Devcon"))
+    db.apply_batch([], [make_reveal(capsule_id, f"story {capsule_id}") for capsule_id in (2, 5, 9, 13, 18)],
+                   last_block=1)
+    return db
+
+def normalized(rows):
+    # SQLite stores is_revealed as 0/1, the model as bool
+    return [{**row, **({'is_revealed': bool(row['is_revealed'])} if 'is_revealed' in row else {})} for row in rows]
+
+def without_timestamps(rows):
+    # Timestamps without a block time are stamped independently by each side
+    return [{k: v for k, v in row.items() if k not in ("created_at", "updated_at", "revealed_at")}
+            for row in normalized(rows)]
+
+def test_matches_database():
+    """Test that the model answers list queries exactly like the database"""
+    print("🧪 Testing read model against the database...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = seeded_database(tmp_dir)
+        model = CapsuleReadModel()
+        assert model.load(db, page_size=7) == 20
+
+        for query in QUERIES:
+            assert normalized(model.get_capsules(**query)) == normalized(db.get_capsules(**query)), query
+        for creator, count in ((f"0x{10:040x}", 7), (f"0X{11:040X}", 6), ("0xnobody", 0)):
+            for after_id in (None, 13):
+                assert normalized(model.get_capsules_by_creator(creator, limit=3, after_id=after_id)) == \
+                    normalized(db.get_capsules_by_creator(creator, limit=3, after_id=after_id))
+            assert model.get_creator_count(creator) == db.get_creator_count(creator) == count
+
+        assert model.get_capsule_count() == db.get_capsule_count() == 20
+        assert model.get_revealed_count() == db.get_stats()['revealed'] == 5
+        assert model.get_tag_count("ART") == len(db.get_capsules(tag="art", limit=100))
+        assert model.covers(["title", "tags"]) and not model.covers(["encrypted_story"])
+        assert model.memory_usage() > 0
+        db.close()
+
+    print("✅ Database parity test passed!")
+
+def test_incremental_updates():
+    """Test that applied batches keep the model equal to the database"""
+    print("\n🧪 Testing incremental updates...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = seeded_database(tmp_dir)
+        model = CapsuleReadModel()
+        model.load(db)
+
+        batches = [
+            ([make_capsule(20, tags="Party"), make_capsule(21)], [make_reveal(20, "same batch")]),
+            ([make_capsule(3, tags="Party, The Merge", title="Re-synced")], [make_reveal(3, "later"), make_reveal(99, "x")]),
+            ([make_capsule(15, tags="")], [])
+        ]
+        for created, revealed in batches:
+            assert db.apply_batch(created, revealed, last_block=2) is not None
+            model.apply_batch(created, revealed)
+
+        for query in QUERIES + [{"tag": "party"}, {"tag": "the merge"}, {"tag": "art", "limit": 50}]:
+            assert without_timestamps(model.get_capsules(**query)) == without_timestamps(db.get_capsules(**query)), query
+        assert model.get_capsule_count() == 22 and model.get_revealed_count() == 7
+        db.close()
+
+    print("✅ Incremental update test passed!")
+
+def test_sync_updates_model():
+    """Test that the sync service applies each committed batch to the model"""
+    print("\n🧪 Testing sync integration...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = CapsuleDatabase(os.path.join(tmp_dir, "capsules.db"))
+        model = CapsuleReadModel()
+        model.load(db)
+
+        service = object.__new__(EventBasedBlockchainSyncService)
+        events = {
+            "created": [created_event(1, 101), created_event(2, 102)],
+            "revealed": [make_event(1, 103, plaintextStory="hello")]
+        }
+        service.db = db
+        service.read_model = model
+        service.start_block = 0
+        service._batch_size = 1000
+        service.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=200))
+        service.block_times = fake_block_times()
+        service.capsule_created_event = SimpleNamespace(get_logs=lambda **kw: events["created"])
+        service.capsule_revealed_event = SimpleNamespace(get_logs=lambda **kw: events["revealed"])
+
+        assert service.sync_events()["success"]
+        assert [c['id'] for c in model.get_capsules()] == [2, 1]
+        assert model.get_capsules(revealed_only=True)[0]['decrypted_story'] == "hello"
+
+        # A batch that fails to commit must not reach the model
+        db.apply_batch = lambda *args, **kwargs: None
+        events["created"] = [created_event(3, 201)]
+        service.w3.eth.block_number = 300
+        assert not service.sync_events()["success"]
+        assert model.get_capsule_count() == 2
+        db.close()
+
+    print("✅ Sync integration test passed!")
+
+def main():
+    """Run all tests"""
+    print("🧠 Testing Capsule Read Model")
+    print("=" * 50)
+
+    try:
+        test_matches_database()
+        test_incremental_updates()
+        test_sync_updates_model()
+
+        print("\n🎉 All read model tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
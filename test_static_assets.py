@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Test script for precompressed, content-hashed static assets:
+- The build step writes .gz/.br siblings and a content-hash manifest
+- Accept-Encoding picks the matching sibling (Vary and Content-Encoding set)
+- Dynamic responses are compressed above the size threshold only
+- Hashed URLs are immutable; script siblings resolve from the requested folder
+- Identical files in the language folders share one cached copy
+- A page's ETag changes when an asset it links to changes
+"""
+
+import sys
+import os
+import gzip
+import json
+import tempfile
+
+# Add backend to path
+backend_path = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_path)
+
+from flask import Flask, request, jsonify
+from static_assets import (StaticAssetServer, build_static_assets, compress_response, brotli,
+                           MANIFEST_NAME, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL)
+
+BLST_JS = b"// blst bindings\n" + b"var wasm = 'blst.wasm';\n" * 200
+
+def write_file(static_dir, rel_path, data):
+    path = os.path.join(static_dir, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def make_frontend(static_dir):
+    """A frontend/ tree with language folders sharing identical scripts"""
+    page = b'<html><script src="blst.js?v=2"></script><link href="styles.css"><a href="faq.html">FAQ</a></html>'
+    write_file(static_dir, "index.html", page)
+    write_file(static_dir, "styles.css", b"body { margin: 0; }\n" * 100)
+    write_file(static_dir, "small.txt", b"tiny")
+    write_file(static_dir, "logo.png", b"\x89PNG" + bytes(4096))
+    for folder in ("", "chinese/", "spanish/"):
+        write_file(static_dir, f"{folder}blst.js", BLST_JS)
+        write_file(static_dir, f"{folder}index.html" if folder else "faq.html", page)
+    write_file(static_dir, "blst.wasm", b"\0asm root" * 200)
+    write_file(static_dir, "chinese/blst.wasm", b"\0asm chinese" * 200)
+    write_file(static_dir, "spanish/blst.wasm", b"\0asm spanish" * 200)
+    build_static_assets(static_dir)
+    return StaticAssetServer(static_dir)
+
+def get(server, app, rel_path, accept_encoding=None, hashed=None, etag=None):
+    """Response of serve (or serve_hashed with hashed=digest) for one request"""
+    headers = {}
+    if accept_encoding:
+        headers["Accept-Encoding"] = accept_encoding
+    if etag:
+        headers["If-None-Match"] = etag
+    with app.test_request_context(headers=headers):
+        if hashed:
+            return server.serve_hashed(hashed, rel_path, request)
+        return server.serve(rel_path, request)
+
+def test_build_manifest():
+    """Test the manifest and compressed siblings written by the build step"""
+    print("🧪 Testing asset build...")
+
+    with tempfile.TemporaryDirectory() as static_dir:
+        server = make_frontend(static_dir)
+        with open(os.path.join(static_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+
+        files = manifest["files"]
+        assert files["blst.js"] == files["chinese/blst.js"] == files["spanish/blst.js"]
+        assert files["blst.wasm"] != files["chinese/blst.wasm"]
+        assert manifest["assets"][files["blst.js"]] == "blst.js"
+        assert len(manifest["assets"]) < len(files)
+
+        assert os.path.exists(os.path.join(static_dir, "styles.css.gz"))
+        assert os.path.exists(os.path.join(static_dir, "styles.css.br")) == (brotli is not None)
+        # Below min_size and already-compressed formats get no siblings
+        assert not os.path.exists(os.path.join(static_dir, "small.txt.gz"))
+        assert not os.path.exists(os.path.join(static_dir, "logo.png.gz"))
+        assert server.enabled
+
+    print("✅ Asset build test passed!")
+
+def test_encoding_negotiation():
+    """Test that Accept-Encoding selects the precompressed sibling"""
+    print("\n🧪 Testing content negotiation...")
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as static_dir:
+        server = make_frontend(static_dir)
+
+        response = get(server, app, "styles.css", "gzip, deflate")
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+        with open(os.path.join(static_dir, "styles.css.gz"), "rb") as f:
+            assert response.get_data() == f.read()
+        assert gzip.decompress(response.get_data()) == b"body { margin: 0; }\n" * 100
+
+        response = get(server, app, "styles.css", "br;q=1.0, gzip;q=0.5")
+        if brotli is not None:
+            assert response.headers["Content-Encoding"] == "br"
+            assert brotli.decompress(response.get_data()) == b"body { margin: 0; }\n" * 100
+        else:
+            assert response.headers["Content-Encoding"] == "gzip"
+
+        # No Accept-Encoding: identity, but caches must still key on the header
+        response = get(server, app, "styles.css")
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.get_data() == b"body { margin: 0; }\n" * 100
+
+        # Images are never re-encoded
+        response = get(server, app, "logo.png", "gzip")
+        assert "Content-Encoding" not in response.headers and "Vary" not in response.headers
+
+        # ETags differ per encoding and answer conditional requests
+        etag = get(server, app, "styles.css", "gzip").headers["ETag"]
+        assert etag != get(server, app, "styles.css").headers["ETag"]
+        assert get(server, app, "styles.css", "gzip", etag=etag).status_code == 304
+        assert get(server, app, "missing.js", "gzip") is None
+
+    print("✅ Content negotiation test passed!")
+
+def test_compress_response():
+    """Test the after_request hook's negotiation and size threshold"""
+    print("\n🧪 Testing dynamic response compression...")
+
+    app = Flask(__name__)
+
+    @app.route("/large")
+    def large():
+        return jsonify(capsules=[{"id": i, "title": "Devcon memories"} for i in range(100)])
+
+    @app.route("/small")
+    def small():
+        return jsonify(success=True)
+
+    @app.route("/image")
+    def image():
+        return app.response_class(bytes(4096), mimetype="image/png")
+
+    app.after_request(lambda response: compress_response(response, request, min_size=1024))
+    client = app.test_client()
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(json.loads(gzip.decompress(response.get_data()))["capsules"]) == 100
+
+    response = client.get("/large")
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(response.get_json()["capsules"]) == 100
+
+    for path in ("/small", "/image"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers, path
+
+    print("✅ Dynamic response compression test passed!")
+
+def test_hashed_urls():
+    """Test HTML rewriting, immutable hashed URLs and sibling resolution"""
+    print("\n🧪 Testing content-hashed URLs...")
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as static_dir:
+        server = make_frontend(static_dir)
+        digest = server.files["chinese/blst.js"]
+
+        # Local references point at hashed URLs; links to other pages stay as they are
+        html = get(server, app, "chinese/index.html").get_data().decode()
+        assert f'src="/assets/{digest}/chinese/blst.js"' in html
+        # chinese/styles.css is not in the manifest, so the reference is left as is
+        assert 'href="styles.css"' in html
+        root_html = get(server, app, "index.html").get_data().decode()
+        assert f'href="/assets/{server.files["styles.css"]}/styles.css"' in root_html
+        assert 'href="faq.html"' in root_html
+
+        response = get(server, app, "chinese/blst.js", "gzip", hashed=digest)
+        assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+        assert gzip.decompress(response.get_data()) == BLST_JS
+
+        # blst.js loads blst.wasm relative to its own URL: the requested folder's copy
+        for folder in ("chinese", "spanish"):
+            response = get(server, app, f"{folder}/blst.wasm", hashed=digest)
+            assert response.get_data() == f"\0asm {folder}".encode() * 200, folder
+            assert response.headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+
+        assert get(server, app, "blst.js", hashed="0" * 16) is None
+        assert get(server, app, "../" + os.path.basename(static_dir) + "/blst.js", hashed=digest) is None
+        assert get(server, app, "chinese/missing.js", hashed=digest) is None
+
+    print("✅ Content-hashed URL test passed!")
+
+def test_shared_cache():
+    """Test that identical files across language folders share one cached copy"""
+    print("\n🧪 Testing shared asset cache...")
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as static_dir:
+        server = make_frontend(static_dir)
+        chinese = get(server, app, "chinese/blst.js", "gzip").get_data()
+        spanish = get(server, app, "spanish/blst.js", "gzip").get_data()
+        assert chinese == spanish
+
+        digest = server.files["blst.js"]
+        assert [key for key in server._cache if key[0] == digest] == [(digest, "gzip")]
+        cached_bytes = server._cached_bytes
+        get(server, app, "blst.js", "gzip")
+        assert server._cached_bytes == cached_bytes
+
+        # HTML pages are cached per page, since their rewritten links differ by folder
+        get(server, app, "chinese/index.html", "gzip")
+        get(server, app, "spanish/index.html", "gzip")
+        assert ("chinese/index.html", "gzip") in server._cache and ("spanish/index.html", "gzip") in server._cache
+
+        # Nothing is cached beyond max_cached_bytes
+        small = StaticAssetServer(static_dir, max_cached_bytes=10)
+        assert get(small, app, "blst.js").get_data() == BLST_JS
+        assert not small._cache
+
+    print("✅ Shared asset cache test passed!")
+
+def test_html_etag_follows_assets():
+    """Test that changing only a linked asset changes the page's ETag"""
+    print("\n🧪 Testing HTML ETags after an asset deploy...")
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as static_dir:
+        server = make_frontend(static_dir)
+        page_etag = get(server, app, "index.html", "gzip").headers["ETag"]
+        old_url = server.asset_url("styles.css")
+
+        # Deploy a new styles.css; index.html itself is unchanged
+        write_file(static_dir, "styles.css", b"body { margin: 1px; }\n" * 100)
+        build_static_assets(static_dir)
+        server = StaticAssetServer(static_dir)
+        assert server.asset_url("styles.css") != old_url
+
+        response = get(server, app, "index.html", "gzip", etag=page_etag.strip('"'))
+        assert response.status_code == 200
+        assert response.headers["ETag"] != page_etag
+        assert server.asset_url("styles.css") in gzip.decompress(response.get_data()).decode()
+
+        # Non-HTML ETags are still the file's own digest
+        etag = get(server, app, "blst.js", "gzip").headers["ETag"]
+        assert etag == f'"{server.files["blst.js"]}-gzip"'
+        assert get(server, app, "index.html", "gzip", etag=response.headers["ETag"].strip('"')).status_code == 304
+
+    print("✅ HTML ETag test passed!")
+
+def main():
+    """Run all tests"""
+    print("📦 Testing Static Assets")
+    print("=" * 50)
+
+    try:
+        test_build_manifest()
+        test_encoding_negotiation()
+        test_compress_response()
+        test_hashed_urls()
+        test_shared_cache()
+        test_html_etag_follows_assets()
+
+        print("\n🎉 All static asset tests passed!")
+
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()